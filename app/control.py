@@ -0,0 +1,620 @@
+"""
+Управляющий сокет демона: Unix-сокет (на Windows - именованный канал) с протоколом
+запрос-ответ. Через него циклы запускаются скриптами и оверлеями без трея и хука клавиатуры.
+
+Каждое сообщение - JSON в UTF-8 с 4-байтовым заголовком длины (big-endian), как
+в multiprocessing.connection. Перед первым запросом клиент и сервер проходят взаимную
+авторизацию multiprocessing.connection ключом из файла CONTROL_KEY_PATH: ключ создается
+заново при каждом запуске сервера и доступен только текущему пользователю. Запрос:
+    {"command": "backup", "args": {"wait": true}}
+Ответ:
+    {"ok": true, "result": {...}} или {"ok": false, "error": "...", "type": "..."}
+
+Команды:
+    ping                                     - проверка связи
+    backup  [wait, timeout, live]            - цикл бэкапа
+    restore [wait, timeout, snapshot_id]     - цикл восстановления
+    list                                     - поколения бэкапов
+    status                                   - очередь заданий, игра, последний бэкап
+    metrics                                  - агрегаты и последние циклы
+    diff    [old, new, verify_hash]          - отличия между бэкапами или бэкапом и save00
+    export  path [wait, timeout, snapshot_id, codec] - экспорт бэкапа в сжатый пак
+    import  path [wait, timeout]             - импорт пака как нового поколения
+
+Клиент из консоли:
+    python -m app.control backup --wait
+    python -m app.control diff --old live --new latest
+    python -m app.control export --path save00.nspack --wait
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import logging
+import argparse
+import threading
+from collections.abc import Callable
+from typing import Any
+from dataclasses import asdict
+from functools import partial
+from pathlib import Path
+from multiprocessing.connection import (
+    AuthenticationError,
+    Client,
+    Connection,
+    Listener,
+    answer_challenge,
+    deliver_challenge,
+)
+
+from app import hotkey_daemon
+from config.paths import (
+    CONTROL_ADDRESS,
+    CONTROL_KEY_PATH,
+)
+from core.exceptions import (
+    ControlError,
+    NoitaError,
+    SnapshotNotFoundError,
+)
+from core.job_queue import Job
+
+# Запросы длиннее считаются ошибкой протокола и соединение закрывается
+MAX_MESSAGE_SIZE = 64 * 1024
+CONTROL_KEY_SIZE = 32
+
+# Состояния для команды diff: папка сохранения и последний бэкап
+DIFF_LIVE = "live"
+DIFF_LATEST = "latest"
+
+logger = logging.getLogger(__name__)
+
+
+class ControlServer:
+    """
+    Сервер управляющего сокета:
+    - каждое соединение обслуживается в своем потоке, запросы в соединении - по порядку
+    - backup и restore ставятся в общую с горячими клавишами очередь заданий и сразу
+      возвращают ответ; с флагом wait ответ приходит после завершения цикла
+    - list, status, metrics и diff выполняются в потоке соединения и не ждут циклов
+    - оставшийся после аварийного завершения Unix-сокет удаляется при запуске
+    - клиент без ключа авторизации отключается до приема запросов; авторизация идет
+      в потоке соединения, так что зависший клиент не блокирует прием остальных
+    """
+
+    def __init__(self, address: str = CONTROL_ADDRESS, key_path: Path | None = None):
+        self.address = address
+        self.key_path = key_path or control_key_path(address)
+        self.requests = 0
+        self.errors = 0
+
+        self._listener: Listener | None = None
+        self._authkey = b""
+        self._accept_thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._commands: dict[str, Callable[[dict], dict]] = {
+            "ping": self._ping,
+            "backup": self._backup,
+            "restore": self._restore,
+            "list": self._list,
+            "status": self._status,
+            "metrics": self._metrics,
+            "diff": self._diff,
+            "export": self._export,
+            "import": self._import,
+        }
+
+    def start(self) -> None:
+        """
+        Открывает сокет и запускает прием соединений в фоне.
+
+        Raises:
+            ControlError: Если сокет уже слушает другой экземпляр приложения
+                или его не удалось открыть.
+        """
+        self._remove_stale_socket()
+        try:
+            # Ключ записывается до открытия сокета: без него подключиться нельзя
+            self._authkey = _write_control_key(self.key_path)
+            self._listener = Listener(self.address)
+        except OSError as e:
+            raise ControlError(f"Не удалось открыть управляющий сокет {self.address}") from e
+
+        if sys.platform != "win32":
+            os.chmod(self.address, 0o600)
+
+        self._stopping.clear()
+        self._accept_thread = threading.Thread(
+            target=self._accept_loop,
+            name="control_server",
+            daemon=True,
+        )
+        self._accept_thread.start()
+        logger.info("Управляющий сокет слушает %s", self.address)
+
+    def stop(self, timeout: float | None = 5) -> None:
+        """
+        Прекращает прием соединений и закрывает сокет.
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания потока
+                приема соединений (в секундах). Defaults to 5.
+        """
+        if self._listener is None:
+            return
+
+        self._stopping.set()
+        # accept() не прерывается закрытием сокета из другого потока - будим его соединением
+        try:
+            Client(self.address).close()
+        except OSError:
+            pass
+        if self._accept_thread is not None:
+            self._accept_thread.join(timeout)
+
+        self._listener.close()
+        self._listener = None
+        self.key_path.unlink(missing_ok=True)
+        logger.info("Управляющий сокет закрыт")
+
+    def handle(self, request: dict) -> dict:
+        """
+        Выполняет запрос и формирует ответ. Ошибки приложения возвращаются в ответе.
+
+        Args:
+            request (dict): Запрос с полями 'command' и необязательным 'args'.
+
+        Returns:
+            dict: Ответ с полем 'ok' и полем 'result' или 'error'.
+        """
+        with self._lock:
+            self.requests += 1
+        command = request.get("command")
+        try:
+            if not isinstance(command, str) or (handler := self._commands.get(command)) is None:
+                raise ControlError(f"Неизвестная команда: {command}")
+            args = request.get("args") or {}
+            if not isinstance(args, dict):
+                raise ControlError("Аргументы команды должны быть объектом")
+            return {"ok": True, "result": handler(args)}
+        except NoitaError as err:
+            with self._lock:
+                self.errors += 1
+            return {"ok": False, "error": str(err), "type": type(err).__name__}
+        except Exception as err:
+            # Непредвиденная ошибка не должна обрывать соединение без ответа
+            logger.exception("Ошибка выполнения команды управляющего сокета %s", command)
+            with self._lock:
+                self.errors += 1
+            return {"ok": False, "error": f"Внутренняя ошибка: {err}", "type": type(err).__name__}
+
+    def _remove_stale_socket(self) -> None:
+        if sys.platform == "win32":
+            return
+        try:
+            if not stat.S_ISSOCK(os.stat(self.address).st_mode):
+                raise ControlError(f"Путь управляющего сокета {self.address} занят файлом")
+        except FileNotFoundError:
+            return
+
+        try:
+            Client(self.address).close()
+        except OSError:
+            # Никто не слушает - сокет остался от аварийно завершенного процесса
+            os.unlink(self.address)
+            logger.debug("Удален оставшийся управляющий сокет %s", self.address)
+        else:
+            raise ControlError(f"Управляющий сокет {self.address} занят другим экземпляром")
+
+    def _accept_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError as err:
+                if self._stopping.is_set():
+                    return
+                logger.warning("Ошибка приема соединения управляющего сокета: %s", err)
+                continue
+
+            if self._stopping.is_set():
+                conn.close()
+                return
+            threading.Thread(
+                target=self._serve_connection,
+                args=(conn,),
+                name="control_connection",
+                daemon=True,
+            ).start()
+
+    def _serve_connection(self, conn: Connection) -> None:
+        with conn:
+            try:
+                deliver_challenge(conn, self._authkey)
+                answer_challenge(conn, self._authkey)
+            except (AuthenticationError, EOFError, OSError) as err:
+                logger.debug("Клиент управляющего сокета не прошел авторизацию: %s", err)
+                return
+
+            while True:
+                try:
+                    data = conn.recv_bytes(MAX_MESSAGE_SIZE)
+                except EOFError:
+                    return
+                except OSError as err:
+                    logger.debug("Соединение управляющего сокета закрыто: %s", err)
+                    return
+
+                try:
+                    request = json.loads(data)
+                    if not isinstance(request, dict):
+                        raise ValueError("запрос должен быть объектом")
+                except ValueError as err:
+                    response = {
+                        "ok": False,
+                        "error": f"Неверный запрос: {err}",
+                        "type": "ValueError",
+                    }
+                else:
+                    response = self.handle(request)
+
+                try:
+                    conn.send_bytes(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+                except OSError:
+                    return
+
+    def _ping(self, args: dict) -> dict:
+        return {"pid": os.getpid()}
+
+    def _backup(self, args: dict) -> dict:
+        _validate_wait_args(args)
+        if not isinstance(args.get("live"), (bool, type(None))):
+            raise ControlError("Аргумент live должен быть true или false")
+        job = hotkey_daemon.submit_backup(args.get("live"))
+        return self._job_result(job, args)
+
+    def _restore(self, args: dict) -> dict:
+        _validate_wait_args(args)
+        snapshot_id = args.get("snapshot_id")
+        if snapshot_id is not None and not isinstance(snapshot_id, str):
+            raise ControlError("Аргумент snapshot_id должен быть строкой")
+        if snapshot_id is not None:
+            # Проверка до постановки в очередь: иначе цикл закроет игру и только потом упадет
+            _, service = hotkey_daemon.get_services()
+            if snapshot_id not in service.store.list_ids():
+                raise SnapshotNotFoundError(f"Снапшот {snapshot_id} не найден в хранилище.")
+
+        # Восстановления разных снапшотов не должны схлопываться друг с другом
+        key = "restore" if snapshot_id is None else f"restore:{snapshot_id}"
+        job = hotkey_daemon.job_queue.submit(
+            key,
+            partial(hotkey_daemon.handle_restore, snapshot_id),
+        )
+        return self._job_result(job, args)
+
+    def _export(self, args: dict) -> dict:
+        _validate_wait_args(args)
+        path = _path_arg(args)
+        snapshot_id = args.get("snapshot_id")
+        if snapshot_id is not None and not isinstance(snapshot_id, str):
+            raise ControlError("Аргумент snapshot_id должен быть строкой")
+        _, service = hotkey_daemon.get_services()
+        # Экспорт читает хранилище в рабочем потоке очереди, не пересекаясь с циклами
+        job = hotkey_daemon.job_queue.submit(
+            f"export:{path}",
+            partial(service.export_pack, path, snapshot_id, args.get("codec")),
+        )
+        return self._job_result(job, args, render=lambda size: {"path": str(path), "size": size})
+
+    def _import(self, args: dict) -> dict:
+        _validate_wait_args(args)
+        path = _path_arg(args)
+        _, service = hotkey_daemon.get_services()
+        job = hotkey_daemon.job_queue.submit(
+            f"import:{path}",
+            partial(service.import_pack, path),
+        )
+        return self._job_result(job, args, render=lambda info: {"snapshot": asdict(info)})
+
+    def _job_result(
+        self,
+        job: Job | None,
+        args: dict,
+        render: Callable[[Any], dict] = lambda cycle: {"cycle": cycle.to_dict()},
+    ) -> dict:
+        if job is None:
+            raise ControlError("Очередь заданий переполнена")
+        if not args.get("wait"):
+            return {"queued": job.key}
+
+        timeout = args.get("timeout")
+        if not job.wait(timeout):
+            raise ControlError(f"Задание {job.key} не завершилось за {timeout} с")
+        if job.error is not None:
+            if isinstance(job.error, NoitaError):
+                raise job.error
+            raise ControlError(f"Задание {job.key} завершилось ошибкой: {job.error}")
+        return render(job.result)
+
+    def _list(self, args: dict) -> dict:
+        _, service = hotkey_daemon.get_services()
+        return {"snapshots": [asdict(info) for info in service.list_snapshots()]}
+
+    def _status(self, args: dict) -> dict:
+        from services.noita_process import NoitaProcess
+
+        manager, service = hotkey_daemon.get_services()
+        scheduler = hotkey_daemon.auto_backup_scheduler
+        with self._lock:
+            requests, errors = self.requests, self.errors
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self._started_at, 3),
+            "noita_running": NoitaProcess.locator().find() is not None,
+            # Команда запуска ищется только в рабочем потоке очереди (warm_up и циклы)
+            "launch_ready": manager.launch_ready,
+            "latest_snapshot": service.store.catalog.latest_id(),
+            "jobs": hotkey_daemon.job_queue.stats,
+            "auto_backup": scheduler.stats if scheduler else None,
+            "control": {"requests": requests, "errors": errors},
+        }
+
+    def _metrics(self, args: dict) -> dict:
+        return hotkey_daemon.metrics_recorder.summary()
+
+    def _diff(self, args: dict) -> dict:
+        _, service = hotkey_daemon.get_services()
+
+        def resolve(name: str) -> str | None:
+            if name == DIFF_LIVE:
+                return None
+            if name == DIFF_LATEST:
+                if (snapshot_id := service.store.catalog.latest_id()) is None:
+                    raise SnapshotNotFoundError("В хранилище нет ни одного бэкапа.")
+                return snapshot_id
+            return name
+
+        old = resolve(args.get("old", DIFF_LATEST))
+        new = resolve(args.get("new", DIFF_LIVE))
+        if old is None and new is None:
+            raise ControlError("Нельзя сравнить папку сохранения саму с собой")
+        return service.diff(old, new, verify_hash=bool(args.get("verify_hash"))).to_dict()
+
+
+def _path_arg(args: dict) -> Path:
+    """
+    Возвращает путь к файлу пака из аргументов команды.
+
+    Args:
+        args (dict): Аргументы команды.
+
+    Raises:
+        ControlError: Если путь не задан или не абсолютный - относительный путь
+            разрешался бы от рабочей папки демона, а не клиента.
+
+    Returns:
+        Path: Абсолютный путь.
+    """
+    path = args.get("path")
+    if not isinstance(path, str) or not Path(path).is_absolute():
+        raise ControlError("Аргумент path должен быть абсолютным путем к файлу пака")
+    return Path(path)
+
+
+def _validate_wait_args(args: dict) -> None:
+    """
+    Проверяет типы аргументов ожидания цикла до постановки задания в очередь.
+
+    Args:
+        args (dict): Аргументы команды.
+
+    Raises:
+        ControlError: Если 'wait' не логическое значение или 'timeout' не положительное число.
+    """
+    if not isinstance(args.get("wait", False), bool):
+        raise ControlError("Аргумент wait должен быть true или false")
+
+    timeout = args.get("timeout")
+    if timeout is not None and (
+        isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0
+    ):
+        raise ControlError("Аргумент timeout должен быть положительным числом секунд")
+
+
+def control_key_path(address: str) -> Path:
+    """
+    Функция получения пути к файлу ключа авторизации для адреса управляющего сокета.
+
+    Args:
+        address (str): Адрес сокета.
+
+    Returns:
+        Path: CONTROL_KEY_PATH для адреса по умолчанию, иначе файл с именем сокета
+            в той же папке.
+    """
+    if address == CONTROL_ADDRESS:
+        return CONTROL_KEY_PATH
+    return CONTROL_KEY_PATH.with_name(f"{Path(address).name}.key")
+
+
+def _write_control_key(path: Path) -> bytes:
+    """
+    Создает новый ключ авторизации и записывает его в файл с правами только для владельца.
+    Файл создается заново (O_CREAT | O_EXCL), так что подложить его заранее нельзя;
+    оставшийся от прошлого запуска файл удаляется, только если принадлежит
+    текущему пользователю.
+
+    Args:
+        path (Path): Путь к файлу ключа.
+
+    Raises:
+        ControlError: Если файл или его папка принадлежат другому пользователю.
+
+    Returns:
+        bytes: Ключ авторизации.
+    """
+    key = os.urandom(CONTROL_KEY_SIZE)
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    _check_owner(path.parent, os.stat(path.parent))
+    try:
+        _check_owner(path, os.lstat(path))
+    except FileNotFoundError:
+        pass
+    else:
+        path.unlink()
+
+    # Права задаются при создании файла, а не после записи
+    flags = (
+        os.O_WRONLY
+        | os.O_CREAT
+        | os.O_EXCL
+        | getattr(os, "O_NOFOLLOW", 0)
+        | getattr(os, "O_BINARY", 0)
+    )
+    fd = os.open(path, flags, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(key)
+    return key
+
+
+def _read_control_key(path: Path) -> bytes:
+    flags = os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+    fd = os.open(path, flags)
+    with os.fdopen(fd, "rb") as file:
+        _check_owner(path, os.fstat(file.fileno()))
+        return file.read()
+
+
+def _check_owner(path: Path, stat: os.stat_result) -> None:
+    """
+    Проверяет, что файл ключа или его папка принадлежат текущему пользователю.
+    На Windows доступ ограничивают права профиля пользователя, и проверка не нужна.
+
+    Raises:
+        ControlError: Если владелец - другой пользователь.
+    """
+    if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+        raise ControlError(f"{path} принадлежит другому пользователю, ключ не используется")
+
+
+def send_command(
+    command: str,
+    address: str = CONTROL_ADDRESS,
+    key_path: Path | None = None,
+    **args,
+) -> dict:
+    """
+    Функция отправки одной команды демону через управляющий сокет.
+
+    Args:
+        command (str): Команда, например "backup" или "status".
+        address (str, optional): Адрес сокета. Defaults to CONTROL_ADDRESS.
+        key_path (Path | None, optional): Файл ключа авторизации.
+            Defaults to None - ключ для адреса 'address' (см. control_key_path).
+        **args: Аргументы команды.
+
+    Raises:
+        ControlError: Если демон недоступен или вернул ошибку.
+
+    Returns:
+        dict: Результат команды.
+    """
+    key_path = key_path or control_key_path(address)
+    try:
+        authkey = _read_control_key(key_path)
+    except OSError as e:
+        raise ControlError(f"Ключ управляющего сокета {key_path} не прочитан") from e
+
+    try:
+        with Client(address, authkey=authkey) as conn:
+            conn.send_bytes(json.dumps({"command": command, "args": args}).encode("utf-8"))
+            response = json.loads(conn.recv_bytes())
+    except AuthenticationError as e:
+        raise ControlError(f"Демон по адресу {address} отклонил ключ {key_path}") from e
+    except (OSError, EOFError) as e:
+        raise ControlError(f"Демон Noita Saver недоступен по адресу {address}") from e
+
+    if not response.get("ok"):
+        raise ControlError(response.get("error", "Неизвестная ошибка"))
+    return response["result"]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Управление демоном Noita Saver")
+    parser.add_argument(
+        "command",
+        choices=[
+            "ping",
+            "backup",
+            "restore",
+            "list",
+            "status",
+            "metrics",
+            "diff",
+            "export",
+            "import",
+        ],
+    )
+    parser.add_argument("--wait", action="store_true", help="дождаться завершения цикла")
+    parser.add_argument("--timeout", type=float, help="максимальное ожидание цикла, с")
+    parser.add_argument("--live", action="store_true", help="бэкап без перезапуска игры")
+    parser.add_argument("--snapshot", help="идентификатор снапшота (restore, export)")
+    parser.add_argument("--path", type=Path, help="export/import: файл пака")
+    parser.add_argument("--codec", choices=["zstd", "lzma", "zlib"], help="export: кодек сжатия")
+    parser.add_argument(
+        "--old",
+        default=DIFF_LATEST,
+        help=f"diff: старое состояние - снапшот, '{DIFF_LATEST}' или '{DIFF_LIVE}' (save00)",
+    )
+    parser.add_argument(
+        "--new",
+        default=DIFF_LIVE,
+        help=f"diff: новое состояние - снапшот, '{DIFF_LATEST}' или '{DIFF_LIVE}' (save00)",
+    )
+    parser.add_argument("--hash", action="store_true", help="diff: сверять содержимое save00")
+    parser.add_argument("--limit", type=int, default=20, help="diff: файлов каждого вида")
+    parser.add_argument("--json", action="store_true", help="вывести ответ в JSON")
+    parser.add_argument("--address", default=CONTROL_ADDRESS, help="адрес управляющего сокета")
+    args = parser.parse_args(argv)
+
+    command_args = {}
+    if args.command in ("backup", "restore"):
+        command_args = {"wait": args.wait, "timeout": args.timeout}
+    if args.command == "backup" and args.live:
+        command_args["live"] = True
+    if args.command == "restore" and args.snapshot:
+        command_args["snapshot_id"] = args.snapshot
+    if args.command == "diff":
+        command_args = {"old": args.old, "new": args.new, "verify_hash": args.hash}
+    if args.command in ("export", "import"):
+        if args.path is None:
+            parser.error(f"для {args.command} нужен --path")
+        # Путь передается абсолютным: демон работает в своей рабочей папке
+        command_args = {
+            "wait": args.wait,
+            "timeout": args.timeout,
+            "path": str(args.path.resolve()),
+        }
+    if args.command == "export":
+        command_args.update(snapshot_id=args.snapshot, codec=args.codec)
+
+    start = time.perf_counter()
+    try:
+        result = send_command(args.command, address=args.address, **command_args)
+    except ControlError as err:
+        sys.exit(str(err))
+
+    if args.command == "diff" and not args.json:
+        from services.snapshot_diff import format_diff
+
+        print(format_diff(result, limit=args.limit))
+    else:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"ответ за {(time.perf_counter() - start) * 1000:.1f} мс", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
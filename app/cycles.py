@@ -0,0 +1,174 @@
+import logging
+
+from core import metrics
+from core.exceptions import (
+    JournalError,
+    LiveSnapshotError,
+)
+from services import (
+    NoitaManager,
+    BackupService,
+)
+
+
+# Бэкап на ходу: сколько раз пробовать и какой период без записи ждать перед копированием
+LIVE_BACKUP_ATTEMPTS = 3
+LIVE_QUIET_WINDOW = 0.5
+LIVE_QUIET_TIMEOUT = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+def backup_cycle(
+    noita_manager: NoitaManager,
+    backup_service: BackupService,
+    recorder: metrics.MetricsRecorder,
+) -> metrics.CycleMetrics:
+    """
+    Полный цикл бэкапа: закрыть игру, создать бэкап, запустить игру.
+
+    Args:
+        noita_manager (NoitaManager): Менеджер процесса игры.
+        backup_service (BackupService): Бэкап-сервис.
+        recorder (metrics.MetricsRecorder): Сборщик замеров цикла.
+
+    Raises:
+        NoitaError: Если любой из шагов цикла завершился ошибкой.
+
+    Returns:
+        metrics.CycleMetrics: Замеры цикла.
+    """
+    with recorder.cycle("backup") as cycle:
+        noita_manager.shutdown_noita()
+        backup_service.backup()
+        noita_manager.launch_noita()
+
+    # Сжатие в пак идет в фоне уже после запуска игры
+    backup_service.request_pack_export()
+    return cycle
+
+
+def live_backup_cycle(
+    noita_manager: NoitaManager,
+    backup_service: BackupService,
+    recorder: metrics.MetricsRecorder,
+    attempts: int = LIVE_BACKUP_ATTEMPTS,
+) -> metrics.CycleMetrics:
+    """
+    Бэкап без перезапуска игры: дождаться, пока игра ничего не пишет, и скопировать
+    сохранение. Если сохранение меняется во время копирования - попытка повторяется.
+    Если игра не перестает писать или попытки кончились, выполняется обычный цикл
+    с закрытием игры.
+
+    Args:
+        noita_manager (NoitaManager): Менеджер процесса игры.
+        backup_service (BackupService): Бэкап-сервис.
+        recorder (metrics.MetricsRecorder): Сборщик замеров цикла.
+        attempts (int, optional): Количество попыток бэкапа на ходу.
+            Defaults to LIVE_BACKUP_ATTEMPTS.
+
+    Raises:
+        NoitaError: Если бэкап не удался и в запасном цикле.
+
+    Returns:
+        metrics.CycleMetrics: Замеры цикла.
+    """
+    with recorder.cycle("backup_live") as cycle:
+        if not _try_live_backup(noita_manager, backup_service, attempts):
+            logger.info("Бэкап на ходу не удался, игра будет перезапущена.")
+            noita_manager.shutdown_noita()
+            backup_service.backup()
+            noita_manager.launch_noita()
+
+    backup_service.request_pack_export()
+    return cycle
+
+
+def auto_backup_cycle(
+    noita_manager: NoitaManager,
+    backup_service: BackupService,
+    recorder: metrics.MetricsRecorder,
+    attempts: int = LIVE_BACKUP_ATTEMPTS,
+) -> metrics.CycleMetrics | None:
+    """
+    Автоматический бэкап по расписанию: как бэкап на ходу, но игра никогда
+    не закрывается. Если сохранение не изменилось с последнего бэкапа, цикл пропускается.
+
+    Args:
+        noita_manager (NoitaManager): Менеджер процесса игры.
+        backup_service (BackupService): Бэкап-сервис.
+        recorder (metrics.MetricsRecorder): Сборщик замеров цикла.
+        attempts (int, optional): Количество попыток бэкапа на ходу.
+            Defaults to LIVE_BACKUP_ATTEMPTS.
+
+    Raises:
+        LiveSnapshotError: Если игра не перестает писать в сохранение.
+        NoitaError: Если бэкап завершился другой ошибкой.
+
+    Returns:
+        (metrics.CycleMetrics | None): Замеры цикла; None если бэкап не нужен.
+    """
+    if not backup_service.has_changes():
+        logger.debug("Сохранение не изменилось с последнего бэкапа, автобэкап пропущен.")
+        return None
+
+    with recorder.cycle("backup_auto") as cycle:
+        if not _try_live_backup(noita_manager, backup_service, attempts):
+            # Расписание не закрывает игру - попытка будет повторена позже
+            raise LiveSnapshotError("Игра записывает сохранение, автобэкап отложен.")
+
+    backup_service.request_pack_export()
+    return cycle
+
+
+def restore_cycle(
+    noita_manager: NoitaManager,
+    backup_service: BackupService,
+    recorder: metrics.MetricsRecorder,
+    snapshot_id: str | None = None,
+) -> metrics.CycleMetrics:
+    """
+    Полный цикл восстановления: закрыть игру, восстановить сохранение, запустить игру.
+
+    Args:
+        noita_manager (NoitaManager): Менеджер процесса игры.
+        backup_service (BackupService): Бэкап-сервис.
+        recorder (metrics.MetricsRecorder): Сборщик замеров цикла.
+        snapshot_id (str | None, optional): Поколение бэкапа. Defaults to None - последнее.
+
+    Raises:
+        NoitaError: Если любой из шагов цикла завершился ошибкой.
+
+    Returns:
+        metrics.CycleMetrics: Замеры цикла.
+    """
+    with recorder.cycle("restore") as cycle:
+        noita_manager.shutdown_noita()
+        backup_service.restore(snapshot_id)
+        noita_manager.launch_noita()
+    return cycle
+
+
+def _try_live_backup(
+    noita_manager: NoitaManager,
+    backup_service: BackupService,
+    attempts: int,
+) -> bool:
+    for attempt in range(1, attempts + 1):
+        if not noita_manager.wait_for_write_quiet(
+            window=LIVE_QUIET_WINDOW, timeout=LIVE_QUIET_TIMEOUT
+        ):
+            # Игра пишет непрерывно - дальнейшие попытки только затянут цикл
+            logger.debug("Попытка %s: игра не перестает писать на диск", attempt)
+            return False
+
+        try:
+            backup_service.backup_live()
+            return True
+        except LiveSnapshotError as err:
+            logger.debug("Попытка %s: %s", attempt, err)
+        except JournalError as err:
+            # Операцию в журнале доводит цикл с закрытием игры - повторы не помогут
+            logger.debug("Попытка %s: %s", attempt, err)
+            return False
+    return False
@@ -1,52 +1,268 @@
-import keyboard
 import logging
 import threading
+from functools import partial
+from typing import TYPE_CHECKING
 
-from services import (
-    NoitaManager,
-    BackupService,
+from core import metrics
+from core.job_queue import (
+    Job,
+    JobQueue,
 )
-from core.exceptions import NoitaError
+from core.exceptions import (
+    NoitaError,
+    LiveSnapshotError,
+)
+from config.paths import (
+    METRICS_DIR,
+    PACKS_DIR,
+)
+
+if TYPE_CHECKING:
+    from app.scheduler import AutoBackupScheduler
+    from services import (
+        NoitaManager,
+        BackupService,
+    )
+
+# Бэкап без перезапуска игры; при записи в сохранение во время копирования
+# выполняется обычный цикл с закрытием игры
+LIVE_BACKUP = False
+# Экспорт последнего бэкапа в сжатый пак в PACKS_DIR в фоне после цикла
+PACK_EXPORT = True
 
 logger = logging.getLogger(__name__)
-noita_manager = NoitaManager()
-backup_service = BackupService()
+metrics_recorder = metrics.MetricsRecorder(
+    jsonl_path=METRICS_DIR / "cycles.jsonl",
+    prom_path=METRICS_DIR / "noita_saver.prom",
+)
+# Циклы выполняются по одному в отдельном потоке, а не в потоке хуков клавиатуры
+job_queue = JobQueue(maxsize=4, name="noita_saver_jobs")
 stop_daemon_event = threading.Event()
+hotkeys_ready_event = threading.Event()
+
+# Сервисы создаются при первом использовании, чтобы горячие клавиши регистрировались
+# до загрузки psutil, sqlite3 и остальных зависимостей
+noita_manager: "NoitaManager | None" = None
+backup_service: "BackupService | None" = None
+# Планировщик автобэкапа; None если автобэкап выключен
+auto_backup_scheduler: "AutoBackupScheduler | None" = None
+_services_lock = threading.Lock()
+
+
+def get_services() -> tuple["NoitaManager", "BackupService"]:
+    """
+    Возвращает менеджер игры и бэкап-сервис, создавая их при первом вызове.
+
+    Returns:
+        (tuple[NoitaManager, BackupService]): Менеджер игры и бэкап-сервис.
+    """
+    global noita_manager, backup_service
+
+    with _services_lock:
+        if backup_service is None:
+            from services import (
+                NoitaManager,
+                BackupService,
+            )
 
+            noita_manager = NoitaManager()
+            backup_service = BackupService(
+                track_changes=True,
+                pack_dir=PACKS_DIR if PACK_EXPORT else None,
+            )
+    return noita_manager, backup_service
 
-def handle_backup():
+
+def warm_up() -> None:
+    """
+    Загружает сервисы, открывает каталог бэкапов, доводит прерванную сбоем операцию
+    и находит команду запуска игры в фоне после регистрации горячих клавиш, чтобы первое
+    нажатие не ждало импортов и поиска.
+    """
+    from app import cycles  # noqa: F401
+    from services.noita_process import NoitaProcess
+
+    manager, service = get_services()
+    service.store.catalog
+    # Операция, прерванная сбоем, доводится сразу; если игра уже запущена - в следующем цикле
+    service.recover_interrupted(touch_saves=NoitaProcess.locator().find() is None)
+    manager.prepare_launch()
+
+
+def handle_backup(live: bool | None = None) -> metrics.CycleMetrics:
+    """
+    Выполняет цикл бэкапа. Ошибка цикла логируется и пробрасывается дальше,
+    чтобы ее получил инициатор задания (например, клиент управляющего сокета).
+
+    Args:
+        live (bool | None, optional): Бэкап без перезапуска игры.
+            Defaults to None - значение LIVE_BACKUP.
+
+    Returns:
+        metrics.CycleMetrics: Замеры цикла.
+    """
+    from app.cycles import (
+        backup_cycle,
+        live_backup_cycle,
+    )
+
+    manager, service = get_services()
+    live = LIVE_BACKUP if live is None else live
     try:
-        noita_manager.shutdown_noita()
-        backup_service.backup()
-        noita_manager.launch_noita()
+        cycle_func = live_backup_cycle if live else backup_cycle
+        cycle = cycle_func(manager, service, metrics_recorder)
     except NoitaError as err:
         logger.warning("Произошла ошибка во время бэкапа сохранений: %s", err)
+        raise
+
+    logger.debug("Цикл бэкапа занял %.3f с: %s", cycle.duration, cycle.phases)
+    return cycle
+
+
+def submit_backup(live: bool | None = None) -> Job | None:
+    """
+    Ставит цикл бэкапа в очередь заданий. Бэкап на ходу и обычный бэкап ставятся
+    с разными ключами, чтобы запрос одного вида не схлопнулся с ожидающим заданием другого.
 
+    Args:
+        live (bool | None, optional): Бэкап без перезапуска игры.
+            Defaults to None - значение LIVE_BACKUP.
 
-def handle_restore():
+    Returns:
+        (Job | None): Поставленное или ожидающее задание; None если очередь переполнена.
+    """
+    live = LIVE_BACKUP if live is None else live
+    return job_queue.submit("backup:live" if live else "backup", partial(handle_backup, live))
+
+
+def handle_auto_backup() -> metrics.CycleMetrics | None:
+    """
+    Выполняет автоматический бэкап по расписанию без закрытия игры.
+
+    Raises:
+        LiveSnapshotError: Если игра записывает сохранение - попытка откладывается.
+        NoitaError: Если бэкап завершился другой ошибкой.
+
+    Returns:
+        (metrics.CycleMetrics | None): Замеры цикла; None если сохранение не изменилось.
+    """
+    from app.cycles import auto_backup_cycle
+
+    manager, service = get_services()
+    try:
+        cycle = auto_backup_cycle(manager, service, metrics_recorder)
+    except LiveSnapshotError:
+        # Ожидаемо, пока игра пишет: планировщик повторит попытку позже
+        raise
+    except NoitaError as err:
+        logger.warning("Произошла ошибка во время автобэкапа сохранений: %s", err)
+        raise
+
+    if cycle is not None:
+        logger.info("Автобэкап занял %.3f с", cycle.duration)
+    return cycle
+
+
+def handle_restore(snapshot_id: str | None = None) -> metrics.CycleMetrics:
+    """
+    Выполняет цикл восстановления. Ошибка цикла логируется и пробрасывается дальше.
+
+    Args:
+        snapshot_id (str | None, optional): Идентификатор снапшота.
+            Defaults to None - последний снапшот.
+
+    Returns:
+        metrics.CycleMetrics: Замеры цикла.
+    """
+    from app.cycles import restore_cycle
+
+    manager, service = get_services()
     try:
-        noita_manager.shutdown_noita()
-        backup_service.restore()
-        noita_manager.launch_noita()
+        cycle = restore_cycle(manager, service, metrics_recorder, snapshot_id=snapshot_id)
     except NoitaError as err:
         logger.warning("Произошла ошибка во время восстановления сохранений: %s", err)
+        raise
+
+    logger.debug("Цикл восстановления занял %.3f с: %s", cycle.duration, cycle.phases)
+    return cycle
+
 
+def keyboard_event_loop(hotkeys: bool = True, auto_backup: float | None = None) -> None:
+    """
+    Основной цикл демона: запускает очередь заданий, регистрирует горячие клавиши
+    и запускает планировщик автобэкапа.
 
-def keyboard_event_loop() -> None:
-    keyboard.add_hotkey("ctrl+alt+f7", handle_backup)
-    keyboard.add_hotkey("ctrl+alt+f8", handle_restore)
+    Args:
+        hotkeys (bool, optional): Регистрировать горячие клавиши. Без них циклы
+            запускаются только через управляющий сокет. Defaults to True.
+        auto_backup (float | None, optional): Период автобэкапа (в секундах).
+            Defaults to None - автобэкап выключен.
+    """
+    global auto_backup_scheduler
 
-    logger.info("Демон для прослушивания комбинаций клавиш запущен.")
+    job_queue.start()
+    if hotkeys:
+        # Хук клавиатуры не загружается в режиме без горячих клавиш: на Linux
+        # keyboard требует прав root
+        import keyboard
+
+        keyboard.add_hotkey("ctrl+alt+f7", submit_backup)
+        keyboard.add_hotkey("ctrl+alt+f8", job_queue.submit, args=("restore", handle_restore))
+
+    hotkeys_ready_event.set()
+    if hotkeys:
+        logger.info("Демон для прослушивания комбинаций клавиш запущен.")
+    else:
+        logger.info("Демон запущен без горячих клавиш.")
+    job_queue.submit("warm_up", warm_up)
+
+    if auto_backup:
+        from app.scheduler import AutoBackupScheduler
+
+        auto_backup_scheduler = AutoBackupScheduler(
+            job_queue,
+            handle_auto_backup,
+            get_services,
+            interval=auto_backup,
+        )
+        auto_backup_scheduler.start()
 
     # Основной loop демона
     while not stop_daemon_event.is_set():
         stop_daemon_event.wait(timeout=1)
 
+    if hotkeys:
+        keyboard.unhook_all_hotkeys()
+    if auto_backup_scheduler:
+        auto_backup_scheduler.stop()
+    job_queue.stop()
+    if backup_service is not None:
+        backup_service.close()
     logger.info("Демон для прослушивания комбинаций клавиш остановлен.")
 
 
-def start_daemon() -> None:
-    threading.Thread(target=keyboard_event_loop, daemon=True).start()
+def start_daemon(
+    ready_timeout: float = 5,
+    hotkeys: bool = True,
+    auto_backup: float | None = None,
+) -> None:
+    """
+    Запускает демон горячих клавиш и ждет регистрации клавиш.
+
+    Args:
+        ready_timeout (float, optional): Максимальное время ожидания регистрации
+            (в секундах). Defaults to 5.
+        hotkeys (bool, optional): Регистрировать горячие клавиши. Defaults to True.
+        auto_backup (float | None, optional): Период автобэкапа (в секундах).
+            Defaults to None - автобэкап выключен.
+    """
+    threading.Thread(
+        target=keyboard_event_loop,
+        args=(hotkeys, auto_backup),
+        daemon=True,
+    ).start()
+    if not hotkeys_ready_event.wait(ready_timeout):
+        logger.warning("Горячие клавиши не зарегистрированы за %s с.", ready_timeout)
 
 
 def stop_daemon() -> None:
@@ -1,31 +1,103 @@
+import signal
 import logging
+import argparse
 
 from app.hotkey_daemon import (
     start_daemon,
     stop_daemon,
+    stop_daemon_event,
 )
-from app.tray import create_tray
-from config.logger_conf import configure_logging
+from config.logger_conf import (
+    configure_logging,
+    stop_logging,
+)
+from core.exceptions import ControlError
 
 logger = logging.getLogger(__name__)
 
 
-def main():
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Noita Saver")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="без трея и горячих клавиш, управление только через управляющий сокет",
+    )
+    parser.add_argument(
+        "--no-control",
+        action="store_true",
+        help="не открывать управляющий сокет",
+    )
+    parser.add_argument(
+        "--auto-backup",
+        type=float,
+        metavar="МИНУТЫ",
+        help="автоматический бэкап без закрытия игры с заданным периодом",
+    )
+    args = parser.parse_args(argv)
+    if args.auto_backup is not None and args.auto_backup <= 0:
+        parser.error("период автобэкапа должен быть больше нуля")
+    return args
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
     configure_logging(level=20)
 
-    logger.info("Запуск Noita Saver")
+    try:
+        logger.info("Запуск Noita Saver")
+
+        # Возвращает управление, когда горячие клавиши уже зарегистрированы
+        start_daemon(
+            hotkeys=not args.headless,
+            auto_backup=args.auto_backup * 60 if args.auto_backup else None,
+        )
 
-    start_daemon()
+        control_server = None
+        if not args.no_control:
+            from app.control import ControlServer
 
-    tray_icon = create_tray()
+            control_server = ControlServer()
+            try:
+                control_server.start()
+            except ControlError as err:
+                if args.headless:
+                    stop_daemon()
+                    raise SystemExit(f"Управляющий сокет не запущен: {err}")
+                # С треем и горячими клавишами приложение работает и без сокета
+                logger.warning("Управляющий сокет не запущен: %s", err)
+                control_server = None
 
-    # Блокирующий вызов - пока пользователь не выйдет
-    tray_icon.run()
+        if args.headless:
+            # Завершение по Ctrl+C или SIGTERM
+            signal.signal(signal.SIGTERM, lambda *_: stop_daemon())
+            try:
+                while not stop_daemon_event.is_set():
+                    stop_daemon_event.wait(timeout=1)
+            except KeyboardInterrupt:
+                pass
+        else:
+            # pystray и PIL загружаются после регистрации горячих клавиш
+            from app.tray import create_tray
 
-    stop_daemon()
+            tray_icon = create_tray()
 
-    logger.info("Noita Saver завершил работу")
+            # Блокирующий вызов - пока пользователь не выйдет
+            tray_icon.run()
+
+        if control_server:
+            control_server.stop()
+        stop_daemon()
+
+        logger.info("Noita Saver завершил работу")
+    finally:
+        # Записи из очереди логов дописываются на диск до выхода
+        stop_logging()
 
 
 if __name__ == "__main__":
+    # Хэширование больших объемов идет в пуле процессов
+    import multiprocessing
+
+    multiprocessing.freeze_support()
     main()
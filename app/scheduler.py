@@ -0,0 +1,265 @@
+import time
+import logging
+import threading
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from core.exceptions import (
+    NoitaError,
+    LiveSnapshotError,
+)
+from core.job_queue import JobQueue
+from core.metrics import CycleMetrics
+
+if TYPE_CHECKING:
+    from services import (
+        NoitaManager,
+        BackupService,
+    )
+
+
+# Автобэкап: желаемый период между бэкапами и минимальный промежуток (в секундах)
+AUTO_BACKUP_INTERVAL = 600.0
+AUTO_BACKUP_MIN_INTERVAL = 120.0
+# Сколько байт должна записать игра, чтобы бэкап сделали раньше периода, но не раньше
+# минимального промежутка: при активной игре теряется меньше прогресса
+AUTO_BACKUP_BUSY_BYTES = 32 * 1024 * 1024
+# Период опроса счетчиков ввода-вывода игры и сколько секунд без записи считать простоем
+AUTO_POLL_INTERVAL = 5.0
+AUTO_IDLE_WINDOW = 5.0
+# Отсрочка, пока игра пишет на диск: удваивается до максимума
+AUTO_BACKOFF_INITIAL = 15.0
+AUTO_BACKOFF_MAX = 300.0
+
+logger = logging.getLogger(__name__)
+
+
+class AutoBackupScheduler:
+    """
+    Планировщик автоматических бэкапов на ходу:
+    - раз в 'poll_interval' читает счетчики записи процесса игры (psutil io_counters)
+    - бэкап нужен, когда с последнего бэкапа (в том числе ручного) прошло 'interval',
+      или прошло 'min_interval' и игра записала больше 'busy_bytes' (запись до первого
+      опроса процесса не считается). Время последнего бэкапа берется у BackupService
+      без запроса к каталогу на каждом опросе
+    - бэкап ставится в общую очередь заданий только в простое: игра ничего
+      не пишет 'idle_window' секунд. Пока игра пишет, попытка откладывается
+      с удвоением отсрочки
+    - если игра с прошлой проверки ничего не записала, бэкап пропускается без обхода папки;
+      иначе задание сверяет папку сохранения с последним манифестом по mtime и размерам
+      и пропускает бэкап, если изменений нет
+    - игра никогда не закрывается: если сохранение меняется во время копирования,
+      попытка откладывается
+
+    Без счетчиков ввода-вывода (ОС их не дает или игра не запущена) простой не
+    определяется, и бэкап выполняется по периоду; целостность копии проверяет сам бэкап
+    на ходу.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        job: Callable[[], CycleMetrics | None],
+        services: Callable[[], tuple["NoitaManager", "BackupService"]],
+        interval: float = AUTO_BACKUP_INTERVAL,
+        min_interval: float = AUTO_BACKUP_MIN_INTERVAL,
+        busy_bytes: int = AUTO_BACKUP_BUSY_BYTES,
+        poll_interval: float = AUTO_POLL_INTERVAL,
+        idle_window: float = AUTO_IDLE_WINDOW,
+        backoff_initial: float = AUTO_BACKOFF_INITIAL,
+        backoff_max: float = AUTO_BACKOFF_MAX,
+    ):
+        if interval <= 0 or poll_interval <= 0 or backoff_initial <= 0:
+            raise ValueError("Недопустимые параметры расписания")
+
+        self.job_queue = job_queue
+        self.job = job
+        self.services = services
+        self.interval = interval
+        self.min_interval = min(min_interval, interval)
+        self.busy_bytes = busy_bytes
+        self.poll_interval = poll_interval
+        self.idle_window = idle_window
+        self.backoff_initial = backoff_initial
+        self.backoff_max = max(backoff_max, backoff_initial)
+
+        self.backups = 0
+        self.skipped = 0
+        self.deferred = 0
+        self.failed = 0
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Последнее прочитанное значение счетчиков: (pid, операции записи, байты)
+        self._sample: tuple[int, int, int] | None = None
+        self._last_write_at = 0.0
+        # Счетчики на момент последнего бэкапа или пропуска
+        self._baseline: tuple[int, int, int] | None = None
+        # Первые счетчики текущего процесса игры: запись до начала наблюдения не считается
+        self._origin: tuple[int, int, int] | None = None
+        self._retry_at = 0.0
+        self._backoff = backoff_initial
+
+    def start(self) -> None:
+        """Запускает фоновый поток планировщика, если он еще не запущен."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="auto_backup", daemon=True)
+            self._thread.start()
+        logger.info(
+            "Автобэкап включен: каждые %.0f с, не чаще раза в %.0f с.",
+            self.interval,
+            self.min_interval,
+        )
+
+    def stop(self, timeout: float | None = 5) -> None:
+        """
+        Останавливает планировщик. Уже поставленное задание бэкапа выполняется
+        очередью заданий.
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания потока
+                (в секундах). Defaults to 5.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+
+        self._stop_event.set()
+        thread.join(timeout)
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        """
+        Возвращает счетчики планировщика.
+
+        Returns:
+            (dict[str, int | float]): Количество бэкапов, пропусков, отсрочек и ошибок,
+                текущая отсрочка (в секундах).
+        """
+        with self._lock:
+            return {
+                "backups": self.backups,
+                "skipped": self.skipped,
+                "deferred": self.deferred,
+                "failed": self.failed,
+                "backoff": self._backoff,
+            }
+
+    def tick(self) -> None:
+        """
+        Один шаг планировщика: читает счетчики игры и, если бэкап нужен и игра простаивает,
+        выполняет его через очередь заданий. Вызывается фоновым потоком.
+        """
+        now = time.monotonic()
+        sample = self._read_counters()
+        if sample is not None and (
+            self._sample is None or sample[:2] != self._sample[:2]
+        ):
+            self._last_write_at = now
+        self._sample = sample
+        if sample is not None and (self._origin is None or self._origin[0] != sample[0]):
+            self._origin = sample
+
+        if now < self._retry_at or not self._is_due(sample):
+            return
+
+        if sample is not None and now - self._last_write_at < self.idle_window:
+            self._defer("игра пишет на диск")
+            return
+
+        if sample is not None and self._baseline is not None and sample[:2] == self._baseline[:2]:
+            # Игра ничего не записала с прошлой проверки - сохранение не менялось
+            self._on_skipped(sample)
+            return
+
+        self._run_job(sample)
+
+    def _is_due(self, sample: tuple[int, int, int] | None) -> bool:
+        _, service = self.services()
+        if (last_backup_at := service.last_backup_at) is None:
+            return True
+
+        elapsed = time.time() - last_backup_at
+        if elapsed >= self.interval:
+            return True
+        if elapsed < self.min_interval or sample is None:
+            return False
+
+        # Байты, записанные текущим процессом игры с последнего бэкапа или с начала наблюдения
+        if self._baseline is not None and self._baseline[0] == sample[0]:
+            written = sample[2] - self._baseline[2]
+        else:
+            written = sample[2] - self._origin[2]
+        return written >= self.busy_bytes
+
+    def _run_job(self, sample: tuple[int, int, int] | None) -> None:
+        if (job := self.job_queue.submit("backup_auto", self.job)) is None:
+            self._defer("очередь заданий переполнена")
+            return
+
+        while not job.wait(timeout=1):
+            if self._stop_event.is_set():
+                return
+
+        if job.error is None:
+            if job.result is None:
+                self._on_skipped(sample)
+                return
+            with self._lock:
+                self.backups += 1
+                self._backoff = self.backoff_initial
+            self._baseline = sample
+            self._retry_at = 0.0
+            return
+
+        if isinstance(job.error, LiveSnapshotError):
+            self._defer(str(job.error))
+            return
+
+        # Остальные ошибки (нет папки сохранения, ошибка копирования) залогированы заданием
+        with self._lock:
+            self.failed += 1
+        self._defer(f"ошибка бэкапа: {job.error}")
+
+    def _on_skipped(self, sample: tuple[int, int, int] | None) -> None:
+        with self._lock:
+            self.skipped += 1
+            self._backoff = self.backoff_initial
+        self._baseline = sample
+        # Пока нет новой записи, папка не обходится заново раньше минимального промежутка
+        self._retry_at = time.monotonic() + self.min_interval
+        logger.debug("Сохранение не изменилось, автобэкап пропущен.")
+
+    def _defer(self, reason: str) -> None:
+        with self._lock:
+            self.deferred += 1
+            delay = self._backoff
+            self._backoff = min(self._backoff * 2, self.backoff_max)
+        self._retry_at = time.monotonic() + delay
+        logger.debug("Автобэкап отложен на %.0f с: %s", delay, reason)
+
+    def _read_counters(self) -> tuple[int, int, int] | None:
+        from services.noita_process import NoitaProcess
+
+        try:
+            noita = NoitaProcess.attach()
+        except NoitaError:
+            return None
+        if (counters := noita.write_counters()) is None:
+            return None
+        return noita.pid, *counters
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.tick()
+            except NoitaError as err:
+                logger.warning("Ошибка планировщика автобэкапа: %s", err)
+            except Exception:
+                logger.exception("Ошибка планировщика автобэкапа")
@@ -0,0 +1,272 @@
+"""
+Бенчмарк BackupService на синтетическом сохранении.
+
+Запуск:
+    python -m benchmarks.backup_bench --files 3000 --size-mb 300 --output result.json
+    python -m benchmarks.backup_bench --baseline result.json
+    python -m benchmarks.backup_bench --files 3000 --size-mb 30 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.save_generator import (
+    SaveProfile,
+    generate_save,
+    mutate_save,
+)
+from core.utils import scan_tree
+from services.backup_service import (
+    BackupService,
+    RestoreMode,
+)
+from services.copy_engine import DEFAULT_COPY_WORKERS
+
+
+@dataclass
+class BenchResult:
+    """Результат одного сценария бенчмарка."""
+
+    name: str
+    seconds: float
+    files: int
+    bytes: int
+    mb_per_s: float
+    files_per_s: float
+    peak_rss_kb: int | None
+
+
+def drop_page_cache(root: Path) -> None:
+    """
+    Функция вытеснения файлов папки из page cache через posix_fadvise, чтобы следующий
+    сценарий читал данные с диска. Права root не нужны. На платформах без
+    posix_fadvise ничего не делает.
+
+    Args:
+        root (Path): Папка, файлы которой нужно вытеснить.
+    """
+    if not hasattr(os, "posix_fadvise") or not root.exists():
+        return
+
+    files, _ = scan_tree(root)
+    for rel_path in files:
+        fd = os.open(root / rel_path, os.O_RDONLY)
+        try:
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def peak_rss_kb() -> int | None:
+    """
+    Функция получения пикового RSS процесса с начала запуска.
+
+    Returns:
+        int | None: Пик в килобайтах или None, если платформа его не сообщает.
+    """
+    try:
+        import resource
+    except ImportError:
+        # На Windows модуля resource нет, пиковый рабочий набор отдает psutil
+        import psutil
+
+        peak_wset = getattr(psutil.Process().memory_info(), "peak_wset", None)
+        return peak_wset // 1024 if peak_wset is not None else None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss на Linux в килобайтах, на macOS - в байтах
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure(name: str, func, files: int, size: int) -> BenchResult:
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    return BenchResult(
+        name=name,
+        seconds=round(seconds, 4),
+        files=files,
+        bytes=size,
+        mb_per_s=round(size / 1_000_000 / seconds, 2),
+        files_per_s=round(files / seconds, 1),
+        peak_rss_kb=peak_rss_kb(),
+    )
+
+
+def run(
+    workdir: Path,
+    profile: SaveProfile,
+    changed: int,
+    cold: bool,
+    workers: int = DEFAULT_COPY_WORKERS,
+) -> list[BenchResult]:
+    """
+    Функция прогона сценариев: копирование через shutil.copytree как точка отсчета,
+    холодный и теплый бэкап, полное, дельта- и заранее подготовленное восстановление.
+
+    Args:
+        workdir (Path): Рабочая папка бенчмарка.
+        profile (SaveProfile): Параметры синтетического сохранения.
+        changed (int): Количество чанков, меняющихся между бэкапами.
+        cold (bool): Вытеснять данные из page cache перед каждым сценарием.
+        workers (int, optional): Количество потоков копирования.
+            Defaults to DEFAULT_COPY_WORKERS.
+
+    Returns:
+        list[BenchResult]: Результаты сценариев.
+    """
+    saves_dir = workdir / "save00"
+    backup_dir = workdir / "backup" / "save00"
+    file_count, total_size = generate_save(saves_dir, profile)
+
+    def prepare() -> None:
+        if cold:
+            drop_page_cache(saves_dir)
+            drop_page_cache(backup_dir)
+
+    def size_of(paths: list[Path]) -> int:
+        return sum(path.stat().st_size for path in paths)
+
+    results = []
+
+    prepare()
+    copytree_dst = workdir / "copytree"
+    results.append(
+        measure(
+            "copytree",
+            lambda: shutil.copytree(saves_dir, copytree_dst),
+            file_count,
+            total_size,
+        )
+    )
+    shutil.rmtree(copytree_dst)
+
+    service = BackupService(
+        saves_dir=saves_dir, backup_dir=backup_dir, prestage=False, copy_workers=workers
+    )
+
+    prepare()
+    results.append(measure("backup_cold", service.backup, file_count, total_size))
+
+    changes = mutate_save(saves_dir, changed)
+    prepare()
+    results.append(measure("backup_warm", service.backup, len(changes), size_of(changes)))
+
+    shutil.rmtree(saves_dir)
+    prepare()
+    results.append(
+        measure(
+            "restore_full",
+            lambda: service.restore(mode=RestoreMode.FULL),
+            file_count,
+            total_size,
+        )
+    )
+
+    changes = mutate_save(saves_dir, changed, seed=2)
+    prepare()
+    results.append(
+        measure("restore_delta", service.restore, len(changes), size_of(changes))
+    )
+
+    prestaged = BackupService(
+        saves_dir=saves_dir, backup_dir=backup_dir, prestage=True, copy_workers=workers
+    )
+    prestaged.prestager.request_refresh()
+    prestaged.prestager.wait_idle()
+    changes = mutate_save(saves_dir, changed, seed=3)
+    prepare()
+    results.append(
+        measure("restore_prestaged", prestaged.restore, file_count, total_size)
+    )
+    prestaged.prestager.wait_idle()
+
+    return results
+
+
+def compare(results: list[BenchResult], baseline: dict) -> None:
+    """
+    Функция вывода сравнения с сохраненным ранее результатом.
+
+    Args:
+        results (list[BenchResult]): Текущие результаты.
+        baseline (dict): Загруженный JSON прошлого прогона.
+    """
+    previous = {item["name"]: item for item in baseline["results"]}
+    print(f"{'сценарий':<20}{'было, с':>12}{'стало, с':>12}{'разница':>10}")
+    for result in results:
+        if result.name not in previous:
+            continue
+        before = previous[result.name]["seconds"]
+        delta = (result.seconds - before) / before * 100 if before else 0.0
+        print(f"{result.name:<20}{before:>12.4f}{result.seconds:>12.4f}{delta:>+9.1f}%")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк бэкапа/восстановления Noita Saver")
+    parser.add_argument("--files", type=int, default=SaveProfile.file_count)
+    parser.add_argument("--size-mb", type=int, default=SaveProfile.total_size // 1_000_000)
+    parser.add_argument("--large-files", type=int, default=SaveProfile.large_files)
+    parser.add_argument("--changed", type=int, default=20, help="чанков меняется между циклами")
+    parser.add_argument("--seed", type=int, default=SaveProfile.seed)
+    parser.add_argument("--cold", action="store_true", help="вытеснять page cache")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_COPY_WORKERS, help="потоков копирования"
+    )
+    parser.add_argument("--workdir", type=Path, help="папка для данных (по умолчанию временная)")
+    parser.add_argument("--output", type=Path, help="куда сохранить результат в JSON")
+    parser.add_argument("--baseline", type=Path, help="результат прошлого прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    profile = SaveProfile(
+        file_count=args.files,
+        total_size=args.size_mb * 1_000_000,
+        large_files=args.large_files,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="noita_bench_", dir=args.workdir) as tmp:
+        results = run(
+            Path(tmp), profile, changed=args.changed, cold=args.cold, workers=args.workers
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "profile": asdict(profile),
+            "changed": args.changed,
+            "cold": args.cold,
+            "workers": args.workers,
+        },
+        "results": [asdict(result) for result in results],
+    }
+
+    for result in results:
+        rss = "-" if result.peak_rss_kb is None else result.peak_rss_kb
+        print(
+            f"{result.name:<20}{result.seconds:>10.4f} с{result.mb_per_s:>10.1f} МБ/с"
+            f"{result.files_per_s:>12.1f} файл/с{rss:>10} КБ RSS"
+        )
+
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Сквозной замер циклов бэкапа/восстановления против заменителя игры (только Linux).
+
+Каждый цикл проходит тот же путь, что и по горячей клавише: закрытие процесса,
+копирование, повторный запуск и ожидание появления процесса.
+
+Запуск:
+    python -m benchmarks.cycle_latency --cycles 50 --shutdown-delay 0.2 --output cycles.json
+"""
+
+import sys
+import json
+import argparse
+import platform
+import statistics
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+
+from app.cycles import (
+    backup_cycle,
+    live_backup_cycle,
+    restore_cycle,
+)
+from benchmarks.fake_noita import (
+    install_fake_noita,
+    launch_cmdline,
+)
+from benchmarks.save_generator import (
+    SaveProfile,
+    generate_save,
+)
+from core import metrics
+from core.exceptions import NoitaError
+from services import (
+    NoitaManager,
+    BackupService,
+)
+from services.noita_process import NoitaProcess
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """
+    Функция расчета p50/p95/p99 и максимума.
+
+    Args:
+        values (list[float]): Замеры в секундах.
+
+    Returns:
+        dict[str, float]: Перцентили по названиям; пустой словарь, если замеров нет.
+    """
+    if not values:
+        return {}
+    if len(values) == 1:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49], 6),
+        "p95": round(cuts[94], 6),
+        "p99": round(cuts[98], 6),
+        "max": round(max(values), 6),
+    }
+
+
+def run(
+    workdir: Path,
+    profile: SaveProfile,
+    cycles: int,
+    startup_delay: float,
+    shutdown_delay: float,
+    write_interval: float,
+    live: bool = False,
+) -> dict:
+    """
+    Функция прогона циклов: бэкап и восстановление чередуются, первым идет бэкап.
+
+    Args:
+        workdir (Path): Рабочая папка.
+        profile (SaveProfile): Параметры синтетического сохранения.
+        cycles (int): Общее количество циклов.
+        startup_delay (float): Задержка появления процесса после запуска (в секундах).
+        shutdown_delay (float): Задержка завершения процесса после SIGTERM (в секундах).
+        write_interval (float): Период записи файлов процессом (в секундах).
+        live (bool, optional): Бэкап без перезапуска игры. Defaults to False.
+
+    Returns:
+        dict: Перцентили длительности циклов и фаз по видам циклов, количество ошибок.
+    """
+    saves_dir = workdir / "save00"
+    generate_save(saves_dir, profile)
+
+    executable = install_fake_noita(workdir / "bin")
+    cmdline = launch_cmdline(
+        executable,
+        saves_dir,
+        startup_delay=startup_delay,
+        shutdown_delay=shutdown_delay,
+        write_interval=write_interval,
+    )
+
+    manager = NoitaManager(noita_cmdline=cmdline, cwd=str(workdir))
+    service = BackupService(saves_dir=saves_dir, backup_dir=workdir / "backup" / "save00")
+    recorder = metrics.MetricsRecorder(
+        jsonl_path=workdir / "metrics" / "cycles.jsonl",
+        prom_path=workdir / "metrics" / "noita_saver.prom",
+    )
+
+    durations: dict[str, list[float]] = {"backup": [], "restore": []}
+    phases: dict[str, dict[str, list[float]]] = {"backup": {}, "restore": {}}
+    errors: list[str] = []
+
+    manager.launch_noita()
+    try:
+        for index in range(cycles):
+            kind = "backup" if index % 2 == 0 else "restore"
+            if kind == "restore":
+                cycle_func = restore_cycle
+            else:
+                cycle_func = live_backup_cycle if live else backup_cycle
+            try:
+                cycle = cycle_func(manager, service, recorder)
+            except NoitaError as err:
+                errors.append(f"{kind}: {err}")
+                # Игра могла остаться закрытой - следующий цикл начинается с запуска
+                if not NoitaProcess.locator().find():
+                    manager.launch_noita()
+                continue
+
+            durations[kind].append(cycle.duration)
+            for phase, seconds in cycle.phases.items():
+                phases[kind].setdefault(phase, []).append(seconds)
+    finally:
+        manager.shutdown_noita()
+        if service.prestager:
+            service.prestager.wait_idle()
+
+    return {
+        "cycles": {kind: percentiles(values) for kind, values in durations.items()},
+        "phases": {
+            kind: {phase: percentiles(values) for phase, values in sorted(by_phase.items())}
+            for kind, by_phase in phases.items()
+        },
+        "locator": NoitaProcess.locator().stats,
+        "errors": errors,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Сквозной замер циклов Noita Saver")
+    parser.add_argument("--cycles", type=int, default=20, help="циклы бэкапа и восстановления")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--startup-delay", type=float, default=0.0)
+    parser.add_argument("--shutdown-delay", type=float, default=0.1)
+    parser.add_argument("--write-interval", type=float, default=0.2)
+    parser.add_argument("--live", action="store_true", help="бэкап без перезапуска игры")
+    parser.add_argument("--workdir", type=Path, help="папка для данных (по умолчанию временная)")
+    parser.add_argument("--output", type=Path, help="куда сохранить результат в JSON")
+    args = parser.parse_args(argv)
+
+    if platform.system() != "Linux":
+        sys.exit("Заменитель игры работает только на Linux")
+
+    profile = SaveProfile(file_count=args.files, total_size=args.size_mb * 1_000_000)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="noita_cycles_", dir=args.workdir) as tmp:
+        result = run(
+            Path(tmp),
+            profile,
+            cycles=args.cycles,
+            startup_delay=args.startup_delay,
+            shutdown_delay=args.shutdown_delay,
+            write_interval=args.write_interval,
+            live=args.live,
+        )
+
+    for kind, stats in result["cycles"].items():
+        if stats:
+            print(
+                f"{kind:<10}p50 {stats['p50']:.4f} с  p95 {stats['p95']:.4f} с  "
+                f"p99 {stats['p99']:.4f} с  max {stats['max']:.4f} с"
+            )
+        for phase, phase_stats in result["phases"][kind].items():
+            print(f"  {phase:<18}p50 {phase_stats['p50']:.4f} с  p99 {phase_stats['p99']:.4f} с")
+    print(f"ошибок: {len(result['errors'])}, всего {time.perf_counter() - start:.1f} с")
+    for error in result["errors"]:
+        print(f"  {error}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "profile": asdict(profile),
+                "cycles": args.cycles,
+                "startup_delay": args.startup_delay,
+                "shutdown_delay": args.shutdown_delay,
+                "write_interval": args.write_interval,
+                "live": args.live,
+            },
+            **result,
+        }
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Заменитель процесса игры для Linux: исполняемый файл с именем процесса noita.exe.
+
+- пока работает, периодически пишет чанки мира в папку сохранения
+- на SIGTERM выжидает заданную задержку, дописывает player.xml и завершается с кодом 0
+- с задержкой запуска процесс первые секунды называется "noita-boot" и получает
+  имя noita.exe только после задержки, как игра, запускаемая через лаунчер
+
+Установка:
+    install_fake_noita(Path("/tmp/fake"))  # создаст /tmp/fake/noita.exe и noita-boot
+"""
+
+import os
+import sys
+import time
+import ctypes
+import signal
+import argparse
+import threading
+from pathlib import Path
+
+
+PROCESS_NAME = "noita.exe"
+BOOT_NAME = "noita-boot"
+
+# prctl(PR_SET_NAME) из linux/prctl.h: меняет comm процесса, по которому его находит psutil
+PR_SET_NAME = 15
+
+_SCRIPT = """#!{python}
+import sys
+sys.path.insert(0, {repo_root!r})
+
+from benchmarks.fake_noita import main
+
+main()
+"""
+
+
+def set_process_name(name: str) -> None:
+    """
+    Функция смены имени процесса (comm) через prctl. Работает только на Linux.
+
+    Args:
+        name (str): Новое имя процесса, не длиннее 15 символов.
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.prctl(PR_SET_NAME, name.encode(), 0, 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), "prctl(PR_SET_NAME) завершился ошибкой")
+
+
+def install_fake_noita(directory: Path) -> Path:
+    """
+    Функция установки исполняемого заменителя игры в папку 'directory'. Рядом создается
+    ссылка noita-boot на тот же файл: запуск через нее дает процессу имя noita-boot
+    с момента exec, что нужно для задержки запуска.
+
+    Args:
+        directory (Path): Папка для исполняемого файла.
+
+    Returns:
+        Path: Путь к исполняемому файлу noita.exe.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    executable = directory / PROCESS_NAME
+    # Абсолютный путь интерпретатора: обертки вроде pyenv меняют имя процесса после запуска
+    executable.write_text(
+        _SCRIPT.format(
+            python=sys.executable,
+            repo_root=str(Path(__file__).resolve().parent.parent),
+        ),
+        encoding="utf-8",
+    )
+    executable.chmod(0o755)
+
+    boot_link = directory / BOOT_NAME
+    boot_link.unlink(missing_ok=True)
+    boot_link.symlink_to(executable.name)
+    return executable
+
+
+def launch_cmdline(
+    executable: Path,
+    saves_dir: Path,
+    startup_delay: float = 0.0,
+    shutdown_delay: float = 0.0,
+    write_interval: float = 0.5,
+) -> list[str]:
+    """
+    Функция сборки командной строки для запуска заменителя игры.
+
+    Args:
+        executable (Path): Путь к noita.exe, созданному install_fake_noita.
+        saves_dir (Path): Папка сохранения, в которую пишет процесс.
+        startup_delay (float, optional): Задержка до появления процесса noita.exe
+            (в секундах). Defaults to 0.0.
+        shutdown_delay (float, optional): Задержка завершения после SIGTERM (в секундах).
+            Defaults to 0.0.
+        write_interval (float, optional): Период записи чанков (в секундах). Defaults to 0.5.
+
+    Returns:
+        list[str]: Командная строка.
+    """
+    program = executable.with_name(BOOT_NAME) if startup_delay > 0 else executable
+    return [
+        str(program),
+        "--saves-dir",
+        str(saves_dir),
+        "--startup-delay",
+        str(startup_delay),
+        "--shutdown-delay",
+        str(shutdown_delay),
+        "--write-interval",
+        str(write_interval),
+    ]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Заменитель процесса Noita для тестов")
+    parser.add_argument("--saves-dir", type=Path, required=True)
+    parser.add_argument("--startup-delay", type=float, default=0.0)
+    parser.add_argument("--shutdown-delay", type=float, default=0.0)
+    parser.add_argument("--write-interval", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    if args.startup_delay > 0 and stop_event.wait(args.startup_delay):
+        sys.exit(0)
+    set_process_name(PROCESS_NAME)
+
+    world_dir = args.saves_dir / "world"
+    counter = 0
+    while not stop_event.wait(args.write_interval):
+        # Игра пишет сохранение, пока работает - папка может быть подменена восстановлением
+        world_dir.mkdir(parents=True, exist_ok=True)
+        (world_dir / f"fake_chunk_{counter % 16}.bin").write_bytes(os.urandom(4096))
+        counter += 1
+
+    time.sleep(args.shutdown_delay)
+    args.saves_dir.mkdir(parents=True, exist_ok=True)
+    (args.saves_dir / "player.xml").write_text(
+        f'<Entity name="player" saved_at="{time.time()}" />\n', encoding="utf-8"
+    )
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class SaveProfile:
+    """Параметры синтетической папки save00."""
+
+    # Общее количество файлов и их суммарный размер в байтах
+    file_count: int = 3000
+    total_size: int = 300_000_000
+    # Количество крупных файлов (player.xml, world_state.xml и т.п.)
+    large_files: int = 4
+    # Доля суммарного размера, приходящаяся на крупные файлы
+    large_share: float = 0.1
+    # Доля файлов-флагов нулевого размера в persistent/flags
+    flag_share: float = 0.2
+    seed: int = 0
+
+
+LARGE_FILE_NAMES = (
+    "player.xml",
+    "world_state.xml",
+    "world/.stream_info",
+    "stats/_stats.xml",
+    "magic_numbers.salakieli",
+    "session_numbers.salakieli",
+)
+
+
+def generate_save(root: Path, profile: SaveProfile = SaveProfile()) -> tuple[int, int]:
+    """
+    Функция генерации синтетической папки сохранения с раскладкой как у Noita:
+    много небольших чанков мира в 'world/', пустые файлы-флаги в 'persistent/flags/'
+    и несколько крупных файлов. Содержимое псевдослучайное и воспроизводимое по 'seed'.
+
+    Args:
+        root (Path): Папка, в которой создается сохранение. Должна не существовать или быть пустой.
+        profile (SaveProfile, optional): Параметры сохранения. Defaults to SaveProfile().
+
+    Returns:
+        (tuple[int, int]): Количество созданных файлов и их суммарный размер.
+    """
+    rng = random.Random(profile.seed)
+    for folder in ("world", "persistent/flags", "stats/sessions"):
+        (root / folder).mkdir(parents=True, exist_ok=True)
+
+    large_count = min(profile.large_files, len(LARGE_FILE_NAMES), profile.file_count)
+    flag_count = int((profile.file_count - large_count) * profile.flag_share)
+    chunk_count = profile.file_count - large_count - flag_count
+
+    large_size = int(profile.total_size * profile.large_share) if large_count else 0
+    chunk_size = (profile.total_size - large_size) // max(chunk_count, 1)
+
+    written = 0
+    for name in LARGE_FILE_NAMES[:large_count]:
+        written += _write(root / name, large_size // large_count, rng)
+
+    for index in range(flag_count):
+        (root / "persistent" / "flags" / f"flag_{index:05d}").touch()
+
+    side = max(int(chunk_count**0.5), 1)
+    for index in range(chunk_count):
+        x, y = (index % side) * 512, (index // side) * 512
+        # Размер чанков разбросан вокруг среднего, как у реальных .png_petri
+        size = max(int(chunk_size * rng.uniform(0.5, 1.5)), 1)
+        written += _write(root / "world" / f"world_{x}_{y}.png_petri", size, rng)
+
+    return large_count + flag_count + chunk_count, written
+
+
+def mutate_save(root: Path, count: int, seed: int = 1) -> list[Path]:
+    """
+    Функция имитации игровой сессии: перезаписывает 'count' случайных чанков мира
+    новым содержимым того же размера.
+
+    Args:
+        root (Path): Папка сохранения.
+        count (int): Количество изменяемых файлов.
+        seed (int, optional): Зерно генератора. Defaults to 1.
+
+    Returns:
+        list[Path]: Измененные файлы.
+    """
+    rng = random.Random(seed)
+    chunks = sorted((root / "world").glob("*.png_petri"))
+    changed = rng.sample(chunks, min(count, len(chunks)))
+    for path in changed:
+        _write(path, path.stat().st_size, rng)
+    return changed
+
+
+def _write(path: Path, size: int, rng: random.Random) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(rng.randbytes(size))
+    return size
@@ -0,0 +1,162 @@
+"""
+Бюджет времени запуска: сколько стоит импорт модулей до регистрации горячих клавиш.
+
+Импорт выполняется в отдельном интерпретаторе с -X importtime, отчет показывает самые
+дорогие модули. Тяжелые зависимости (psutil, sqlite3, PIL, pystray) не должны
+загружаться до регистрации клавиш - их появление считается нарушением бюджета.
+
+Запуск:
+    python -m benchmarks.startup_time --budget-ms 150 --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TARGET = "app.noita_saver"
+DEFAULT_BUDGET_MS = 150.0
+# Модули, которые должны загружаться лениво - после регистрации горячих клавиш
+DEFAULT_FORBIDDEN = (
+    "psutil",
+    "sqlite3",
+    "PIL",
+    "pystray",
+    "services.backup_service",
+    "services.noita_manager",
+)
+
+
+@dataclass
+class ModuleImport:
+    """Строка отчета -X importtime."""
+
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> list[ModuleImport]:
+    """
+    Функция разбора вывода -X importtime.
+
+    Args:
+        stderr (str): Поток ошибок интерпретатора.
+
+    Returns:
+        list[ModuleImport]: Импортированные модули в порядке завершения импорта.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|", 2)
+        imports.append(
+            ModuleImport(
+                name=name.strip(),
+                self_us=int(self_us),
+                cumulative_us=int(cumulative_us),
+                depth=(len(name) - len(name.lstrip())) // 2,
+            )
+        )
+    return imports
+
+
+def measure(target: str) -> tuple[list[ModuleImport], float]:
+    """
+    Функция замера импорта модуля 'target' в отдельном интерпретаторе.
+
+    Args:
+        target (str): Импортируемый модуль.
+
+    Raises:
+        RuntimeError: Если импорт завершился ошибкой.
+
+    Returns:
+        (tuple[list[ModuleImport], float]): Модули из отчета -X importtime
+            и общее время работы интерпретатора (в секундах).
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import")]
+        raise RuntimeError("\n".join(errors[-5:]))
+    return parse_importtime(result.stderr), wall
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Бюджет времени запуска Noita Saver")
+    parser.add_argument("--target", default=DEFAULT_TARGET, help="импортируемый модуль")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="сколько модулей показать")
+    parser.add_argument("--runs", type=int, default=3, help="прогонов, берется лучший")
+    parser.add_argument(
+        "--forbid",
+        default=",".join(DEFAULT_FORBIDDEN),
+        help="модули через запятую, которые не должны загружаться при импорте",
+    )
+    parser.add_argument("--output", type=Path, help="куда сохранить результат в JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        runs = [measure(args.target) for _ in range(max(1, args.runs))]
+    except RuntimeError as err:
+        sys.exit(f"Импорт {args.target} завершился ошибкой:\n{err}")
+
+    # Лучший прогон меньше всего зависит от шума планировщика и холодного кэша
+    imports, wall = min(runs, key=lambda run: run[1])
+    by_name = {item.name: item for item in imports}
+    total_ms = by_name[args.target].cumulative_us / 1000 if args.target in by_name else 0.0
+
+    forbidden = [name.strip() for name in args.forbid.split(",") if name.strip()]
+    loaded_forbidden = [name for name in forbidden if name in by_name]
+
+    print(f"{'модуль':<40}{'свое, мс':>12}{'всего, мс':>12}")
+    for item in sorted(imports, key=lambda item: item.self_us, reverse=True)[: args.top]:
+        print(f"{item.name:<40}{item.self_us / 1000:>12.2f}{item.cumulative_us / 1000:>12.2f}")
+    print(f"импорт {args.target}: {total_ms:.1f} мс (бюджет {args.budget_ms:.0f} мс)")
+    print(f"запуск интерпретатора с импортом: {wall * 1000:.1f} мс")
+
+    over_budget = total_ms > args.budget_ms
+    if loaded_forbidden:
+        print(f"загружены модули, которые должны быть ленивыми: {', '.join(loaded_forbidden)}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "target": args.target,
+                "budget_ms": args.budget_ms,
+            },
+            "total_ms": round(total_ms, 3),
+            "wall_ms": round(wall * 1000, 3),
+            "loaded_forbidden": loaded_forbidden,
+            "imports": [asdict(item) for item in imports],
+        }
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if over_budget or loaded_forbidden:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,102 @@
+import copy
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
 
 from config.paths import LOG_DIR
 
 
+# Очередь записей между вызывающими потоками и потоком записи логов на диск
+LOG_QUEUE_SIZE = 10_000
+# Сколько поток может ждать места в очереди для записи уровня WARNING и выше (в секундах)
+LOG_BLOCK_TIMEOUT = 1.0
+
+_listener: QueueListener | None = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Обработчик, передающий записи в ограниченную очередь для фонового потока:
+    - в вызывающем потоке только подставляются аргументы в сообщение; форматирование
+      и запись в файлы (с ротацией) идут в потоке QueueListener
+    - при переполнении очереди записи ниже WARNING отбрасываются, а записи WARNING
+      и выше ждут места до LOG_BLOCK_TIMEOUT секунд; количество потерянных записей
+      сообщается отдельной записью, когда место появляется
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы фиксируются сразу: к моменту записи на диск объекты могут измениться
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=LOG_BLOCK_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return
+
+        if self.dropped:
+            self._report_dropped()
+
+    def _report_dropped(self) -> None:
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if not dropped:
+            return
+
+        notice = logging.LogRecord(
+            name=__name__,
+            level=logging.WARNING,
+            pathname=__file__,
+            lineno=0,
+            msg=f"Очередь логов была переполнена, потеряно записей: {dropped}",
+            args=None,
+            exc_info=None,
+        )
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += dropped
+
+
+class BoundedQueueListener(QueueListener):
+    """
+    QueueListener для ограниченной очереди: маркер остановки ждет места в очереди,
+    пока поток записи жив, а не выбрасывает queue.Full при переполненной очереди.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        while True:
+            try:
+                self.queue.put(self._sentinel, timeout=LOG_BLOCK_TIMEOUT)
+                return
+            except queue.Full:
+                # Очередь разбирает только поток записи - без него место не появится
+                if self._thread is None or not self._thread.is_alive():
+                    return
+
+
 def configure_logging(level=logging.INFO) -> None:
+    global _listener
+
     LOG_DIR.mkdir(exist_ok=True)
 
     formatter = logging.Formatter(
@@ -34,5 +126,37 @@ def configure_logging(level=logging.INFO) -> None:
     root_logger.setLevel(level)
 
     if not root_logger.handlers:
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(error_handler)
+        log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root_logger.addHandler(BoundedQueueHandler(log_queue))
+
+        # Форматирование и запись в файлы - в отдельном потоке
+        _listener = BoundedQueueListener(
+            log_queue,
+            file_handler,
+            error_handler,
+            respect_handler_level=True,
+        )
+        _listener.start()
+
+
+def stop_logging() -> None:
+    """
+    Дописывает на диск все записи из очереди и останавливает поток записи логов.
+    Вызывается при завершении приложения; последующие записи пишутся в файлы синхронно.
+    """
+    global _listener
+
+    if _listener is None:
+        return
+
+    _listener.stop()
+
+    # Записи из потоков, еще работающих при выходе, пишутся в файлы напрямую
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, BoundedQueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in _listener.handlers:
+        root_logger.addHandler(handler)
+
+    _listener = None
@@ -1,3 +1,6 @@
+import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Главная директория приложения
@@ -6,9 +9,47 @@ APP_DIR = Path(__file__).parent.parent
 # Логи
 LOG_DIR = APP_DIR / "logs"
 
+# Метрики циклов бэкапа/восстановления
+METRICS_DIR = APP_DIR / "metrics"
+
 # Для бэкап-сервиса
 NOITA_SAVES_DIR = Path.home() / "AppData" / "LocalLow" / "Nolla_Games_Noita" / "save00"
 BACKUP_SAVES_DIR = APP_DIR / "backup" / "save00"
+# Сжатые паки последнего бэкапа, которые пишутся в фоне после каждого цикла
+PACKS_DIR = APP_DIR / "backup" / "packs"
+
+# Папка Steam, в которой ищется libraryfolders.vdf. None - поиск в стандартных местах
+# (Program Files на Windows, ~/.steam и Flatpak на Linux). Задается переменной окружения
+# NOITA_SAVER_STEAM_ROOT, например для Proton с нестандартной установкой Steam
+STEAM_ROOT = (
+    Path(os.environ["NOITA_SAVER_STEAM_ROOT"]) if os.getenv("NOITA_SAVER_STEAM_ROOT") else None
+)
+
+# Кэш командной строки запуска игры
+LAUNCH_CACHE_PATH = APP_DIR / "cache" / "launch_command.json"
 
 # Иконка для приложения в трее
 ICON_PATH = APP_DIR / "icons" / "noita.png"
+
+# Данные приложения, доступные только текущему пользователю (в отличие от общей
+# временной папки): LOCALAPPDATA на Windows, XDG_DATA_HOME на остальных системах
+if sys.platform == "win32":
+    USER_DATA_DIR = Path(os.environ.get("LOCALAPPDATA") or Path.home()) / "noita_saver"
+else:
+    USER_DATA_DIR = (
+        Path(os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share")
+        / "noita_saver"
+    )
+
+# Управляющий сокет демона: именованный канал на Windows, Unix-сокет на остальных системах.
+# Unix-сокет лежит в XDG_RUNTIME_DIR или во временной папке: длина его пути ограничена.
+# Клиенты проходят авторизацию ключом из файла в USER_DATA_DIR, доступного только
+# текущему пользователю
+if sys.platform == "win32":
+    CONTROL_ADDRESS = r"\\.\pipe\noita_saver"
+else:
+    CONTROL_ADDRESS = str(
+        Path(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir())
+        / f"noita_saver-{os.getuid()}.sock"
+    )
+CONTROL_KEY_PATH = USER_DATA_DIR / "control.key"
@@ -60,3 +60,40 @@ class DirectoryNotExist(BackupServiceError):
 
 class EmptyDirectoryError(BackupServiceError):
     """Попытка перенести данные из пустой папки."""
+
+
+class SnapshotNotFoundError(BackupServiceError):
+    """Запрошенный снапшот отсутствует в хранилище."""
+
+
+class CopyError(BackupServiceError):
+    """Не удалось скопировать часть файлов. Список ошибок хранится в 'failures'."""
+
+    def __init__(self, message: str, failures: list | None = None):
+        super().__init__(message)
+        self.failures = failures or []
+
+
+class SnapshotCorruptedError(BackupServiceError):
+    """Файлы снапшота в хранилище повреждены или отсутствуют. Их пути хранятся в 'paths'."""
+
+    def __init__(self, message: str, paths: list[str] | None = None):
+        super().__init__(message)
+        self.paths = paths or []
+
+
+class PackFormatError(BackupServiceError):
+    """Файл пака снапшота поврежден, имеет неизвестный формат или кодек недоступен."""
+
+
+class LiveSnapshotError(BackupServiceError):
+    """Сохранение изменилось во время бэкапа на ходу - снапшот отброшен."""
+
+
+class JournalError(BackupServiceError):
+    """Ошибка журнала операций: незавершенная операция или неверный порядок записи."""
+
+
+# -- УПРАВЛЯЮЩИЙ СОКЕТ
+class ControlError(NoitaError):
+    """Ошибка управляющего сокета: демон недоступен, неверный запрос или отказ в выполнении."""
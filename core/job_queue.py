@@ -0,0 +1,200 @@
+import time
+import queue
+import logging
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.exceptions import NoitaError
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    """
+    Задание в очереди: ключ для схлопывания дублей и вызываемая функция.
+    После выполнения в 'result' лежит результат функции, в 'error' - исключение.
+    """
+
+    key: str
+    func: Callable[[], Any]
+    submitted_at: float
+    result: Any = None
+    error: BaseException | None = None
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Ожидает выполнения задания.
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания (в секундах).
+                Defaults to None.
+
+        Returns:
+            bool: True если задание выполнено.
+        """
+        return self.done.wait(timeout)
+
+
+class JobQueue:
+    """
+    Очередь заданий с единственным рабочим потоком:
+    - задания выполняются строго по одному в порядке поступления
+    - постановка в очередь не блокирует вызывающий поток (например, поток хуков клавиатуры)
+    - пока задание с ключом ждет в очереди, повторные задания с тем же ключом
+      схлопываются в него; во время выполнения задания в очереди может ждать
+      не больше одного его повтора
+    - очередь ограничена: при переполнении новое задание отбрасывается
+    - ведутся глубина очереди, время ожидания и счетчики заданий
+    """
+
+    def __init__(self, maxsize: int = 4, name: str = "job_queue"):
+        if maxsize < 1:
+            raise ValueError("Недопустимый размер очереди")
+
+        self.name = name
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+        self._queue: queue.Queue[Job | None] = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._pending: dict[str, Job] = {}
+        self._running: str | None = None
+        self._worker: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Запускает рабочий поток, если он еще не запущен."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Останавливает рабочий поток после выполнения уже поставленных заданий.
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания потока
+                (в секундах). Defaults to None.
+        """
+        with self._lock:
+            worker = self._worker
+            self._worker = None
+        if worker is None:
+            return
+
+        # Маркер остановки ставится блокирующе: очередь освобождается рабочим потоком
+        self._queue.put(None)
+        worker.join(timeout)
+
+    def submit(self, key: str, func: Callable[[], Any]) -> Job | None:
+        """
+        Ставит задание в очередь и сразу возвращает управление.
+
+        Args:
+            key (str): Ключ задания, например "backup". Задания с одинаковым ключом,
+                ожидающие в очереди, схлопываются.
+            func (Callable[[], Any]): Функция задания.
+
+        Returns:
+            (Job | None): Поставленное задание или ожидающее, с которым оно схлопнуто;
+                None если очередь переполнена.
+        """
+        with self._lock:
+            if (pending := self._pending.get(key)) is not None:
+                self.coalesced += 1
+                logger.debug("Задание %s уже ждет в очереди, повтор схлопнут", key)
+                return pending
+
+            job = Job(key=key, func=func, submitted_at=time.monotonic())
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                logger.warning("Очередь заданий переполнена, задание %s отброшено", key)
+                return None
+
+            self._pending[key] = job
+            self.submitted += 1
+        return job
+
+    def join(self) -> None:
+        """Ожидает выполнения всех поставленных заданий."""
+        self._queue.join()
+
+    @property
+    def depth(self) -> int:
+        """
+        Возвращает количество заданий, ожидающих выполнения.
+
+        Returns:
+            int: Глубина очереди без выполняющегося задания.
+        """
+        with self._lock:
+            return len(self._pending)
+
+    @property
+    def stats(self) -> dict[str, int | float | str | None]:
+        """
+        Возвращает состояние и счетчики очереди.
+
+        Returns:
+            (dict[str, int | float | str | None]): Глубина очереди, выполняющееся задание,
+                счетчики заданий и время ожидания в очереди (в секундах).
+        """
+        with self._lock:
+            return {
+                "depth": len(self._pending),
+                "running": self._running,
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "last_wait": round(self.last_wait, 6),
+                "max_wait": round(self.max_wait, 6),
+            }
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+
+            with self._lock:
+                self._pending.pop(job.key, None)
+                self._running = job.key
+                self.last_wait = time.monotonic() - job.submitted_at
+                self.max_wait = max(self.max_wait, self.last_wait)
+
+            logger.debug("Задание %s ждало в очереди %.3f с", job.key, self.last_wait)
+            try:
+                job.result = job.func()
+            except Exception as err:
+                job.error = err
+                with self._lock:
+                    self.failed += 1
+                if isinstance(err, NoitaError):
+                    # Ошибки приложения ожидаемы и логируются самими заданиями
+                    logger.debug("Задание %s завершилось ошибкой: %s", job.key, err)
+                else:
+                    logger.exception("Задание %s завершилось ошибкой", job.key)
+            else:
+                with self._lock:
+                    self.completed += 1
+            finally:
+                with self._lock:
+                    self._running = None
+                job.done.set()
+                self._queue.task_done()
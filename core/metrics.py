@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+_current_cycle: ContextVar["CycleMetrics | None"] = ContextVar("current_cycle", default=None)
+
+
+@dataclass
+class CycleMetrics:
+    """Замеры одного цикла бэкапа/восстановления: длительности фаз и счетчики."""
+
+    kind: str
+    started_at: float
+    duration: float = 0.0
+    success: bool = True
+    error: str | None = None
+    phases: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_counter(self, name: str, value: int) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "duration": round(self.duration, 6),
+            "success": self.success,
+            "error": self.error,
+            "phases": {name: round(value, 6) for name, value in self.phases.items()},
+            "counters": self.counters,
+        }
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Замеряет длительность фазы текущего цикла. Вне цикла ничего не делает,
+    поэтому вызывать можно из любого кода без проверок.
+
+    Args:
+        name (str): Название фазы.
+    """
+    cycle = _current_cycle.get()
+    if cycle is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        cycle.add_phase(name, time.perf_counter() - start)
+
+
+def add_counter(name: str, value: int = 1) -> None:
+    """
+    Увеличивает счетчик текущего цикла. Вне цикла ничего не делает.
+
+    Args:
+        name (str): Название счетчика.
+        value (int, optional): Прибавляемое значение. Defaults to 1.
+    """
+    if (cycle := _current_cycle.get()) is not None:
+        cycle.add_counter(name, value)
+
+
+class MetricsRecorder:
+    """
+    Сборщик замеров циклов бэкапа/восстановления:
+    - каждый цикл дописывается строкой в JSON-lines файл с ротацией по размеру
+    - агрегаты с момента запуска выгружаются в текстовый файл формата Prometheus
+      (для node_exporter textfile collector), файл подменяется атомарно
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Path,
+        prom_path: Path,
+        max_bytes: int = 5_000_000,
+        recent_size: int = 20,
+    ):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._cycles_total: dict[tuple[str, str], int] = defaultdict(int)
+        self._last_duration: dict[str, float] = {}
+        self._last_timestamp: dict[str, float] = {}
+        self._last_phase: dict[tuple[str, str], float] = {}
+        self._phase_sum: dict[tuple[str, str], float] = defaultdict(float)
+        self._phase_count: dict[tuple[str, str], int] = defaultdict(int)
+        self._counters_total: dict[tuple[str, str], int] = defaultdict(int)
+        self._recent: deque[dict] = deque(maxlen=recent_size)
+
+    @contextmanager
+    def cycle(self, kind: str) -> Iterator[CycleMetrics]:
+        """
+        Открывает цикл замеров: фазы и счетчики внутри блока попадают в этот цикл.
+        Исключение помечает цикл неуспешным и пробрасывается дальше.
+
+        Args:
+            kind (str): Вид цикла, например "backup" или "restore".
+
+        Yields:
+            CycleMetrics: Замеры цикла.
+        """
+        metrics = CycleMetrics(kind=kind, started_at=time.time())
+        token = _current_cycle.set(metrics)
+        start = time.perf_counter()
+        try:
+            yield metrics
+        except BaseException as e:
+            metrics.success = False
+            metrics.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            metrics.duration = time.perf_counter() - start
+            _current_cycle.reset(token)
+            self.record(metrics)
+
+    def record(self, metrics: CycleMetrics) -> None:
+        """
+        Сохраняет замеры цикла в JSON-lines файл и обновляет файл Prometheus.
+        Ошибки записи только логируются - метрики не должны ломать бэкап.
+
+        Args:
+            metrics (CycleMetrics): Замеры цикла.
+        """
+        with self._lock:
+            self._aggregate(metrics)
+            try:
+                self._append_jsonl(metrics)
+                self._write_prometheus()
+            except OSError as err:
+                logger.warning("Не удалось сохранить метрики цикла: %s", err)
+
+    def summary(self) -> dict:
+        """
+        Возвращает агрегаты с момента запуска и последние циклы - те же данные,
+        что выгружаются в файл Prometheus, но в виде словаря.
+
+        Returns:
+            dict: Количество циклов по видам и результатам, длительности последних
+                циклов, средние длительности фаз, счетчики и последние циклы.
+        """
+        with self._lock:
+            return {
+                "cycles_total": {
+                    f"{kind}:{result}": value
+                    for (kind, result), value in sorted(self._cycles_total.items())
+                },
+                "last_duration": {
+                    kind: round(value, 6) for kind, value in sorted(self._last_duration.items())
+                },
+                "phase_mean": {
+                    f"{kind}:{phase}": round(value / self._phase_count[(kind, phase)], 6)
+                    for (kind, phase), value in sorted(self._phase_sum.items())
+                },
+                "counters_total": {
+                    f"{kind}:{counter}": value
+                    for (kind, counter), value in sorted(self._counters_total.items())
+                },
+                "recent": list(self._recent),
+            }
+
+    def _aggregate(self, metrics: CycleMetrics) -> None:
+        kind = metrics.kind
+        result = "success" if metrics.success else "failure"
+
+        self._cycles_total[(kind, result)] += 1
+        self._last_duration[kind] = metrics.duration
+        self._last_timestamp[kind] = metrics.started_at
+        for phase, seconds in metrics.phases.items():
+            self._last_phase[(kind, phase)] = seconds
+            self._phase_sum[(kind, phase)] += seconds
+            self._phase_count[(kind, phase)] += 1
+        for counter, value in metrics.counters.items():
+            self._counters_total[(kind, counter)] += value
+        self._recent.append(metrics.to_dict())
+
+    def _append_jsonl(self, metrics: CycleMetrics) -> None:
+        self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.jsonl_path.exists() and self.jsonl_path.stat().st_size >= self.max_bytes:
+            os.replace(self.jsonl_path, self.jsonl_path.with_name(f"{self.jsonl_path.name}.1"))
+
+        with open(self.jsonl_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n")
+
+    def _write_prometheus(self) -> None:
+        lines = [
+            "# HELP noita_saver_cycles_total Количество циклов бэкапа/восстановления.",
+            "# TYPE noita_saver_cycles_total counter",
+        ]
+        for (kind, result), value in sorted(self._cycles_total.items()):
+            lines.append(f'noita_saver_cycles_total{{kind="{kind}",result="{result}"}} {value}')
+
+        lines += [
+            "# HELP noita_saver_last_cycle_duration_seconds Длительность последнего цикла.",
+            "# TYPE noita_saver_last_cycle_duration_seconds gauge",
+        ]
+        for kind, value in sorted(self._last_duration.items()):
+            lines.append(
+                f'noita_saver_last_cycle_duration_seconds{{kind="{kind}"}} {value:.6f}'
+            )
+
+        lines += [
+            "# HELP noita_saver_last_cycle_timestamp_seconds Время начала последнего цикла.",
+            "# TYPE noita_saver_last_cycle_timestamp_seconds gauge",
+        ]
+        for kind, value in sorted(self._last_timestamp.items()):
+            lines.append(
+                f'noita_saver_last_cycle_timestamp_seconds{{kind="{kind}"}} {value:.3f}'
+            )
+
+        lines += [
+            "# HELP noita_saver_last_phase_duration_seconds Длительность фазы последнего цикла.",
+            "# TYPE noita_saver_last_phase_duration_seconds gauge",
+        ]
+        for (kind, phase), value in sorted(self._last_phase.items()):
+            lines.append(
+                f'noita_saver_last_phase_duration_seconds{{kind="{kind}",phase="{phase}"}} '
+                f"{value:.6f}"
+            )
+
+        lines += [
+            "# HELP noita_saver_phase_duration_seconds Суммарная длительность фаз.",
+            "# TYPE noita_saver_phase_duration_seconds summary",
+        ]
+        for (kind, phase), value in sorted(self._phase_sum.items()):
+            labels = f'kind="{kind}",phase="{phase}"'
+            lines.append(f"noita_saver_phase_duration_seconds_sum{{{labels}}} {value:.6f}")
+            lines.append(
+                f"noita_saver_phase_duration_seconds_count{{{labels}}} "
+                f"{self._phase_count[(kind, phase)]}"
+            )
+
+        lines += [
+            "# HELP noita_saver_copied_total Скопированные файлы и байты.",
+            "# TYPE noita_saver_copied_total counter",
+        ]
+        for (kind, counter), value in sorted(self._counters_total.items()):
+            lines.append(f'noita_saver_copied_total{{kind="{kind}",unit="{counter}"}} {value}')
+
+        self.prom_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.prom_path.with_name(f"{self.prom_path.name}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp_path, self.prom_path)
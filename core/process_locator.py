@@ -0,0 +1,83 @@
+import psutil
+import threading
+
+
+class ProcessLocator:
+    """
+    Поиск процесса по имени с кэшем последнего найденного PID:
+    - сначала проверяется запомненный процесс (PID + время создания), без обхода системы
+    - при промахе процессы обходятся с запросом только имени; недоступные процессы
+      пропускаются, а не прерывают поиск
+    - ведутся счетчики попаданий и промахов кэша
+    """
+
+    def __init__(self, process_name: str):
+        self.process_name = process_name
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._cached: psutil.Process | None = None
+
+    def find(self) -> psutil.Process | None:
+        """
+        Ищет работающий процесс с заданным именем.
+
+        Returns:
+            (psutil.Process | None): Объект процесса, если найден, иначе None.
+        """
+        with self._lock:
+            if self._cached is not None and self._is_cached_alive():
+                self.hits += 1
+                return self._cached
+
+            self.misses += 1
+            self._cached = self._scan()
+            return self._cached
+
+    def remember(self, process: psutil.Process) -> None:
+        """
+        Запоминает заранее известный процесс, например только что запущенный.
+
+        Args:
+            process (psutil.Process): Объект процесса.
+        """
+        with self._lock:
+            self._cached = process
+
+    def forget(self) -> None:
+        """Сбрасывает запомненный процесс."""
+        with self._lock:
+            self._cached = None
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """
+        Возвращает счетчики попаданий и промахов кэша.
+
+        Returns:
+            (dict[str, int]): Словарь со значениями 'hits' и 'misses'.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _is_cached_alive(self) -> bool:
+        try:
+            # is_running() сверяет время создания, так что переиспользованный PID не пройдет
+            return (
+                self._cached.is_running()
+                and self._cached.status() != psutil.STATUS_ZOMBIE
+                and self._cached.name() == self.process_name
+            )
+        except (
+            psutil.NoSuchProcess,
+            psutil.AccessDenied,
+            psutil.ZombieProcess,
+        ):
+            return False
+
+    def _scan(self) -> psutil.Process | None:
+        # С attrs process_iter сам подавляет AccessDenied/ZombieProcess, подставляя None
+        for proc in psutil.process_iter(["name"]):
+            if proc.info["name"] == self.process_name:
+                return proc
+        return None
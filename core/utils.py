@@ -1,29 +1,12 @@
-import psutil
 import re
 import os
+import shutil
+import logging
+import threading
+from datetime import datetime
 from pathlib import Path
 
-
-def get_process_by_name(process_name: str) -> psutil.Process | None:
-    """
-    Функция поиска процесса по имени.
-
-    Args:
-        process_name (str): Имя процесса для происка.
-
-    Returns:
-        (psutil.Process | None): Объект процесса, если найден, иначе None.
-    """
-    for proc in psutil.process_iter(["pid", "name", "exe"]):
-        try:
-            if proc.name() == process_name:
-                return proc
-        except (
-            psutil.NoSuchProcess,
-            psutil.AccessDenied,
-            psutil.ZombieProcess,
-        ):
-            return None
+logger = logging.getLogger(__name__)
 
 
 def has_files(path: str | Path) -> bool:
@@ -46,21 +29,137 @@ def has_files(path: str | Path) -> bool:
     return any(obj.is_file() for obj in path.iterdir())
 
 
-# TODO: Добавить использование этой функции в cmdline_resolver
-def get_steam_library_paths_windows() -> list[Path]:
-    program_files = os.getenv("PROGRAMFILES(X86)")
-    if not program_files:
-        program_files = Path("C:/Program Files (x86)")
-        if not program_files.exists() or not program_files.is_dir():
-            return []
+def scan_tree(root: str | Path) -> tuple[dict[str, os.stat_result], list[str]]:
+    """
+    Функция рекурсивного обхода папки за один проход через os.scandir.
+
+    Пути возвращаются относительными к 'root' и всегда с разделителем '/', чтобы манифесты
+    не зависели от ОС.
+
+    Args:
+        root (str | Path): Путь к папке.
+
+    Returns:
+        (tuple[dict[str, os.stat_result], list[str]]): Словарь файлов (путь -> stat)
+            и список вложенных папок.
+    """
+    files: dict[str, os.stat_result] = {}
+    dirs: list[str] = []
+    stack: list[tuple[str, str]] = [(os.fspath(root), "")]
+
+    while stack:
+        abs_dir, rel_dir = stack.pop()
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}{entry.name}"
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(rel_path)
+                    stack.append((entry.path, f"{rel_path}/"))
+                elif entry.is_file(follow_symlinks=False):
+                    files[rel_path] = entry.stat(follow_symlinks=False)
+
+    return files, dirs
+
+
+def swap_directory(staging: Path, target: Path) -> Path | None:
+    """
+    Функция атомарной подмены папки 'target' полностью подготовленной папкой 'staging'.
+
+    Старая папка не удаляется, а переименовывается рядом с 'target' - удалить её можно
+    позже, не задерживая вызывающий код.
+
+    Args:
+        staging (Path): Подготовленная папка. Должна лежать рядом с 'target'.
+        target (Path): Папка, которую нужно подменить.
+
+    Returns:
+        (Path | None): Путь к старой папке, если 'target' существовала, иначе None.
+    """
+    old = None
+    if target.exists():
+        old = target.with_name(
+            f"{target.name}.old-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        )
+        target.rename(old)
+
+    staging.rename(target)
+    return old
+
+
+def remove_tree_in_background(path: Path) -> threading.Thread:
+    """
+    Функция удаления папки в фоновом потоке.
+
+    Args:
+        path (Path): Путь к папке.
+
+    Returns:
+        threading.Thread: Запущенный поток удаления.
+    """
+
+    def remove() -> None:
+        shutil.rmtree(path, ignore_errors=True)
+        logger.debug("Папка %s удалена в фоне", path)
+
+    thread = threading.Thread(target=remove, name="tree_remover", daemon=True)
+    thread.start()
+    return thread
+
+
+def parse_vdf(text: str) -> dict:
+    """
+    Функция разбора текстового формата Valve KeyValues (libraryfolders.vdf, *.acf).
+
+    Args:
+        text (str): Содержимое файла.
+
+    Returns:
+        dict: Вложенные словари; значения - строки или словари.
+    """
+    root: dict = {}
+    stack = [root]
+    key = None
+
+    for match in re.finditer(r'"((?:[^"\\]|\\.)*)"|([{}])', text):
+        token, brace = match.groups()
+        if brace == "{":
+            child = {}
+            stack[-1][key] = child
+            stack.append(child)
+            key = None
+        elif brace == "}":
+            if len(stack) > 1:
+                stack.pop()
+            key = None
+        elif key is None:
+            key = token
+        else:
+            stack[-1][key] = token.replace("\\\\", "\\")
+            key = None
+
+    return root
 
-    library_folders_file = (
-        Path(program_files) / "Steam" / "steamapps" / "libraryfolders.vdf"
-    )
-    if not library_folders_file.exists():
-        return []
 
-    raw = library_folders_file.read_text(encoding="utf-8", errors="ignore")
+def read_steam_libraries(vdf_path: Path) -> dict[Path, set[str]]:
+    """
+    Функция чтения библиотек Steam из libraryfolders.vdf за один проход.
+
+    Args:
+        vdf_path (Path): Путь к libraryfolders.vdf.
+
+    Returns:
+        (dict[Path, set[str]]): Папки библиотек и идентификаторы установленных в них игр.
+            Для старого формата файла, где игры не перечислены, множество пустое.
+    """
+    data = parse_vdf(vdf_path.read_text(encoding="utf-8", errors="ignore"))
+    folders = data.get("libraryfolders") or data.get("LibraryFolders") or {}
 
-    paths = re.findall(r'"path"\s+"([^"]+)"', raw)
-    return [Path(p) for p in paths]
+    libraries: dict[Path, set[str]] = {}
+    for value in folders.values():
+        if isinstance(value, dict) and "path" in value:
+            apps = value.get("apps")
+            libraries[Path(value["path"])] = set(apps) if isinstance(apps, dict) else set()
+        elif isinstance(value, str) and not value.isdigit():
+            # Старый формат: "1" "D:\\SteamLibrary"
+            libraries[Path(value)] = set()
+    return libraries
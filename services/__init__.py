@@ -1,9 +1,36 @@
-from .backup_service import BackupService
-from .noita_manager import NoitaManager
-from .noita_process import NoitaProcess
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .backup_service import BackupService
+    from .cmdline_resolver import CmdlineResolver
+    from .noita_manager import NoitaManager
+    from .noita_process import NoitaProcess
+    from .snapshot_store import SnapshotStore
 
 __all__ = [
     "BackupService",
+    "CmdlineResolver",
     "NoitaManager",
     "NoitaProcess",
+    "SnapshotStore",
 ]
+
+# Модули загружаются при первом обращении к классу: импорт пакета не тянет за собой
+# psutil, sqlite3 и остальные зависимости сервисов, пока они не нужны
+_LAZY_IMPORTS = {
+    "BackupService": ".backup_service",
+    "CmdlineResolver": ".cmdline_resolver",
+    "NoitaManager": ".noita_manager",
+    "NoitaProcess": ".noita_process",
+    "SnapshotStore": ".snapshot_store",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
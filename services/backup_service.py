@@ -1,35 +1,125 @@
 import shutil
 import logging
+from enum import Enum
 from pathlib import Path
 
-from core.utils import has_files
+from core import metrics
+from core.utils import (
+    has_files,
+    scan_tree,
+    swap_directory,
+    remove_tree_in_background,
+)
 from core.exceptions import (
+    CopyError,
     DirectoryNotExist,
     EmptyDirectoryError,
+    LiveSnapshotError,
+    SnapshotNotFoundError,
+    SnapshotCorruptedError,
 )
 from config.paths import (
     NOITA_SAVES_DIR,
     BACKUP_SAVES_DIR,
 )
+from services.change_tracker import ChangeTracker
+from services.copy_engine import (
+    CopyEngine,
+    DEFAULT_COPY_WORKERS,
+)
+from services.journal import (
+    JOURNAL_FILE_NAME,
+    KIND_BACKUP,
+    KIND_RESTORE_DELTA,
+    KIND_RESTORE_FULL,
+    PHASE_COPY,
+    PHASE_SWAP,
+    JournalState,
+)
+from services.manifest import (
+    Snapshot,
+    SnapshotInfo,
+)
+from services.pack import (
+    PackExporter,
+    import_pack,
+    write_pack,
+)
+from services.prestager import Prestager
+from services.snapshot_diff import (
+    SnapshotDiff,
+    diff_folder,
+)
+from services.retention import (
+    RetentionPolicy,
+    apply_retention,
+)
+from services.snapshot_store import (
+    SnapshotStore,
+    OBJECTS_DIR_NAME,
+    SNAPSHOTS_DIR_NAME,
+    CATALOG_FILE_NAME,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
+class RestoreMode(Enum):
+    """Способ восстановления сохранения из снапшота."""
+
+    # Разворачивание снапшота в соседнюю папку и подмена save00 переименованием
+    FULL = "full"
+    # Перезапись только отличающихся файлов и удаление лишних
+    DELTA = "delta"
+
+
 class BackupService:
     """
     Бэкап-сервис для игры Noita позволяющий:
     - создавать бэкап папки сохранений.
     - восстанавливать сохранение из бэкапа.
+
+    Бэкапы хранятся в контентно-адресуемом хранилище SnapshotStore, поэтому время и место
+    на диске растут только с объемом измененных файлов. Хранится несколько поколений
+    бэкапов, старые удаляются по политике RetentionPolicy. С 'track_changes' = True
+    измененные файлы отслеживаются ChangeTracker'ом между бэкапами, и бэкап не обходит
+    всю папку сохранения. Если задан 'pack_dir', последний бэкап дополнительно
+    экспортируется в сжатый пак в фоне (см. request_pack_export).
+
+    Бэкап и восстановление ведутся в журнале хранилища; операция, прерванная сбоем,
+    доводится до конца или откатывается в начале следующей (см. recover_interrupted).
     """
 
     def __init__(
         self,
         saves_dir: Path = NOITA_SAVES_DIR,
         backup_dir: Path = BACKUP_SAVES_DIR,
+        copy_workers: int = DEFAULT_COPY_WORKERS,
+        prestage: bool = True,
+        retention: RetentionPolicy = RetentionPolicy(),
+        track_changes: bool = False,
+        pack_dir: Path | None = None,
     ):
         self.saves_dir = saves_dir
         self.backup_dir = backup_dir
+        self.store = SnapshotStore(root=backup_dir, engine=CopyEngine(copy_workers))
+        self.retention = retention
+        self.prestager = Prestager(self.store, saves_dir) if prestage else None
+        # Без отслеживания изменений (или на ОС без него) папка обходится целиком
+        self.tracker = (
+            ChangeTracker(saves_dir)
+            if track_changes and ChangeTracker.is_supported()
+            else None
+        )
+        self.pack_exporter = PackExporter(self.store, pack_dir) if pack_dir else None
+
+        # Снапшот, относительно которого ChangeTracker копит изменения
+        self._tracked_snapshot_id: str | None = None
+        # Время создания последнего бэкапа: читается из каталога при первом обращении,
+        # дальше обновляется бэкапами этого сервиса
+        self._last_backup_at: float | None = None
+        self._last_backup_loaded = False
 
     def backup(self) -> None:
         """
@@ -38,22 +128,384 @@ class BackupService:
         Raises:
             DirectoryNotExist: Если не существует папки с актуальным сохранением.
             EmptyDirectoryError: Если папка сохранения пуста.
+            CopyError: Если часть файлов не удалось сохранить в хранилище.
         """
+        with metrics.span("recover"):
+            self.recover_interrupted()
+            self._recover_interrupted_swap()
         self._dir_and_files_exist_or_raise(self.saves_dir)
-        self._swap_folders(src=self.saves_dir, dst=self.backup_dir)
-        logger.info("Создан бэкап сохранения.")
+        self._migrate_legacy_backup()
+
+        latest_id = self.store.catalog.latest_id()
+        snapshot = self._create_snapshot()
+        if snapshot.snapshot_id == latest_id:
+            logger.info("Сохранение не изменилось с бэкапа %s", latest_id)
+            return
+
+        self._remember_backup(snapshot.created_at)
+        with metrics.span("retention"):
+            apply_retention(self.store, self.retention)
+        logger.info("Создан бэкап сохранения: %s", snapshot.snapshot_id)
+
+        self._request_prestage()
+
+    def backup_live(self) -> None:
+        """
+        Создает бэкап, пока игра работает. После копирования размеры и mtime файлов
+        сверяются с созданным снапшотом: если за время копирования что-то записалось,
+        снапшот отбрасывается.
+
+        Raises:
+            DirectoryNotExist: Если не существует папки с актуальным сохранением.
+            EmptyDirectoryError: Если папка сохранения пуста.
+            CopyError: Если часть файлов не удалось сохранить в хранилище.
+            LiveSnapshotError: Если сохранение изменилось во время копирования или
+                прерванное восстановление можно довести только с закрытой игрой.
+        """
+        with metrics.span("recover"):
+            # Игра работает - прерванное восстановление нельзя доводить в ее папке сохранения
+            self.recover_interrupted(touch_saves=False)
+            if self.store.journal.pending:
+                # Пока журнал не закрыт, новую операцию не начать: нужен цикл с закрытием игры
+                raise LiveSnapshotError(
+                    "Прерванное восстановление доводится только с закрытой игрой."
+                )
+            self._recover_interrupted_swap()
+        self._dir_and_files_exist_or_raise(self.saves_dir)
+        self._migrate_legacy_backup()
+
+        latest_id = self.store.catalog.latest_id()
+        snapshot = self._create_snapshot()
+        if snapshot.snapshot_id == latest_id:
+            # Хэши совпали с уже проверенным снапшотом - он целостен и сверка не нужна
+            logger.info("Сохранение не изменилось с бэкапа %s", latest_id)
+            return
+
+        with metrics.span("live_check"):
+            changed = self._changed_since(snapshot)
+        if changed:
+            self.store.delete(snapshot.snapshot_id)
+            if self.tracker:
+                self.tracker.invalidate()
+            raise LiveSnapshotError(
+                f"Во время бэкапа изменились файлы сохранения ({len(changed)}), "
+                f"например: {changed[0]}"
+            )
+
+        self._remember_backup(snapshot.created_at)
+        with metrics.span("retention"):
+            apply_retention(self.store, self.retention)
+        logger.info("Создан бэкап сохранения без закрытия игры: %s", snapshot.snapshot_id)
+
+        self._request_prestage()
+
+    def restore(
+        self,
+        snapshot_id: str | None = None,
+        mode: RestoreMode = RestoreMode.DELTA,
+        verify_hash: bool = False,
+        verify: bool = True,
+    ) -> None:
+        """
+        Восстанавливает сохранение из бэкапа. Если готова подготовленная копия этого
+        бэкапа и она совпадает с манифестом по файлам, размерам и mtime - восстановление
+        сводится к переименованию папок с тем же результатом, что и RestoreMode.FULL.
+        С 'verify_hash' копия не используется: содержимое сверяется при восстановлении
+        из хранилища. Перед восстановлением проверяется целостность бэкапа, и текущее
+        сохранение не трогается, если бэкап поврежден.
+
+        Args:
+            snapshot_id (str | None, optional): Идентификатор поколения бэкапа.
+                Defaults to None - последний бэкап.
+            mode (RestoreMode, optional): Способ восстановления. Defaults to RestoreMode.DELTA.
+            verify_hash (bool, optional): Для RestoreMode.DELTA - сверять хэш содержимого
+                файлов с совпавшими размером и mtime. Defaults to False.
+            verify (bool, optional): Проверять целостность бэкапа в хранилище.
+                Defaults to True.
+
+        Raises:
+            SnapshotNotFoundError: Если в хранилище нет ни одного бэкапа
+                или бэкапа с идентификатором 'snapshot_id'.
+            SnapshotCorruptedError: Если файлы бэкапа в хранилище повреждены или отсутствуют.
+            CopyError: Если часть файлов не удалось восстановить.
+        """
+        with metrics.span("recover"):
+            self.recover_interrupted()
+            self._recover_interrupted_swap()
+        self._migrate_legacy_backup()
+
+        if snapshot_id is not None:
+            snapshot = self.store.load(snapshot_id)
+        elif not (snapshot := self.store.latest()):
+            raise SnapshotNotFoundError(
+                f"В хранилище {self.backup_dir} нет ни одного бэкапа."
+            )
+
+        if verify:
+            with metrics.span("verify"):
+                damaged = self.store.verify(snapshot)
+            if damaged:
+                raise SnapshotCorruptedError(
+                    f"Бэкап {snapshot.snapshot_id} поврежден, файлов с ошибками: {len(damaged)}. "
+                    "Восстановление отменено.",
+                    paths=damaged,
+                )
+
+        swapped = False
+        if self.prestager and not verify_hash:
+            # Подмена равносильна RestoreMode.FULL: сохранение целиком заменяется копией,
+            # сверенной с манифестом по размерам и mtime
+            with metrics.span("swap"):
+                swapped = self.prestager.try_swap_in(snapshot)
+        if not swapped:
+            self._restore_from_store(snapshot, mode=mode, verify_hash=verify_hash)
+
+        self.store.mark_restored(snapshot.snapshot_id)
+        logger.info("Сохранение восстановлено из бэкапа: %s", snapshot.snapshot_id)
+
+        self._request_prestage()
+
+    def request_pack_export(self) -> None:
+        """
+        Запрашивает фоновый экспорт последнего бэкапа в пак. Вызывается после
+        перезапуска игры, чтобы сжатие не задерживало цикл. Без 'pack_dir' ничего не делает.
+        """
+        if self.pack_exporter:
+            self.pack_exporter.request_export()
+
+    def export_pack(
+        self,
+        path: Path,
+        snapshot_id: str | None = None,
+        codec: str | None = None,
+    ) -> int:
+        """
+        Экспортирует бэкап в один сжатый файл-пак.
+
+        Args:
+            path (Path): Путь к файлу пака.
+            snapshot_id (str | None, optional): Идентификатор поколения бэкапа.
+                Defaults to None - последний бэкап.
+            codec (str | None, optional): Кодек сжатия: "zstd", "lzma" или "zlib".
+                Defaults to None - zstd, если доступен, иначе zlib.
+
+        Raises:
+            SnapshotNotFoundError: Если бэкапа нет в хранилище.
+            PackFormatError: Если кодек неизвестен или недоступен.
+
+        Returns:
+            int: Размер пака в байтах.
+        """
+        if snapshot_id is not None:
+            snapshot = self.store.load(snapshot_id)
+        elif not (snapshot := self.store.latest()):
+            raise SnapshotNotFoundError(
+                f"В хранилище {self.backup_dir} нет ни одного бэкапа."
+            )
+        return write_pack(self.store, snapshot, path, codec=codec)
+
+    def import_pack(self, path: Path) -> SnapshotInfo:
+        """
+        Импортирует бэкап из файла-пака в хранилище как отдельное поколение.
+
+        Args:
+            path (Path): Путь к файлу пака.
+
+        Raises:
+            PackFormatError: Если пак поврежден или такой бэкап уже есть в хранилище.
+            SnapshotCorruptedError: Если содержимое файла в паке не совпало с хэшем.
+
+        Returns:
+            SnapshotInfo: Сведения об импортированном бэкапе.
+        """
+        snapshot = import_pack(self.store, path)
+        self._remember_backup(snapshot.created_at)
+        return SnapshotInfo(
+            snapshot_id=snapshot.snapshot_id,
+            created_at=snapshot.created_at,
+            last_restored_at=snapshot.last_restored_at,
+            file_count=len(snapshot.files),
+            total_size=snapshot.total_size,
+        )
+
+    def recover_interrupted(self, touch_saves: bool = True) -> bool:
+        """
+        Проверяет журнал операций и, если предыдущий бэкап или восстановление прервались
+        сбоем, доводит операцию до конца или откатывает ее, а затем сверяет хранилище
+        (SnapshotStore.collect_garbage):
+        - бэкап доводится, если файлы сохранения не изменились с начала операции,
+          иначе сохраненные им объекты удаляются
+        - восстановление доводится: копируются только файлы, не отмеченные в журнале,
+          так что папка сохранения не остается записанной наполовину; подготовленная
+          рядом копия, если бэкапа для нее уже нет, удаляется, а сохранение не трогается
+
+        Args:
+            touch_saves (bool, optional): Можно ли менять папку сохранения. Если нельзя
+                (игра запущена), прерванное восстановление откладывается. Defaults to True.
+
+        Returns:
+            bool: True если найдена и завершена прерванная операция.
+        """
+        if not (state := self.store.journal.load()):
+            return False
+
+        if state.kind == KIND_BACKUP:
+            self._recover_backup(state)
+        elif not touch_saves:
+            logger.info("Прерванное восстановление будет доведено, когда игра будет закрыта.")
+            return False
+        elif state.kind == KIND_RESTORE_DELTA:
+            self._recover_restore(state)
+        elif state.kind == KIND_RESTORE_FULL:
+            self._recover_staged_restore(state)
+        else:
+            logger.warning("Неизвестная операция в журнале: %s, журнал удален", state.kind)
+            self.store.journal.finish()
+
+        # После сбоя каталог мог разойтись с манифестами, а объекты - остаться без ссылок
+        self.store.collect_garbage()
+        return True
+
+    def has_changes(self) -> bool:
+        """
+        Проверяет, изменилось ли сохранение с последнего бэкапа: набор файлов,
+        их размеры и mtime сверяются с манифестом без чтения содержимого.
 
-    def restore(self) -> None:
+        Returns:
+            bool: True если бэкапа еще нет или сохранение от него отличается;
+                False если папки сохранения нет или она пуста.
         """
-        Восстанавливает сохранение из бэкапа.
+        if not self.saves_dir.is_dir() or not has_files(self.saves_dir):
+            return False
+        self._migrate_legacy_backup()
+        if not (snapshot := self.store.latest()):
+            return True
+        return bool(self._changed_since(snapshot))
+
+    def diff(
+        self,
+        old_id: str | None = None,
+        new_id: str | None = None,
+        verify_hash: bool = False,
+    ) -> SnapshotDiff:
+        """
+        Сравнивает два состояния сохранения: поколения бэкапов или бэкап и папку
+        сохранения. Снапшоты сравниваются по каталогу без чтения файлов, папка - по размеру
+        и mtime, а с 'verify_hash' = True - по хэшу содержимого. Без обоих идентификаторов
+        показывает, что изменилось в папке сохранения с последнего бэкапа; отличия
+        папки сохранения от бэкапа - то, что перезапишет восстановление.
+
+        Args:
+            old_id (str | None, optional): Старый снапшот. Defaults to None - папка сохранения.
+            new_id (str | None, optional): Новый снапшот. Defaults to None - папка сохранения.
+            verify_hash (bool, optional): Сверять содержимое файлов папки сохранения
+                по хэшу. Defaults to False.
 
         Raises:
-            DirectoryNotExist: Если не существует папки с бэкапом.
-            EmptyDirectoryError: Если папка бэкапа пуста.
+            SnapshotNotFoundError: Если снапшота нет в хранилище или бэкапов нет вовсе.
+
+        Returns:
+            SnapshotDiff: Отличия нового состояния от старого.
+        """
+        if old_id is None and new_id is None:
+            if (old_id := self.store.catalog.latest_id()) is None:
+                raise SnapshotNotFoundError(
+                    f"В хранилище {self.backup_dir} нет ни одного бэкапа."
+                )
+
+        if old_id is not None and new_id is not None:
+            return self.store.diff(old_id, new_id)
+        if new_id is None:
+            return diff_folder(self.store.load(old_id), self.saves_dir, verify_hash)
+        return diff_folder(self.store.load(new_id), self.saves_dir, verify_hash).reversed()
+
+    @property
+    def last_backup_at(self) -> float | None:
+        """
+        Возвращает время создания последнего бэкапа без запроса к каталогу
+        (каталог читается только при первом обращении).
+
+        Returns:
+            (float | None): Время в секундах с начала эпохи; None если бэкапов нет.
+        """
+        if not self._last_backup_loaded:
+            snapshots = self.store.list_snapshots()
+            if snapshots:
+                self._remember_backup(snapshots[-1].created_at)
+            self._last_backup_loaded = True
+        return self._last_backup_at
+
+    def close(self) -> None:
+        """Останавливает отслеживание изменений. Вызывается при завершении приложения."""
+        if self.tracker:
+            self.tracker.stop()
+
+    def list_snapshots(self) -> list[SnapshotInfo]:
+        """
+        Возвращает доступные поколения бэкапов.
+
+        Returns:
+            list[SnapshotInfo]: Сведения о снапшотах в порядке создания.
+        """
+        return self.store.list_snapshots()
+
+    def _request_prestage(self) -> None:
+        if self.prestager:
+            with metrics.span("prestage"):
+                self.prestager.request_refresh()
+
+    def _remember_backup(self, created_at: float) -> None:
+        if self._last_backup_at is None or created_at > self._last_backup_at:
+            self._last_backup_at = created_at
+
+    def _create_snapshot(self) -> Snapshot:
+        """
+        Создает снапшот папки сохранения. Если трекер изменений ведет учет с последнего
+        снапшота - проверяются только измененные файлы, иначе папка обходится целиком.
+        """
+        if not self.tracker:
+            return self.store.create_snapshot(self.saves_dir)
+
+        changed_paths = self.tracker.take()
+        # Изменения копятся относительно последнего снапшота, созданного этим сервисом
+        if self.store.catalog.latest_id() != self._tracked_snapshot_id:
+            changed_paths = None
+
+        try:
+            snapshot = self.store.create_snapshot(self.saves_dir, changed_paths=changed_paths)
+        except BaseException:
+            self.tracker.invalidate()
+            raise
+
+        self._tracked_snapshot_id = snapshot.snapshot_id
+        logger.debug(
+            "Изменения для бэкапа: %s",
+            "полный обход" if changed_paths is None else f"путей - {len(changed_paths)}",
+        )
+        return snapshot
+
+    def _changed_since(self, snapshot: Snapshot, folder: Path | None = None) -> list[str]:
         """
-        self._dir_and_files_exist_or_raise(self.backup_dir)
-        self._swap_folders(src=self.backup_dir, dst=self.saves_dir)
-        logger.info("Сохранение восстановлено из бэкапа.")
+        Сверяет папку сохранения со снапшотом по набору файлов, размеру и mtime.
+
+        Args:
+            snapshot (Snapshot): Снапшот для сверки.
+            folder (Path | None, optional): Папка для сверки. Defaults to None - папка
+                сохранения.
+
+        Returns:
+            list[str]: Пути, которые отличаются от снапшота.
+        """
+        files, _ = scan_tree(folder or self.saves_dir)
+        changed = [
+            rel_path
+            for rel_path, stat in files.items()
+            if (entry := snapshot.files.get(rel_path)) is None
+            or entry.size != stat.st_size
+            or entry.mtime_ns != stat.st_mtime_ns
+        ]
+        changed += [rel_path for rel_path in snapshot.files if rel_path not in files]
+        return sorted(changed)
 
     def _dir_and_files_exist_or_raise(self, folder_path: Path) -> None:
         """
@@ -76,18 +528,165 @@ class BackupService:
                 f"Папка по пути: {folder_path} не содержит файлов"
             )
 
-    # Необходимо убедиться в существовании папки 'src'
-    def _swap_folders(self, src: Path, dst: Path) -> None:
+    def _restore_from_store(
+        self,
+        snapshot: Snapshot,
+        mode: RestoreMode,
+        verify_hash: bool,
+    ) -> None:
+        if mode is RestoreMode.DELTA:
+            written, deleted = self.store.sync_to(
+                snapshot, self.saves_dir, verify_hash=verify_hash, journaled=True
+            )
+            logger.debug(
+                "Дельта-восстановление: перезаписано файлов - %s, удалено - %s",
+                written,
+                deleted,
+            )
+        else:
+            self._staged_restore(snapshot)
+
+    def _staged_restore(self, snapshot: Snapshot) -> None:
         """
-        Копирует файлы из папки 'src' в папку 'dst', перед этим полностью удалив 'dst'.
+        Разворачивает снапшот в папку рядом с сохранением и подменяет ей сохранение
+        переименованием. Старое сохранение удаляется в фоне, так что игру можно запускать
+        сразу после подмены, а сбой посреди копирования не трогает текущее сохранение.
 
         Args:
-            src (Path): Папка из которой копируются файлы.
-            dst (Path): Папка в которую копируются файлы.
+            snapshot (Snapshot): Снапшот для восстановления.
         """
-        if dst.exists():
-            shutil.rmtree(path=dst)
-            logger.debug("Сохранение в папке %s удалено", dst)
+        staging_dir = self._staging_dir
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+
+        journal = self.store.journal
+        journal.begin(KIND_RESTORE_FULL, snapshot, target=staging_dir, planned=snapshot.files)
+        self.store.materialize(snapshot, staging_dir, journaled=True)
+        journal.set_phase(PHASE_SWAP)
+        self._swap_in(staging_dir)
+        journal.finish()
+
+    def _swap_in(self, staging_dir: Path) -> None:
+        if old_dir := swap_directory(staging=staging_dir, target=self.saves_dir):
+            remove_tree_in_background(old_dir)
+        logger.debug("Сохранение в папке %s подменено подготовленной копией", self.saves_dir)
+
+    def _recover_backup(self, state: JournalState) -> None:
+        snapshot = state.snapshot
+        if snapshot.snapshot_id in self.store.catalog.snapshot_ids():
+            # Сбой после регистрации снапшота - операция уже завершена
+            self.store.journal.finish()
+            return
+
+        if state.target.is_dir() and not self._changed_since(snapshot, state.target):
+            try:
+                self.store.resume_snapshot(state)
+            except CopyError as err:
+                logger.warning("Прерванный бэкап не удалось довести: %s", err)
+            else:
+                logger.warning(
+                    "Прерванный бэкап %s доведен до конца без повторного копирования",
+                    snapshot.snapshot_id,
+                )
+                return
+
+        removed = self.store.discard_snapshot(state)
+        logger.warning(
+            "Прерванный бэкап %s откачен, удалено объектов: %s",
+            snapshot.snapshot_id,
+            removed,
+        )
+
+    def _recover_restore(self, state: JournalState) -> None:
+        snapshot_id = state.snapshot.snapshot_id
+        try:
+            copied = self.store.resume_copy(state)
+        except (SnapshotCorruptedError, CopyError) as err:
+            # Прежнее содержимое сохранения не хранится, так что откатить запись нечем
+            logger.error(
+                "Прерванное восстановление из бэкапа %s не доведено: %s", snapshot_id, err
+            )
+            self.store.journal.finish()
+            return
+
+        self.store.journal.finish()
+        logger.warning(
+            "Прерванное восстановление из бэкапа %s доведено до конца, скопировано файлов: %s",
+            snapshot_id,
+            copied,
+        )
+
+    def _recover_staged_restore(self, state: JournalState) -> None:
+        staging_dir = state.target
+        snapshot_id = state.snapshot.snapshot_id
+
+        if state.phase == PHASE_COPY:
+            try:
+                self.store.resume_copy(state)
+            except (SnapshotCorruptedError, CopyError) as err:
+                # Папка сохранения еще не тронута - подготовленная копия просто удаляется
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                self.store.journal.finish()
+                logger.warning(
+                    "Прерванное восстановление из бэкапа %s откачено: %s", snapshot_id, err
+                )
+                return
+            self.store.journal.set_phase(PHASE_SWAP)
+
+        if staging_dir.is_dir():
+            self._swap_in(staging_dir)
+        self.store.journal.finish()
+        logger.warning("Прерванное восстановление из бэкапа %s доведено до конца", snapshot_id)
+
+    def _recover_interrupted_swap(self) -> None:
+        """
+        Если подмена папок прервалась между двумя переименованиями и сохранения нет -
+        возвращает на место последнее старое сохранение. Оставшиеся после сбоя старые
+        копии удаляются в фоне.
+        """
+        old_dirs = sorted(self.saves_dir.parent.glob(f"{self.saves_dir.name}.old-*"))
+        if not old_dirs:
+            return
+
+        if not self.saves_dir.exists():
+            latest_old = old_dirs.pop()
+            latest_old.rename(self.saves_dir)
+            logger.warning(
+                "Обнаружена прерванная подмена сохранения, возвращена папка %s",
+                latest_old,
+            )
+
+        for old_dir in old_dirs:
+            remove_tree_in_background(old_dir)
+
+    @property
+    def _staging_dir(self) -> Path:
+        return self.saves_dir.with_name(f"{self.saves_dir.name}.staging")
+
+    def _migrate_legacy_backup(self) -> None:
+        """
+        Переносит бэкап старого формата (полная копия save00 в 'backup_dir') в хранилище
+        снапшотов, чтобы после обновления приложения прошлый бэкап не потерялся.
+        """
+        if not self.backup_dir.is_dir() or self.store.list_ids():
+            return
+
+        reserved = {OBJECTS_DIR_NAME, SNAPSHOTS_DIR_NAME, JOURNAL_FILE_NAME}
+        legacy = [
+            p
+            for p in self.backup_dir.iterdir()
+            if p.name not in reserved and not p.name.startswith(CATALOG_FILE_NAME)
+        ]
+        if not legacy:
+            return
+
+        staging_dir = self.backup_dir.with_name(f"{self.backup_dir.name}.legacy")
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        staging_dir.mkdir()
+        for path in legacy:
+            path.rename(staging_dir / path.name)
 
-        shutil.copytree(src, dst)
-        logger.debug("Сохранение перемещено из папки %s, в папку %s", src, dst)
+        self.store.create_snapshot(staging_dir)
+        shutil.rmtree(staging_dir)
+        logger.info("Бэкап старого формата перенесен в хранилище снапшотов.")
@@ -0,0 +1,326 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from services.manifest import (
+    FileEntry,
+    Snapshot,
+    SnapshotInfo,
+)
+
+
+# Версия схемы в PRAGMA user_version: каталог другой версии пересобирается из манифестов
+SCHEMA_VERSION = 1
+_TABLES = ("files", "object_stats", "objects", "snapshots")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id      TEXT PRIMARY KEY,
+    created_at       REAL NOT NULL,
+    last_restored_at REAL,
+    file_count       INTEGER NOT NULL,
+    total_size       INTEGER NOT NULL,
+    dirs             TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_created_at ON snapshots (created_at);
+
+CREATE TABLE IF NOT EXISTS files (
+    snapshot_id TEXT NOT NULL REFERENCES snapshots (snapshot_id) ON DELETE CASCADE,
+    path        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    digest      TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+
+CREATE TABLE IF NOT EXISTS objects (
+    digest   TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Размер и mtime файла объекта на момент последней проверки его хэша
+CREATE TABLE IF NOT EXISTS object_stats (
+    digest   TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SnapshotCatalog:
+    """
+    Каталог снапшотов в SQLite рядом с хранилищем:
+    - строка на каждый снапшот и записи его манифеста, индексы по времени и пути
+    - таблица объектов со счетчиками ссылок для учета места без обхода диска
+    - размер и mtime проверенных файлов объектов, чтобы не перепроверять неизмененные
+    - каждое изменение выполняется одной транзакцией
+    - новый каталог или каталог устаревшей схемы создается пустым и помечается
+      'needs_rebuild': его нужно пересобрать из манифестов (см. rebuild)
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+        self._lock = threading.Lock()
+        # Доступ из разных потоков сериализуется через self._lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        self.needs_rebuild = version != SCHEMA_VERSION
+        if self.needs_rebuild:
+            for table in _TABLES:
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, snapshot: Snapshot) -> None:
+        """
+        Добавляет снапшот и увеличивает счетчики ссылок его объектов.
+
+        Args:
+            snapshot (Snapshot): Снапшот.
+        """
+        with self._transaction() as conn:
+            self._insert(conn, snapshot)
+
+    def remove(self, snapshot_id: str) -> list[tuple[str, int]]:
+        """
+        Удаляет снапшот и уменьшает счетчики ссылок его объектов.
+
+        Args:
+            snapshot_id (str): Идентификатор снапшота.
+
+        Returns:
+            (list[tuple[str, int]]): Хэши и размеры объектов, на которые больше никто
+                не ссылается - их файлы можно удалять.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE objects SET refcount = objects.refcount - f.uses
+                FROM (
+                    SELECT digest, COUNT(*) AS uses FROM files
+                    WHERE snapshot_id = ? GROUP BY digest
+                ) AS f
+                WHERE objects.digest = f.digest
+                """,
+                (snapshot_id,),
+            )
+            orphans = conn.execute(
+                "SELECT digest, size FROM objects WHERE refcount <= 0"
+            ).fetchall()
+            conn.execute(
+                "DELETE FROM object_stats WHERE digest IN "
+                "(SELECT digest FROM objects WHERE refcount <= 0)"
+            )
+            conn.execute("DELETE FROM objects WHERE refcount <= 0")
+            conn.execute("DELETE FROM snapshots WHERE snapshot_id = ?", (snapshot_id,))
+        return orphans
+
+    def load(self, snapshot_id: str) -> Snapshot | None:
+        """
+        Загружает снапшот вместе с записями манифеста.
+
+        Args:
+            snapshot_id (str): Идентификатор снапшота.
+
+        Returns:
+            (Snapshot | None): Снапшот, если он есть в каталоге, иначе None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, last_restored_at, dirs FROM snapshots "
+                "WHERE snapshot_id = ?",
+                (snapshot_id,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            files = self._conn.execute(
+                "SELECT path, size, mtime_ns, digest FROM files WHERE snapshot_id = ?",
+                (snapshot_id,),
+            ).fetchall()
+
+        created_at, last_restored_at, dirs = row
+        return Snapshot(
+            snapshot_id=snapshot_id,
+            created_at=created_at,
+            last_restored_at=last_restored_at,
+            dirs=json.loads(dirs),
+            files={
+                path: FileEntry(size=size, mtime_ns=mtime_ns, digest=digest)
+                for path, size, mtime_ns, digest in files
+            },
+        )
+
+    def list_snapshots(self) -> list[SnapshotInfo]:
+        """
+        Возвращает сведения о снапшотах в порядке создания.
+
+        Returns:
+            list[SnapshotInfo]: Список сведений о снапшотах.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT snapshot_id, created_at, last_restored_at, file_count, total_size "
+                "FROM snapshots ORDER BY created_at, snapshot_id"
+            ).fetchall()
+        return [SnapshotInfo(*row) for row in rows]
+
+    def latest_id(self) -> str | None:
+        """
+        Возвращает идентификатор последнего снапшота.
+
+        Returns:
+            (str | None): Идентификатор, если хоть один снапшот есть, иначе None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT snapshot_id FROM snapshots "
+                "ORDER BY created_at DESC, snapshot_id DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def diff(self, old_id: str, new_id: str) -> list[tuple[str, int | None, int | None]]:
+        """
+        Сравнивает записи манифестов двух снапшотов по хэшу содержимого. Сравнение идет
+        внутри SQLite по первичному ключу, и наружу выбираются только отличия.
+
+        Args:
+            old_id (str): Идентификатор старого снапшота.
+            new_id (str): Идентификатор нового снапшота.
+
+        Returns:
+            (list[tuple[str, int | None, int | None]]): Отличающиеся файлы (путь, старый
+                размер, новый размер) в порядке путей; None - файла в снапшоте нет.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT new.path, old.size, new.size FROM files AS new "
+                "LEFT JOIN files AS old ON old.snapshot_id = ? AND old.path = new.path "
+                "WHERE new.snapshot_id = ? AND (old.digest IS NULL OR old.digest != new.digest) "
+                "UNION ALL "
+                "SELECT old.path, old.size, NULL FROM files AS old "
+                "WHERE old.snapshot_id = ? AND NOT EXISTS ("
+                "SELECT 1 FROM files AS new WHERE new.snapshot_id = ? AND new.path = old.path) "
+                "ORDER BY 1",
+                (old_id, new_id, old_id, new_id),
+            ).fetchall()
+
+    def snapshot_ids(self) -> set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT snapshot_id FROM snapshots").fetchall()
+        return {row[0] for row in rows}
+
+    def digests(self) -> set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT digest FROM objects").fetchall()
+        return {row[0] for row in rows}
+
+    def total_bytes(self) -> int:
+        """
+        Возвращает место, занимаемое объектами хранилища.
+
+        Returns:
+            int: Размер в байтах.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM objects"
+            ).fetchone()[0]
+
+    def object_stats(self) -> dict[str, tuple[int, int]]:
+        """
+        Возвращает размер и mtime файлов объектов на момент последней проверки их хэша.
+
+        Returns:
+            dict[str, tuple[int, int]]: Хэш объекта -> (размер, mtime в наносекундах).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest, size, mtime_ns FROM object_stats"
+            ).fetchall()
+        return {digest: (size, mtime_ns) for digest, size, mtime_ns in rows}
+
+    def record_object_stats(self, stats: Iterable[tuple[str, int, int]]) -> None:
+        """
+        Запоминает размер и mtime файлов объектов, содержимое которых совпало с хэшем.
+
+        Args:
+            stats (Iterable[tuple[str, int, int]]): Тройки (хэш, размер, mtime в наносекундах).
+        """
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO object_stats VALUES (?, ?, ?)", stats)
+
+    def set_last_restored(self, snapshot_id: str, timestamp: float) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE snapshots SET last_restored_at = ? WHERE snapshot_id = ?",
+                (timestamp, snapshot_id),
+            )
+
+    def rebuild(self, snapshots: Iterable[Snapshot]) -> None:
+        """
+        Полностью пересобирает каталог из манифестов.
+
+        Args:
+            snapshots (Iterable[Snapshot]): Все снапшоты хранилища.
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM snapshots")
+            conn.execute("DELETE FROM objects")
+            for snapshot in snapshots:
+                self._insert(conn, snapshot)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.needs_rebuild = False
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Открывает транзакцию под блокировкой каталога. При ошибке изменения откатываются.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, snapshot: Snapshot) -> None:
+        conn.execute(
+            "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                snapshot.snapshot_id,
+                snapshot.created_at,
+                snapshot.last_restored_at,
+                len(snapshot.files),
+                snapshot.total_size,
+                json.dumps(snapshot.dirs),
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+            (
+                (snapshot.snapshot_id, path, entry.size, entry.mtime_ns, entry.digest)
+                for path, entry in snapshot.files.items()
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO objects VALUES (?, ?, 1) "
+            "ON CONFLICT (digest) DO UPDATE SET refcount = refcount + 1",
+            ((entry.digest, entry.size) for entry in snapshot.files.values()),
+        )
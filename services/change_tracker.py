@@ -0,0 +1,561 @@
+import os
+import errno
+import select
+import struct
+import ctypes
+import logging
+import platform
+import threading
+from pathlib import Path
+
+
+# Флаги и структура события из sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+# Период, с которым фоновый поток проверяет, не остановлен ли трекер (в миллисекундах)
+_POLL_TIMEOUT_MS = 500
+
+# Флаги ReadDirectoryChangesW и структура FILE_NOTIFY_INFORMATION из winnt.h
+FILE_LIST_DIRECTORY = 0x0001
+FILE_SHARE_ALL = 0x00000001 | 0x00000002 | 0x00000004
+OPEN_EXISTING = 3
+FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+FILE_FLAG_OVERLAPPED = 0x40000000
+FILE_NOTIFY_MASK = (
+    0x00000001  # FILE_NOTIFY_CHANGE_FILE_NAME
+    | 0x00000002  # FILE_NOTIFY_CHANGE_DIR_NAME
+    | 0x00000004  # FILE_NOTIFY_CHANGE_ATTRIBUTES
+    | 0x00000008  # FILE_NOTIFY_CHANGE_SIZE
+    | 0x00000010  # FILE_NOTIFY_CHANGE_LAST_WRITE
+    | 0x00000040  # FILE_NOTIFY_CHANGE_CREATION
+)
+FILE_ACTION_ADDED = 1
+FILE_ACTION_REMOVED = 2
+FILE_ACTION_RENAMED_OLD_NAME = 4
+FILE_ACTION_RENAMED_NEW_NAME = 5
+ERROR_IO_INCOMPLETE = 996
+ERROR_OPERATION_ABORTED = 995
+WAIT_OBJECT_0 = 0
+INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+_NOTIFY_INFO = struct.Struct("<III")
+
+_libc = None
+_kernel32 = None
+if platform.system() == "Linux":
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+elif platform.system() == "Windows":
+    from ctypes import wintypes
+
+    class _OVERLAPPED(ctypes.Structure):
+        _fields_ = [
+            ("Internal", ctypes.c_void_p),
+            ("InternalHigh", ctypes.c_void_p),
+            ("Offset", wintypes.DWORD),
+            ("OffsetHigh", wintypes.DWORD),
+            ("hEvent", wintypes.HANDLE),
+        ]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.CreateFileW.argtypes = (
+        wintypes.LPCWSTR,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.LPVOID,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.HANDLE,
+    )
+    _kernel32.CreateFileW.restype = wintypes.HANDLE
+    _kernel32.CreateEventW.argtypes = (
+        wintypes.LPVOID,
+        wintypes.BOOL,
+        wintypes.BOOL,
+        wintypes.LPCWSTR,
+    )
+    _kernel32.CreateEventW.restype = wintypes.HANDLE
+    _kernel32.ReadDirectoryChangesW.argtypes = (
+        wintypes.HANDLE,
+        wintypes.LPVOID,
+        wintypes.DWORD,
+        wintypes.BOOL,
+        wintypes.DWORD,
+        wintypes.LPDWORD,
+        ctypes.POINTER(_OVERLAPPED),
+        wintypes.LPVOID,
+    )
+    _kernel32.ReadDirectoryChangesW.restype = wintypes.BOOL
+    _kernel32.GetOverlappedResult.argtypes = (
+        wintypes.HANDLE,
+        ctypes.POINTER(_OVERLAPPED),
+        wintypes.LPDWORD,
+        wintypes.BOOL,
+    )
+    _kernel32.GetOverlappedResult.restype = wintypes.BOOL
+    _kernel32.CancelIoEx.argtypes = (wintypes.HANDLE, ctypes.POINTER(_OVERLAPPED))
+    _kernel32.CancelIoEx.restype = wintypes.BOOL
+    _kernel32.WaitForSingleObject.argtypes = (wintypes.HANDLE, wintypes.DWORD)
+    _kernel32.WaitForSingleObject.restype = wintypes.DWORD
+    _kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    _kernel32.CloseHandle.restype = wintypes.BOOL
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeTracker:
+    """
+    Отслеживание измененных файлов в папке сохранения:
+    - на Linux - через inotify: на каждую папку дерева ставится watch, новые папки
+      подхватываются на лету
+    - на Windows - через ReadDirectoryChangesW с отслеживанием всего поддерева;
+      запрос перевыпускается асинхронно (overlapped), так что изменения между
+      запросами копит ядро
+    - фоновый поток вычитывает события и копит множество путей, измененных
+      с прошлого вызова take(), поэтому буфер ядра не переполняется между бэкапами;
+      take() перед выдачей синхронно дочитывает уже пришедшие события
+    - если события могли потеряться (переполнение буфера, удаление или перенос папки,
+      подмена самой папки сохранения), take() возвращает None - нужен полный обход.
+      Подмена папки сохранения при восстановлении перезапускает трекер.
+
+    На остальных системах трекер всегда возвращает None, и изменения ищутся полным обходом
+    со сверкой размера и mtime с прошлым снапшотом.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.overflows = 0
+        self.restarts = 0
+
+        self._lock = threading.Lock()
+        self._fd: int | None = None
+        self._generation = 0
+        # wd -> относительный путь папки с завершающим "/" ("" для корня)
+        self._watches: dict[int, str] = {}
+        self._dirty: set[str] = set()
+        self._valid = False
+
+        # Состояние ReadDirectoryChangesW (Windows): описатель папки, событие и буфер
+        # асинхронного запроса, известные папки дерева и идентификатор корня
+        self._dir_handle: int | None = None
+        self._event: int | None = None
+        self._overlapped = None
+        self._buffer = None
+        self._dirs: set[str] = set()
+        self._root_id: tuple[int, int] | None = None
+
+    @staticmethod
+    def is_supported() -> bool:
+        return _libc is not None or _kernel32 is not None
+
+    @property
+    def _active(self) -> bool:
+        return self._fd is not None or self._dir_handle is not None
+
+    def take(self) -> set[str] | None:
+        """
+        Возвращает пути (относительно корня, с разделителем '/'), измененные с прошлого
+        вызова, и начинает копить изменения заново. Первый вызов запускает отслеживание.
+
+        Returns:
+            (set[str] | None): Измененные файлы и папки, включая удаленные;
+                None если полноту гарантировать нельзя и нужен полный обход.
+        """
+        with self._lock:
+            if self._dir_handle is not None:
+                self._check_root_windows()
+            if self._active:
+                self._drain()
+
+            if not self._active:
+                self._start()
+                return None
+
+            if not self._valid:
+                self._dirty.clear()
+                self._valid = True
+                if self._dir_handle is not None:
+                    # Список папок мог устареть вместе с потерянными событиями
+                    self._dirs.clear()
+                    self._scan_dirs("", mark=False)
+                return None
+
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    def invalidate(self) -> None:
+        """
+        Помечает накопленные изменения неполными - следующий take() вернет None.
+        Вызывается, если снапшот по результату take() не удалось создать.
+        """
+        with self._lock:
+            self._valid = False
+
+    def stop(self) -> None:
+        """Останавливает отслеживание."""
+        with self._lock:
+            self._close()
+
+    def _start(self) -> None:
+        if not self.root.is_dir():
+            return
+        if _kernel32 is not None:
+            self._start_windows()
+            return
+        if _libc is None:
+            return
+
+        fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            logger.warning(
+                "inotify недоступен, изменения будут искаться полным обходом: %s",
+                os.strerror(ctypes.get_errno()),
+            )
+            return
+
+        self._fd = fd
+        self._generation += 1
+        self._watches.clear()
+        self._dirty.clear()
+        self._valid = True
+        self._watch_tree("", mark=False)
+
+        threading.Thread(
+            target=self._read_loop,
+            args=(fd, self._generation),
+            name="change_tracker",
+            daemon=True,
+        ).start()
+        logger.debug(
+            "Отслеживание изменений в %s запущено, папок под наблюдением: %s",
+            self.root,
+            len(self._watches),
+        )
+
+    def _close(self) -> None:
+        if self._dir_handle is not None:
+            self._close_windows()
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        self._generation += 1
+        self._watches.clear()
+        self._valid = False
+
+    def _read_loop(self, fd: int, generation: int) -> None:
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        while True:
+            ready = poller.poll(_POLL_TIMEOUT_MS)
+            with self._lock:
+                if self._generation != generation:
+                    return
+                if ready:
+                    self._drain()
+
+    def _drain(self) -> None:
+        if self._dir_handle is not None:
+            self._drain_windows()
+            return
+
+        while self._fd is not None:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                return
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_len = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset : offset + name_len].rstrip(b"\0")
+                offset += name_len
+                self._handle(wd, mask, os.fsdecode(name))
+                if self._fd is None:
+                    return
+
+    def _handle(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            self.overflows += 1
+            self._valid = False
+            logger.warning("Очередь событий inotify переполнена, нужен полный обход")
+            return
+
+        rel_dir = self._watches.get(wd)
+        if rel_dir is None:
+            return
+
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            if rel_dir == "":
+                # Папку сохранения подменили или удалили - следующий take() перезапустит трекер
+                self.restarts += 1
+                self._close()
+                logger.debug("Папка %s подменена, отслеживание будет перезапущено", self.root)
+            elif mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+            return
+
+        rel_path = f"{rel_dir}{name}"
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(f"{rel_path}/", mark=True)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                # Удаленную папку проще учесть полным обходом, чем разбирать по событиям
+                self._valid = False
+            return
+
+        self._dirty.add(rel_path)
+
+    def _watch_tree(self, rel_dir: str, mark: bool) -> None:
+        """
+        Ставит watch на папку и все вложенные. Если 'mark' = True, папки и файлы
+        помечаются измененными: они могли появиться до того, как на них встал watch.
+        """
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            path = self.root / current if current else self.root
+
+            wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err not in (errno.ENOENT, errno.ENOTDIR):
+                    self._valid = False
+                    logger.warning(
+                        "Не удалось отслеживать папку %s: %s", path, os.strerror(err)
+                    )
+                continue
+
+            self._watches[wd] = current
+            if mark:
+                self._dirty.add(current.rstrip("/"))
+
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(f"{current}{entry.name}/")
+                        elif mark:
+                            self._dirty.add(f"{current}{entry.name}")
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def _start_windows(self) -> None:
+        handle = _kernel32.CreateFileW(
+            str(self.root),
+            FILE_LIST_DIRECTORY,
+            # FILE_SHARE_DELETE: папку сохранения можно подменить переименованием
+            FILE_SHARE_ALL,
+            None,
+            OPEN_EXISTING,
+            FILE_FLAG_BACKUP_SEMANTICS | FILE_FLAG_OVERLAPPED,
+            None,
+        )
+        if handle in (None, INVALID_HANDLE_VALUE):
+            logger.warning(
+                "ReadDirectoryChangesW недоступен, изменения будут искаться полным обходом: %s",
+                ctypes.FormatError(ctypes.get_last_error()),
+            )
+            return
+
+        self._dir_handle = handle
+        self._event = _kernel32.CreateEventW(None, True, False, None)
+        self._overlapped = _OVERLAPPED(hEvent=self._event)
+        self._buffer = ctypes.create_string_buffer(_READ_SIZE)
+        self._generation += 1
+        self._dirty.clear()
+        self._dirs.clear()
+        self._valid = True
+
+        stat = os.stat(self.root)
+        self._root_id = (stat.st_dev, stat.st_ino)
+        # Запрос выпускается до обхода: изменения во время обхода не теряются
+        if not self._issue_windows():
+            return
+        self._scan_dirs("", mark=False)
+
+        threading.Thread(
+            target=self._read_loop_windows,
+            args=(self._generation,),
+            name="change_tracker",
+            daemon=True,
+        ).start()
+        logger.debug(
+            "Отслеживание изменений в %s запущено, папок в дереве: %s",
+            self.root,
+            len(self._dirs),
+        )
+
+    def _close_windows(self) -> None:
+        # Буфер и OVERLAPPED нельзя освобождать, пока ядро не завершило отмененный запрос
+        _kernel32.CancelIoEx(self._dir_handle, ctypes.byref(self._overlapped))
+        transferred = ctypes.c_ulong()
+        _kernel32.GetOverlappedResult(
+            self._dir_handle, ctypes.byref(self._overlapped), ctypes.byref(transferred), True
+        )
+        _kernel32.CloseHandle(self._dir_handle)
+        _kernel32.CloseHandle(self._event)
+        self._dir_handle = None
+        self._event = None
+        self._overlapped = None
+        self._buffer = None
+        self._generation += 1
+        self._dirs.clear()
+        self._valid = False
+
+    def _issue_windows(self) -> bool:
+        ok = _kernel32.ReadDirectoryChangesW(
+            self._dir_handle,
+            self._buffer,
+            len(self._buffer),
+            True,
+            FILE_NOTIFY_MASK,
+            None,
+            ctypes.byref(self._overlapped),
+            None,
+        )
+        if not ok:
+            logger.warning(
+                "Не удалось отслеживать папку %s: %s",
+                self.root,
+                ctypes.FormatError(ctypes.get_last_error()),
+            )
+            self._close_windows()
+        return bool(ok)
+
+    def _read_loop_windows(self, generation: int) -> None:
+        while True:
+            # Событие держится неизменным до закрытия трекера под блокировкой
+            event = self._event
+            if event is None:
+                return
+            _kernel32.WaitForSingleObject(event, _POLL_TIMEOUT_MS)
+            with self._lock:
+                if self._generation != generation:
+                    return
+                self._drain_windows()
+
+    def _drain_windows(self) -> None:
+        transferred = ctypes.c_ulong()
+        while self._dir_handle is not None:
+            ok = _kernel32.GetOverlappedResult(
+                self._dir_handle, ctypes.byref(self._overlapped), ctypes.byref(transferred), False
+            )
+            if not ok:
+                err = ctypes.get_last_error()
+                if err == ERROR_IO_INCOMPLETE:
+                    return
+                if err == ERROR_OPERATION_ABORTED:
+                    self._close_windows()
+                    return
+                # Например, ERROR_NOTIFY_ENUM_DIR: изменений больше, чем вмещает буфер
+                self._mark_overflow()
+            elif transferred.value == 0:
+                self._mark_overflow()
+            else:
+                self._parse_notify(self._buffer.raw[: transferred.value])
+
+            if not self._issue_windows():
+                return
+
+    def _parse_notify(self, data: bytes) -> None:
+        """Разбирает записи FILE_NOTIFY_INFORMATION из буфера ReadDirectoryChangesW."""
+        offset = 0
+        while True:
+            next_offset, action, name_len = _NOTIFY_INFO.unpack_from(data, offset)
+            start = offset + _NOTIFY_INFO.size
+            name = data[start : start + name_len].decode("utf-16-le")
+            self._handle_windows(action, name.replace("\\", "/"))
+            if not next_offset:
+                return
+            offset += next_offset
+
+    def _handle_windows(self, action: int, rel_path: str) -> None:
+        if action in (FILE_ACTION_REMOVED, FILE_ACTION_RENAMED_OLD_NAME):
+            if rel_path in self._dirs:
+                # Удаленную или перенесенную папку проще учесть полным обходом
+                self._dirs.discard(rel_path)
+                self._valid = False
+                return
+        elif action in (FILE_ACTION_ADDED, FILE_ACTION_RENAMED_NEW_NAME):
+            if (self.root / rel_path).is_dir():
+                # Содержимое перенесенной в дерево папки событий не порождает
+                self._scan_dirs(f"{rel_path}/", mark=True)
+                return
+        elif rel_path in self._dirs:
+            # Изменение атрибутов или времени папки - файлы в ней придут отдельными событиями
+            return
+
+        self._dirty.add(rel_path)
+
+    def _check_root_windows(self) -> None:
+        """
+        Описатель следует за папкой при переименовании, поэтому подмена папки сохранения
+        определяется по идентификатору корня. Подмененная папка перезапускает трекер.
+        """
+        try:
+            stat = os.stat(self.root)
+            root_id = (stat.st_dev, stat.st_ino)
+        except OSError:
+            root_id = None
+
+        if root_id != self._root_id:
+            self.restarts += 1
+            self._close_windows()
+            logger.debug("Папка %s подменена, отслеживание будет перезапущено", self.root)
+
+    def _scan_dirs(self, rel_dir: str, mark: bool) -> None:
+        """
+        Запоминает папку и все вложенные. Если 'mark' = True, папки и файлы
+        помечаются измененными: они появились в дереве без событий на каждый файл.
+        """
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            if current:
+                self._dirs.add(current.rstrip("/"))
+                if mark:
+                    self._dirty.add(current.rstrip("/"))
+
+            try:
+                with os.scandir(self.root / current if current else self.root) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(f"{current}{entry.name}/")
+                        elif mark:
+                            self._dirty.add(f"{current}{entry.name}")
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+    def _mark_overflow(self) -> None:
+        self.overflows += 1
+        self._valid = False
+        logger.warning("Буфер событий ReadDirectoryChangesW переполнен, нужен полный обход")
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import shutil
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from config.paths import (
+    LAUNCH_CACHE_PATH,
+    STEAM_ROOT,
+)
+from core.exceptions import (
+    NoitaCmdlineResolverError,
+    NoitaExecutableNotFound,
+)
+from core.utils import (
+    parse_vdf,
+    read_steam_libraries,
+)
+
+
+NOITA_APP_ID = "881100"
+NOITA_INSTALL_DIR = "Noita"
+NOITA_EXECUTABLE = "noita.exe"
+CACHE_VERSION = 1
+
+SOURCE_PROCESS = "process"
+SOURCE_STEAM = "steam"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LaunchCommand:
+    """Командная строка запуска игры, рабочая папка и путь к исполняемому файлу."""
+
+    cmdline: list[str]
+    cwd: str
+    executable: str
+    # Откуда получена команда: с работавшего процесса или из библиотеки Steam
+    source: str
+
+
+def default_steam_roots() -> list[Path]:
+    """
+    Функция получения стандартных мест установки Steam для текущей ОС.
+
+    Returns:
+        list[Path]: Кандидаты в порядке приоритета.
+    """
+    if sys.platform == "win32":
+        program_files = os.getenv("PROGRAMFILES(X86)") or "C:/Program Files (x86)"
+        return [Path(program_files) / "Steam"]
+
+    home = Path.home()
+    return [
+        home / ".steam" / "steam",
+        home / ".local" / "share" / "Steam",
+        home / ".var" / "app" / "com.valvesoftware.Steam" / ".local" / "share" / "Steam",
+    ]
+
+
+class CmdlineResolver:
+    """
+    Поиск командной строки запуска игры:
+    - последняя рабочая команда хранится на диске и доступна сразу после старта приложения
+    - кэш сбрасывается, если изменился libraryfolders.vdf (время изменения), пропал
+      исполняемый файл или запуск по сохраненной команде не удался (invalidate)
+    - без кэша все библиотеки Steam индексируются за одно чтение libraryfolders.vdf
+    - папка Steam задается явно, чтобы работать с нестандартными установками и Proton;
+      вне Windows игра запускается через клиент Steam, а не напрямую
+    """
+
+    def __init__(
+        self,
+        steam_root: Path | None = STEAM_ROOT,
+        cache_path: Path = LAUNCH_CACHE_PATH,
+    ):
+        self.steam_root = steam_root
+        self.cache_path = cache_path
+
+        self._lock = threading.Lock()
+        self._cached: LaunchCommand | None = None
+        self._cached_vdf_mtime: int | None = None
+        self._cache_loaded = False
+
+    def resolve(self) -> LaunchCommand:
+        """
+        Возвращает команду запуска игры: из кэша, если он действителен, иначе из
+        библиотек Steam.
+
+        Raises:
+            NoitaExecutableNotFound: Если игра не найдена ни в одной библиотеке Steam.
+
+        Returns:
+            LaunchCommand: Команда запуска.
+        """
+        with self._lock:
+            vdf_mtime = self._vdf_mtime()
+            if not self._cache_loaded:
+                self._load_cache()
+
+            if self._is_cache_valid(vdf_mtime):
+                return self._cached
+
+            command = self._resolve_from_steam()
+            self._store(command, vdf_mtime)
+            return command
+
+    def remember(self, cmdline: list[str], cwd: str) -> LaunchCommand | None:
+        """
+        Сохраняет командную строку работавшего процесса игры как последнюю рабочую.
+        Относительный путь исполняемого файла сохраняется абсолютным. Команда,
+        исполняемый файл которой не виден в этой системе (например, путь Wine у игры
+        под Proton), не сохраняется.
+
+        Args:
+            cmdline (list[str]): Командная строка процесса.
+            cwd (str): Рабочая папка процесса.
+
+        Returns:
+            (LaunchCommand | None): Сохраненная команда; None если ее нельзя запускать
+                напрямую.
+        """
+        # Относительный путь исполняемого файла отсчитывается от рабочей папки игры,
+        # а не от рабочей папки приложения
+        executable = Path(cwd) / cmdline[0] if cmdline else None
+        if executable is None or not executable.is_file():
+            logger.debug("Командная строка %s не подходит для запуска напрямую", cmdline)
+            return None
+
+        command = LaunchCommand(
+            cmdline=[str(executable), *cmdline[1:]],
+            cwd=cwd,
+            executable=str(executable),
+            source=SOURCE_PROCESS,
+        )
+        with self._lock:
+            if command != self._cached:
+                self._store(command, self._vdf_mtime())
+        return command
+
+    def invalidate(self) -> None:
+        """Сбрасывает кэш в памяти и на диске."""
+        with self._lock:
+            self._cached = None
+            self._cache_loaded = True
+            self.cache_path.unlink(missing_ok=True)
+
+    def library_paths(self) -> dict[Path, set[str]]:
+        """
+        Возвращает библиотеки Steam и установленные в них игры.
+
+        Returns:
+            (dict[Path, set[str]]): Папки библиотек и идентификаторы игр; пустой словарь,
+                если Steam не найден.
+        """
+        if not (vdf_path := self._vdf_path()):
+            return {}
+        try:
+            return read_steam_libraries(vdf_path)
+        except OSError as err:
+            logger.warning("Не удалось прочитать %s: %s", vdf_path, err)
+            return {}
+
+    def _steam_roots(self) -> list[Path]:
+        return [self.steam_root] if self.steam_root else default_steam_roots()
+
+    def _vdf_path(self) -> Path | None:
+        for root in self._steam_roots():
+            for candidate in (
+                root / "steamapps" / "libraryfolders.vdf",
+                root / "config" / "libraryfolders.vdf",
+            ):
+                if candidate.is_file():
+                    return candidate
+        return None
+
+    def _vdf_mtime(self) -> int | None:
+        if not (vdf_path := self._vdf_path()):
+            return None
+        try:
+            return vdf_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _is_cache_valid(self, vdf_mtime: int | None) -> bool:
+        return (
+            self._cached is not None
+            and self._cached_vdf_mtime == vdf_mtime
+            and Path(self._cached.executable).is_file()
+        )
+
+    def _resolve_from_steam(self) -> LaunchCommand:
+        libraries = self.library_paths()
+        if not libraries:
+            raise NoitaExecutableNotFound(
+                "Не найден файл libraryfolders.vdf с библиотеками Steam."
+            )
+
+        # Сначала библиотеки, в которых игра числится установленной
+        ordered = sorted(libraries, key=lambda library: NOITA_APP_ID not in libraries[library])
+        for library in ordered:
+            steamapps = library / "steamapps"
+            install_dir = self._install_dir(steamapps)
+            executable = steamapps / "common" / install_dir / NOITA_EXECUTABLE
+            if executable.is_file():
+                return self._steam_command(executable, library)
+
+        raise NoitaExecutableNotFound(
+            f"Не найден {NOITA_EXECUTABLE} ни в одной из {len(libraries)} библиотек Steam."
+        )
+
+    def _install_dir(self, steamapps: Path) -> str:
+        manifest_path = steamapps / f"appmanifest_{NOITA_APP_ID}.acf"
+        try:
+            manifest = parse_vdf(manifest_path.read_text(encoding="utf-8", errors="ignore"))
+        except OSError:
+            return NOITA_INSTALL_DIR
+        return manifest.get("AppState", {}).get("installdir") or NOITA_INSTALL_DIR
+
+    def _steam_command(self, executable: Path, library: Path) -> LaunchCommand:
+        if sys.platform == "win32":
+            return LaunchCommand(
+                cmdline=[str(executable)],
+                cwd=str(executable.parent),
+                executable=str(executable),
+                source=SOURCE_STEAM,
+            )
+
+        # Под Proton игру запускает клиент Steam; attach_child найдет процесс по имени
+        steam = shutil.which("steam")
+        if not steam:
+            raise NoitaCmdlineResolverError(
+                "Клиент Steam не найден в PATH для запуска через Proton."
+            )
+        return LaunchCommand(
+            cmdline=[steam, "-applaunch", NOITA_APP_ID],
+            cwd=str(library),
+            executable=str(executable),
+            source=SOURCE_STEAM,
+        )
+
+    def _load_cache(self) -> None:
+        self._cache_loaded = True
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+            if data.get("version") != CACHE_VERSION:
+                return
+            self._cached = LaunchCommand(**data["command"])
+            self._cached_vdf_mtime = data.get("vdf_mtime_ns")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            logger.debug("Кэш команды запуска %s не прочитан: %s", self.cache_path, err)
+
+    def _store(self, command: LaunchCommand, vdf_mtime: int | None) -> None:
+        self._cached = command
+        self._cached_vdf_mtime = vdf_mtime
+        self._cache_loaded = True
+
+        data = {"version": CACHE_VERSION, "vdf_mtime_ns": vdf_mtime, "command": asdict(command)}
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_name(f"{self.cache_path.name}.tmp")
+            tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_path, self.cache_path)
+        except OSError as err:
+            # Без кэша на диске команда останется в памяти до перезапуска приложения
+            logger.warning("Не удалось сохранить кэш команды запуска: %s", err)
+        logger.debug("Команда запуска игры (%s): %s", command.source, command.cmdline)
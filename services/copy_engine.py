@@ -0,0 +1,272 @@
+import os
+import errno
+import shutil
+import logging
+import threading
+import contextvars
+from collections import Counter
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TypeVar
+
+from core import metrics
+from core.exceptions import CopyError
+
+
+# Потоков не больше, чем ядер: файлы сохранения обычно в page cache, и копирование
+# упирается в процессор и GIL, а не в диск. На 3000 файлах по 10 КБ и одном ядре пул
+# из 4 потоков копирует в 3-4 раза медленнее одного потока, а один поток не медленнее
+# shutil.copytree. Проверить на своей машине: benchmarks.backup_bench --workers N.
+DEFAULT_COPY_WORKERS = min(4, os.cpu_count() or 1)
+# Меньше стольких элементов обрабатываются последовательно: запуск пула дороже выигрыша
+PARALLEL_MIN_ITEMS = 64
+
+# Способы копирования файла от самого дешевого к самому дорогому
+METHOD_REFLINK = "reflink"
+METHOD_COPY_FILE_RANGE = "copy_file_range"
+METHOD_COPY = "copy"
+
+# ioctl FICLONE из linux/fs.h: файл-приемник разделяет блоки данных с источником (btrfs, XFS)
+FICLONE = 0x40049409
+
+# Ошибки, означающие что способ не поддерживается для данной пары файловых систем
+_UNSUPPORTED_ERRNOS = frozenset(
+    code
+    for code in (
+        getattr(errno, "EOPNOTSUPP", None),
+        getattr(errno, "ENOTSUP", None),
+        errno.EXDEV,
+        errno.EINVAL,
+        errno.ENOSYS,
+        errno.ENOTTY,
+    )
+    if code is not None
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CopyJob:
+    """Задание на копирование одного файла."""
+
+    src: Path
+    dst: Path
+    # Если задано - после копирования файлу выставляется этот mtime
+    mtime_ns: int | None = None
+    # Если True - файл пишется во временный рядом и подменяет 'dst' переименованием,
+    # так что прерванное копирование не оставляет обрезанный файл
+    atomic: bool = False
+
+
+class CopyEngine:
+    """
+    Многопоточный движок копирования деревьев файлов:
+    - сначала создаются все папки, затем файлы копируются пулом потоков из общей очереди;
+      небольшие пачки и движок с одним потоком копируют последовательно
+    - ошибки по отдельным файлам собираются и выбрасываются одним исключением в конце
+    - для каждого файла используется самый дешевый доступный способ: reflink (FICLONE),
+      os.copy_file_range, обычное копирование. Неподдерживаемые способы запоминаются
+      для пары устройств источника и приемника и больше не пробуются.
+    """
+
+    def __init__(self, workers: int = DEFAULT_COPY_WORKERS):
+        if workers < 1:
+            raise ValueError("Недопустимое количество потоков")
+
+        self.workers = workers
+        self.method_counts: Counter[str] = Counter()
+
+        self._lock = threading.Lock()
+        self._unsupported: dict[tuple[int, int], set[str]] = {}
+        self._resolved: set[tuple[int, int]] = set()
+
+    def copy_files(self, jobs: Iterable[CopyJob], dirs: Iterable[Path] = ()) -> int:
+        """
+        Создает папки 'dirs' и копирует файлы по заданиям 'jobs'.
+
+        Args:
+            jobs (Iterable[CopyJob]): Задания на копирование.
+            dirs (Iterable[Path], optional): Папки, которые нужно создать до копирования.
+                Defaults to ().
+
+        Raises:
+            CopyError: Если хотя бы один файл не удалось скопировать.
+
+        Returns:
+            int: Количество скопированных байт.
+        """
+        for directory in dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+
+        before = self.method_counts.copy()
+        try:
+            return sum(self.map(self._copy_one, jobs))
+        finally:
+            used = self.method_counts - before
+            if used:
+                logger.debug(
+                    "Способы копирования файлов: %s",
+                    ", ".join(f"{method}={count}" for method, count in used.items()),
+                )
+
+    def copy_file(self, src: Path, dst: Path) -> str:
+        """
+        Копирует файл самым дешевым способом из доступных для пары файловых систем.
+
+        Args:
+            src (Path): Исходный файл.
+            dst (Path): Файл-приемник. Будет перезаписан.
+
+        Returns:
+            str: Использованный способ: "reflink", "copy_file_range" или "copy".
+        """
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+            src_stat = os.fstat(src_fd)
+            devices = (src_stat.st_dev, os.fstat(dst_fd).st_dev)
+            unsupported = self._unsupported.get(devices, set())
+
+            method = None
+            if fcntl is not None and METHOD_REFLINK not in unsupported:
+                method = self._try(devices, METHOD_REFLINK, self._reflink, src_fd, dst_fd)
+
+            if (
+                method is None
+                and hasattr(os, "copy_file_range")
+                and METHOD_COPY_FILE_RANGE not in unsupported
+            ):
+                method = self._try(
+                    devices, METHOD_COPY_FILE_RANGE, self._copy_range, src_fd, dst_fd
+                )
+                if method is None:
+                    # Часть данных могла успеть записаться до ошибки
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+
+            if method is None:
+                shutil.copyfileobj(fsrc, fdst, length=1024 * 1024)
+                method = METHOD_COPY
+
+        metrics.add_counter("files")
+        metrics.add_counter("bytes", src_stat.st_size)
+
+        with self._lock:
+            self.method_counts[method] += 1
+            if devices not in self._resolved:
+                self._resolved.add(devices)
+                logger.info(
+                    "Копирование с устройства %s на устройство %s: используется %s",
+                    *devices,
+                    method,
+                )
+        return method
+
+    def map(self, func: Callable[[T], R], items: Iterable[T]) -> list[R]:
+        """
+        Выполняет 'func' для каждого элемента 'items' в пуле потоков.
+
+        Args:
+            func (Callable[[T], R]): Функция обработки одного элемента.
+            items (Iterable[T]): Элементы для обработки.
+
+        Raises:
+            CopyError: Если обработка хотя бы одного элемента завершилась ошибкой.
+
+        Returns:
+            list[R]: Результаты успешно обработанных элементов в исходном порядке.
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        failures: list[tuple[T, Exception]] = []
+
+        def run(item: T) -> tuple[bool, R | None]:
+            try:
+                return True, func(item)
+            except Exception as e:
+                failures.append((item, e))
+                return False, None
+
+        if self.workers == 1 or len(items) < PARALLEL_MIN_ITEMS:
+            outcomes = [run(item) for item in items]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.workers, len(items)),
+                thread_name_prefix="copy_engine",
+            ) as executor:
+                # Контекст вызывающего потока (например, текущий цикл метрик)
+                # передается в потоки пула
+                futures = [
+                    executor.submit(contextvars.copy_context().run, run, item)
+                    for item in items
+                ]
+                outcomes = [future.result() for future in futures]
+
+        if failures:
+            for item, err in failures:
+                logger.debug("Ошибка при обработке %s: %s", item, err)
+            raise CopyError(
+                f"Не удалось обработать файлов: {len(failures)} из {len(items)}",
+                failures=failures,
+            )
+
+        return [result for ok, result in outcomes if ok]
+
+    def _copy_one(self, job: CopyJob) -> int:
+        target = job.dst.with_name(f"{job.dst.name}.tmp") if job.atomic else job.dst
+
+        self.copy_file(job.src, target)
+        if job.mtime_ns is not None:
+            os.utime(target, ns=(job.mtime_ns, job.mtime_ns))
+        if job.atomic:
+            os.replace(target, job.dst)
+        return os.path.getsize(job.dst)
+
+    def _try(
+        self,
+        devices: tuple[int, int],
+        method: str,
+        func: Callable[[int, int], None],
+        src_fd: int,
+        dst_fd: int,
+    ) -> str | None:
+        """
+        Пробует скопировать файл способом 'method'. Если способ не поддерживается -
+        запоминает это для пары устройств и возвращает None.
+        """
+        try:
+            func(src_fd, dst_fd)
+            return method
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            with self._lock:
+                self._unsupported.setdefault(devices, set()).add(method)
+            logger.debug("Способ %s не поддерживается для устройств %s: %s", method, devices, e)
+            return None
+
+    @staticmethod
+    def _reflink(src_fd: int, dst_fd: int) -> None:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+
+    @staticmethod
+    def _copy_range(src_fd: int, dst_fd: int) -> None:
+        remaining = os.fstat(src_fd).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src_fd, dst_fd, remaining)
+            if copied == 0:
+                break
+            remaining -= copied
@@ -0,0 +1,116 @@
+import os
+import re
+import mmap
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from pathlib import Path
+
+
+# Размер блока при потоковом чтении файла
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_DIGEST_SIZE = 20
+# Файлы от этого размера хэшируются через mmap одним вызовом update() без копирования
+# данных в буферы Python
+MMAP_MIN_SIZE = 8 * 1024 * 1024
+# Пул процессов окупает запуск интерпретаторов только на больших объемах; на меньших
+# хватает потоков - hashlib отпускает GIL при хэшировании
+PROCESS_POOL_MIN_BYTES = 256 * 1024 * 1024
+DEFAULT_HASH_WORKERS = os.cpu_count() or 1
+
+_DIGEST_RE = re.compile(f"[0-9a-f]{{{HASH_DIGEST_SIZE * 2}}}")
+
+logger = logging.getLogger(__name__)
+
+
+def is_valid_digest(digest: object) -> bool:
+    """
+    Функция проверки, что строка - хэш в формате hash_file: hex в нижнем регистре
+    нужной длины. Такой хэш безопасно использовать в пути к файлу объекта.
+
+    Args:
+        digest (object): Проверяемое значение.
+
+    Returns:
+        bool: True если это хэш.
+    """
+    return isinstance(digest, str) and _DIGEST_RE.fullmatch(digest) is not None
+
+
+def hash_file(path: str | Path) -> str:
+    """
+    Функция подсчета хэша содержимого файла (BLAKE2b, 160 бит).
+
+    Args:
+        path (str | Path): Путь к файлу.
+
+    Returns:
+        str: Хэш содержимого в hex-виде.
+    """
+    hasher = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size >= MMAP_MIN_SIZE:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        else:
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_files(paths: list[Path], workers: int = DEFAULT_HASH_WORKERS) -> list[str | None]:
+    """
+    Функция параллельного подсчета хэшей файлов. Большие объемы хэшируются в пуле
+    процессов, меньшие - в пуле потоков.
+
+    Args:
+        paths (list[Path]): Пути к файлам.
+        workers (int, optional): Количество параллельных исполнителей.
+            Defaults to DEFAULT_HASH_WORKERS.
+
+    Returns:
+        list[str | None]: Хэши в порядке 'paths'; None для файлов, которые не удалось прочитать.
+    """
+    if not paths:
+        return []
+
+    total_size = 0
+    for path in paths:
+        try:
+            total_size += path.stat().st_size
+        except OSError:
+            continue
+
+    workers = max(1, min(workers, len(paths)))
+    if workers > 1 and total_size >= PROCESS_POOL_MIN_BYTES:
+        # spawn: рабочие процессы не наследуют потоки и блокировки приложения
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            return list(
+                executor.map(
+                    _hash_or_none,
+                    [str(path) for path in paths],
+                    chunksize=max(1, len(paths) // (workers * 4)),
+                )
+            )
+
+    if workers == 1:
+        return [_hash_or_none(str(path)) for path in paths]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing") as executor:
+        return list(executor.map(_hash_or_none, [str(path) for path in paths]))
+
+
+def _hash_or_none(path: str) -> str | None:
+    try:
+        return hash_file(path)
+    except OSError as err:
+        logger.debug("Не удалось прочитать файл %s для хэширования: %s", path, err)
+        return None
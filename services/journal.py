@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from core.exceptions import JournalError
+from services.manifest import Snapshot
+
+
+JOURNAL_FILE_NAME = "journal.jsonl"
+JOURNAL_VERSION = 1
+# Выполненные файлы фиксируются в журнале пачками: fsync на каждый файл слишком дорог
+JOURNAL_BATCH_FILES = 256
+
+# Виды операций
+KIND_BACKUP = "backup"
+KIND_RESTORE_DELTA = "restore_delta"
+KIND_RESTORE_FULL = "restore_full"
+
+# Фазы операции
+PHASE_COPY = "copy"
+PHASE_SWAP = "swap"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JournalState:
+    """Состояние незавершенной операции, прочитанное из журнала."""
+
+    kind: str
+    snapshot: Snapshot
+    # Папка, в которую пишет операция: папка сохранения, подготовленная рядом папка
+    # или папка-источник бэкапа
+    target: Path
+    planned: list[str]
+    deleted: list[str]
+    started_at: float
+    completed: set[str] = field(default_factory=set)
+    phase: str = PHASE_COPY
+
+    @property
+    def remaining(self) -> list[str]:
+        """
+        Возвращает запланированные пути, которые не отмечены выполненными.
+
+        Returns:
+            list[str]: Пути в порядке плана.
+        """
+        return [rel_path for rel_path in self.planned if rel_path not in self.completed]
+
+
+class OperationJournal:
+    """
+    Журнал упреждающей записи (write-ahead) для бэкапа и восстановления:
+    - до первой записи в целевую папку в журнал пишется план: снапшот, список
+      копируемых и удаляемых путей - и сбрасывается на диск через fsync
+    - выполненные файлы дописываются пачками, каждая пачка - точка фиксации с fsync
+    - смена фазы (например, переход к подмене папок) тоже фиксируется
+    - после успешного завершения журнал удаляется; журнал, оставшийся после сбоя,
+      читается при следующем запуске, и операция доводится до конца или откатывается
+
+    Журнал - JSON lines: первая строка - план, затем строки с выполненными путями
+    и фазами. Оборванная последняя строка игнорируется.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    @property
+    def pending(self) -> bool:
+        """
+        Возвращает, осталась ли в журнале незавершенная операция.
+
+        Returns:
+            bool: True если журнал есть на диске.
+        """
+        return self._file is not None or self.path.exists()
+
+    def begin(
+        self,
+        kind: str,
+        snapshot: Snapshot,
+        target: Path,
+        planned: Iterable[str],
+        deleted: Iterable[str] = (),
+    ) -> None:
+        """
+        Начинает операцию: записывает план и фиксирует его на диске.
+
+        Args:
+            kind (str): Вид операции: KIND_BACKUP, KIND_RESTORE_DELTA или KIND_RESTORE_FULL.
+            snapshot (Snapshot): Снапшот, который создается или восстанавливается.
+            target (Path): Папка, в которую пишет операция.
+            planned (Iterable[str]): Пути файлов, которые будут записаны.
+            deleted (Iterable[str], optional): Пути, которые будут удалены. Defaults to ().
+
+        Raises:
+            JournalError: Если в журнале осталась незавершенная операция.
+        """
+        if self.pending:
+            raise JournalError(f"В журнале {self.path} осталась незавершенная операция")
+
+        header = {
+            "version": JOURNAL_VERSION,
+            "kind": kind,
+            "started_at": time.time(),
+            "target": str(target),
+            "snapshot": snapshot.to_dict(),
+            "planned": list(planned),
+            "deleted": list(deleted),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "x", encoding="utf-8")
+        self._append(header)
+        _fsync_dir(self.path.parent)
+
+    def resume(self) -> None:
+        """
+        Продолжает запись в журнал операции, оставшейся после сбоя, - при ее доведении
+        до конца выполненные файлы снова фиксируются.
+
+        Raises:
+            JournalError: Если журнала нет.
+        """
+        if self._file is not None:
+            return
+        if not self.path.exists():
+            raise JournalError(f"Журнал {self.path} не найден")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def complete(self, rel_paths: Iterable[str]) -> None:
+        """
+        Отмечает пути выполненными - точка фиксации.
+
+        Args:
+            rel_paths (Iterable[str]): Записанные или сохраненные в хранилище пути.
+        """
+        if rel_paths := list(rel_paths):
+            self._append({"done": rel_paths})
+
+    def set_phase(self, phase: str) -> None:
+        """
+        Фиксирует переход операции в фазу 'phase'.
+
+        Args:
+            phase (str): Фаза операции, например PHASE_SWAP.
+        """
+        self._append({"phase": phase})
+
+    def finish(self) -> None:
+        """Завершает операцию: журнал удаляется."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        _fsync_dir(self.path.parent)
+
+    def close(self) -> None:
+        """Закрывает файл журнала, оставляя его на диске для восстановления."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def load(self) -> JournalState | None:
+        """
+        Читает журнал незавершенной операции.
+
+        Returns:
+            (JournalState | None): Состояние операции; None если журнала нет. Журнал
+                с поврежденным планом удаляется: до фиксации плана операция ничего не писала.
+        """
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return None
+
+        try:
+            header = json.loads(lines[0])
+            if header.get("version") != JOURNAL_VERSION:
+                raise ValueError(f"неизвестная версия {header.get('version')}")
+            state = JournalState(
+                kind=header["kind"],
+                snapshot=Snapshot.from_dict(header["snapshot"]),
+                target=Path(header["target"]),
+                planned=header["planned"],
+                deleted=header["deleted"],
+                started_at=header["started_at"],
+            )
+        except (IndexError, KeyError, TypeError, ValueError) as err:
+            logger.warning("Журнал операции %s поврежден и удален: %s", self.path, err)
+            self.finish()
+            return None
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Запись оборвалась на сбое - дальше данных нет
+                break
+            state.completed.update(record.get("done", ()))
+            state.phase = record.get("phase", state.phase)
+        return state
+
+    def _append(self, record: dict) -> None:
+        if self._file is None:
+            raise JournalError("Операция в журнале не начата")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+def _fsync_dir(path: Path) -> None:
+    """Фиксирует на диске создание и удаление файлов в папке. На Windows не требуется."""
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
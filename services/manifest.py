@@ -0,0 +1,69 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """Запись манифеста об одном файле сохранения."""
+
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+@dataclass
+class Snapshot:
+    """
+    Снапшот сохранения - манифест, ссылающийся на объекты хранилища по хэшу содержимого.
+    """
+
+    snapshot_id: str
+    created_at: float
+    files: dict[str, FileEntry] = field(default_factory=dict)
+    dirs: list[str] = field(default_factory=list)
+    last_restored_at: float | None = None
+
+    @property
+    def total_size(self) -> int:
+        """
+        Возвращает суммарный размер файлов снапшота.
+
+        Returns:
+            int: Размер в байтах.
+        """
+        return sum(entry.size for entry in self.files.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "snapshot_id": self.snapshot_id,
+            "created_at": self.created_at,
+            "last_restored_at": self.last_restored_at,
+            "dirs": self.dirs,
+            "files": {
+                path: [entry.size, entry.mtime_ns, entry.digest]
+                for path, entry in self.files.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Snapshot":
+        return cls(
+            snapshot_id=data["snapshot_id"],
+            created_at=data["created_at"],
+            last_restored_at=data.get("last_restored_at"),
+            dirs=list(data.get("dirs", [])),
+            files={
+                path: FileEntry(size=size, mtime_ns=mtime_ns, digest=digest)
+                for path, (size, mtime_ns, digest) in data["files"].items()
+            },
+        )
+
+
+@dataclass(frozen=True)
+class SnapshotInfo:
+    """Краткие сведения о снапшоте без списка файлов - для быстрого вывода списка."""
+
+    snapshot_id: str
+    created_at: float
+    last_restored_at: float | None
+    file_count: int
+    total_size: int
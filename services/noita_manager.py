@@ -2,9 +2,12 @@ import platform
 import subprocess
 import logging
 
+from core import metrics
 from services.noita_process import NoitaProcess
 from services.closers import WindowsCloser
+from services.cmdline_resolver import CmdlineResolver
 from core.exceptions import (
+    NoitaCmdlineResolverError,
     ProcessWaitTimeoutError,
     ProcessNotFoundError,
     ShutdownFailError,
@@ -23,15 +26,56 @@ class NoitaManager:
     - запуск через psutil.Popen с использованием аргументов командной строки
     - корректное завершение средствами специфичной ОС или принудительное завершение
     - проверка состояния процесса
+
+    Если командная строка не передана явно, она берется из CmdlineResolver: из кэша
+    на диске или из библиотек Steam, так что игру можно запустить, не закрывая ее перед этим.
     """
 
     def __init__(
         self,
         noita_cmdline: list[str] | None = None,
         cwd: str | None = None,
+        resolver: CmdlineResolver | None = None,
     ):
         self._launch_cmdline = noita_cmdline
         self._cwd = cwd
+        # Явно переданная команда не подменяется найденной и не сохраняется в кэш
+        if resolver is None and noita_cmdline is None:
+            resolver = CmdlineResolver()
+        self._resolver = resolver
+
+    def prepare_launch(self) -> bool:
+        """
+        Заранее находит команду запуска игры, чтобы первый запуск не ждал поиска.
+
+        Returns:
+            bool: True если команда запуска известна.
+        """
+        if self.launch_ready:
+            return True
+        if not self._resolver:
+            return False
+
+        try:
+            command = self._resolver.resolve()
+        except NoitaCmdlineResolverError as err:
+            logger.warning("Команда запуска игры не найдена: %s", err)
+            return False
+
+        self._launch_cmdline = command.cmdline
+        self._cwd = command.cwd
+        return True
+
+    @property
+    def launch_ready(self) -> bool:
+        """
+        Возвращает, известна ли уже команда запуска игры. В отличие от prepare_launch
+        ничего не ищет и не меняет, поэтому безопасно вызывается из любого потока.
+
+        Returns:
+            bool: True если команда запуска известна.
+        """
+        return bool(self._launch_cmdline and self._cwd)
 
     def launch_noita(self) -> None:
         """
@@ -40,17 +84,26 @@ class NoitaManager:
         Raises:
             StartupFailError: Если игра уже запущена или запуск не удался.
         """
-        if not self._launch_cmdline or not self._cwd:
+        if not self.prepare_launch():
             raise StartupFailError("Нет командной строки для запуска процесса.")
-        if self._check_noita_running():
-            raise StartupFailError("Процесс игры уже запущен.")
+        with metrics.span("process_lookup"):
+            if self._check_noita_running():
+                raise StartupFailError("Процесс игры уже запущен.")
 
         logger.debug("Запуск процесса по командной строке: %s", self._launch_cmdline)
 
         try:
-            subprocess.Popen(self._launch_cmdline, cwd=self._cwd)
-            new_process = NoitaProcess.attach(wait=True)
+            with metrics.span("relaunch"):
+                launcher = subprocess.Popen(self._launch_cmdline, cwd=self._cwd)
+            with metrics.span("wait_for_process"):
+                new_process = NoitaProcess.attach_child(parent_pid=launcher.pid)
         except Exception as e:
+            if self._resolver:
+                # Сохраненная команда устарела (например, игру переустановили в другую
+                # библиотеку) - следующий запуск заново ищет ее в Steam
+                self._resolver.invalidate()
+                self._launch_cmdline = None
+                self._cwd = None
             raise StartupFailError("Не удалось запустить процесс игры.") from e
 
         logger.debug("Процесс работает с PID: %s", new_process.pid)
@@ -63,21 +116,25 @@ class NoitaManager:
         Raises:
             ShutdownFailError: Если процесс не найден или не завершился вовремя.
         """
-        if not (running_noita := self._check_noita_running()):
+        with metrics.span("process_lookup"):
+            running_noita = self._check_noita_running()
+        if not running_noita:
             raise ShutdownFailError(
                 "Попытка остановить процесс игры, когда таких процессов в операционной системе нет."
             )
 
         logger.debug("Попытка завершить процесс игры с PID: %s", running_noita.pid)
 
-        if platform.system() == "Windows":
-            self._graceful_terminate_windows(pid=running_noita.pid)
-        else:
-            self._soft_terminate(process_to_terminate=running_noita)
+        with metrics.span("graceful_close"):
+            if platform.system() == "Windows":
+                self._graceful_terminate_windows(pid=running_noita.pid)
+            else:
+                self._soft_terminate(process_to_terminate=running_noita)
 
         # Ожидание завершения
         try:
-            running_noita.wait_for_terminate(timeout=TIMEOUT_TO_GRACEFULLY)
+            with metrics.span("exit_wait"):
+                running_noita.wait_for_terminate(timeout=TIMEOUT_TO_GRACEFULLY)
         except ProcessWaitTimeoutError as e:
             raise ShutdownFailError(
                 "Истекло время ожидания на завершение процесса игры."
@@ -86,9 +143,33 @@ class NoitaManager:
         # Для дальнейшего запуска
         self._launch_cmdline = running_noita.cmdline
         self._cwd = running_noita.cwd
+        if self._resolver:
+            command = self._resolver.remember(running_noita.cmdline, running_noita.cwd)
+            # Без команды процесс не запускается напрямую (игра под Proton) - запуск через Steam
+            self._launch_cmdline = command.cmdline if command else None
 
         logger.info("Процесс игры завершен успешно.")
 
+    def wait_for_write_quiet(self, window: float, timeout: float) -> bool:
+        """
+        Ожидает период, в течение которого игра ничего не записывает. Если игра
+        не запущена, сохранение никто не меняет и ждать нечего.
+
+        Args:
+            window (float): Длительность периода без записи (в секундах).
+            timeout (float): Максимальное время ожидания (в секундах).
+
+        Returns:
+            bool: True если игра не пишет или не запущена, False если истекло время.
+        """
+        with metrics.span("process_lookup"):
+            running_noita = self._check_noita_running()
+        if not running_noita:
+            return True
+
+        with metrics.span("quiet_wait"):
+            return running_noita.wait_for_write_quiet(window=window, timeout=timeout)
+
     def _check_noita_running(self) -> NoitaProcess | None:
         """
         Проверяет наличие процесса игры.
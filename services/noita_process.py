@@ -1,7 +1,9 @@
+import os
 import psutil
 import time
+import select
 
-from core.utils import get_process_by_name
+from core.process_locator import ProcessLocator
 from core.exceptions import (
     ProcessNotFoundError,
     ProcessAccessError,
@@ -17,8 +19,14 @@ class NoitaProcess:
     - Предоставляет информацию о процессе: cmdline, cwd, pid
     - Позволяет проверить статус процесса
     - Кросс-платформенная реализация завершения
+
+    Поиск по имени идет через ProcessLocator, который помнит последний найденный процесс.
+    На Linux завершение процесса ожидается через pidfd без опроса, а запуск отслеживается
+    по дереву дочерних процессов запустившего Popen.
     """
 
+    _locators: dict[str, ProcessLocator] = {}
+
     def __init__(self, process: psutil.Process):
         if not process.is_running():
             raise ProcessIsDeadError(
@@ -73,11 +81,99 @@ class NoitaProcess:
         if timeout <= 0:
             raise ValueError("Недопустимый параметр timeout")
 
+        if self._wait_pidfd(timeout) is False:
+            raise ProcessWaitTimeoutError("Процесс не завершился за отведенное время.")
+
         try:
             return self._process.wait(timeout)
         except psutil.TimeoutExpired:
             raise ProcessWaitTimeoutError("Процесс не завершился за отведенное время.")
 
+    def _wait_pidfd(self, timeout: float) -> bool | None:
+        """
+        Ожидает завершения процесса через pidfd_open + poll: ядро будит поток в момент
+        выхода процесса, без периодического опроса.
+
+        Args:
+            timeout (float): Максимальное время ожидания (в секундах).
+
+        Returns:
+            (bool | None): True если процесс завершился, False если истекло время,
+                None если pidfd недоступен и нужно ожидание средствами psutil.
+        """
+        if not hasattr(os, "pidfd_open"):
+            return None
+
+        try:
+            pidfd = os.pidfd_open(self.pid)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return None
+
+        try:
+            # PID мог быть переиспользован до открытия pidfd - сверяем время создания
+            if not self._process.is_running():
+                return True
+
+            poller = select.poll()
+            poller.register(pidfd, select.POLLIN)
+            return bool(poller.poll(timeout * 1000))
+        finally:
+            os.close(pidfd)
+
+    def write_counters(self) -> tuple[int, int] | None:
+        """
+        Возвращает количество операций записи и записанных байт с момента запуска процесса.
+
+        Returns:
+            (tuple[int, int] | None): Счетчики (операции, байты); None если ОС их
+                не предоставляет или процесс завершился.
+        """
+        try:
+            counters = self._process.io_counters()
+        except (AttributeError, NotImplementedError, psutil.AccessDenied, psutil.NoSuchProcess):
+            return None
+        return counters.write_count, counters.write_bytes
+
+    def wait_for_write_quiet(
+        self,
+        window: float,
+        timeout: float,
+        interval: float = 0.05,
+    ) -> bool:
+        """
+        Ожидает, пока процесс не будет ничего записывать в течение 'window' секунд подряд.
+        Если счетчики ввода-вывода недоступны с самого начала - сразу возвращает True.
+
+        Args:
+            window (float): Длительность периода без записи (в секундах).
+            timeout (float): Максимальное время ожидания (в секундах).
+            interval (float, optional): Период опроса счетчиков (в секундах). Defaults to 0.05.
+
+        Returns:
+            bool: True если период без записи дождались, False если истекло время,
+                процесс завершился или счетчики перестали читаться.
+        """
+        if (last := self.write_counters()) is None:
+            return True
+
+        now = time.monotonic()
+        deadline = now + timeout
+        quiet_since = now
+        while now < deadline:
+            time.sleep(interval)
+            now = time.monotonic()
+            if (current := self.write_counters()) is None:
+                return False
+
+            if current != last:
+                last = current
+                quiet_since = now
+            elif now - quiet_since >= window:
+                return True
+        return False
+
     @classmethod
     def attach(
         cls,
@@ -110,9 +206,10 @@ class NoitaProcess:
             raise ValueError("Недопустимые параметры")
 
         attempts = retries if wait else 1
+        locator = cls.locator(name)
 
         for i in range(attempts):
-            process = get_process_by_name(name)
+            process = locator.find()
             if process:
                 return cls(process)
 
@@ -121,6 +218,78 @@ class NoitaProcess:
 
         raise ProcessNotFoundError("Процесс Ноиты не найден")
 
+    @classmethod
+    def attach_child(
+        cls,
+        parent_pid: int,
+        name: str = "noita.exe",
+        timeout: float = 7,
+    ) -> "NoitaProcess":
+        """
+        Ожидает появления процесса Ноиты, запущенного процессом 'parent_pid' (обычно PID
+        из subprocess.Popen): сам процесс или его потомок. Опрашивается только дерево
+        потомков с нарастающей от нескольких миллисекунд задержкой, так что процесс
+        находится почти сразу после создания. Если запускающий процесс завершился,
+        не породив игру (например, запуск передан Steam), выполняется обычный поиск по имени.
+
+        Args:
+            parent_pid (int): PID запускающего процесса.
+            name (str, optional): Название процесса Ноиты. Defaults to "noita.exe".
+            timeout (float, optional): Максимальное время ожидания (в секундах). Defaults to 7.
+
+        Raises:
+            ProcessNotFoundError: Если процесс не появился за отведенное время.
+
+        Returns:
+            NoitaProcess: Класс-обертка над работающим процессом.
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+
+        try:
+            parent = psutil.Process(parent_pid)
+            while time.monotonic() < deadline:
+                for candidate in (parent, *parent.children(recursive=True)):
+                    try:
+                        # Сразу после exec командная строка процесса может быть еще пустой
+                        if candidate.name() == name and candidate.cmdline():
+                            cls.locator(name).remember(candidate)
+                            return cls(candidate)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        continue
+
+                if parent.status() == psutil.STATUS_ZOMBIE:
+                    break
+
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+
+        remaining = deadline - time.monotonic()
+        return cls.attach(
+            name=name,
+            wait=True,
+            retries=max(1, int(remaining / 0.33)),
+            delay=0.33,
+        )
+
+    @classmethod
+    def locator(cls, name: str = "noita.exe") -> ProcessLocator:
+        """
+        Возвращает общий для приложения локатор процессов с именем 'name'.
+        Через него доступны счетчики попаданий/промахов кэша PID.
+
+        Args:
+            name (str, optional): Название процесса. Defaults to "noita.exe".
+
+        Returns:
+            ProcessLocator: Локатор процессов.
+        """
+        if name not in cls._locators:
+            cls._locators.setdefault(name, ProcessLocator(name))
+        return cls._locators[name]
+
     @property
     def is_alive(self) -> bool:
         """
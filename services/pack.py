@@ -0,0 +1,399 @@
+import os
+import re
+import json
+import lzma
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from core.exceptions import (
+    NoitaError,
+    PackFormatError,
+    SnapshotCorruptedError,
+)
+from services.hashing import (
+    HASH_DIGEST_SIZE,
+    is_valid_digest,
+)
+from services.manifest import Snapshot
+from services.snapshot_store import SnapshotStore
+
+try:
+    import zstandard
+except ImportError:  # zstd - необязательная зависимость
+    zstandard = None
+
+
+PACK_SUFFIX = ".nspack"
+PACK_VERSION = 1
+PACK_MAGIC = b"NSPACK\x01\n"
+PACK_END_MAGIC = b"NSPKEND\n"
+# Хвост файла: смещение и длина индекса, завершающая сигнатура
+_TRAILER = struct.Struct("<QQ8s")
+_CHUNK_SIZE = 1024 * 1024
+
+CODEC_ZSTD = "zstd"
+CODEC_LZMA = "lzma"
+CODEC_ZLIB = "zlib"
+CODECS = (CODEC_ZSTD, CODEC_LZMA, CODEC_ZLIB)
+
+_DRIVE_RE = re.compile(r"[A-Za-z]:")
+
+logger = logging.getLogger(__name__)
+
+
+def default_codec() -> str:
+    """
+    Функция выбора кодека по умолчанию: zstd, если установлен пакет zstandard, иначе zlib.
+    lzma сжимает сильнее, но в разы медленнее - его нужно выбирать явно.
+
+    Returns:
+        str: Название кодека.
+    """
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def _compressor(codec: str):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise PackFormatError("Для кодека zstd нужен пакет zstandard")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if codec == CODEC_LZMA:
+        return lzma.LZMACompressor(preset=6)
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(6)
+    raise PackFormatError(f"Неизвестный кодек: {codec}")
+
+
+def _decompressor(codec: str):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise PackFormatError("Для кодека zstd нужен пакет zstandard")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == CODEC_LZMA:
+        return lzma.LZMADecompressor()
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    raise PackFormatError(f"Неизвестный кодек: {codec}")
+
+
+@dataclass(frozen=True)
+class PackIndex:
+    """Индекс пака: снапшот и расположение сжатого содержимого каждого объекта."""
+
+    codec: str
+    snapshot: Snapshot
+    # Хэш объекта -> (смещение от начала файла, длина в сжатом виде)
+    objects: dict[str, tuple[int, int]]
+
+
+def write_pack(
+    store: SnapshotStore,
+    snapshot: Snapshot,
+    path: Path,
+    codec: str | None = None,
+) -> int:
+    """
+    Функция экспорта снапшота в один файл-пак. Каждый уникальный объект сжимается
+    потоково и отдельно от остальных, в конце файла пишется индекс смещений, поэтому
+    любой файл можно достать из пака без распаковки остальных. Файл подменяется
+    переименованием, недописанный пак не остается.
+
+    Args:
+        store (SnapshotStore): Хранилище, в котором лежат объекты снапшота.
+        snapshot (Snapshot): Экспортируемый снапшот.
+        path (Path): Путь к файлу пака.
+        codec (str | None, optional): Кодек сжатия: "zstd", "lzma" или "zlib".
+            Defaults to None - default_codec().
+
+    Raises:
+        PackFormatError: Если кодек неизвестен или недоступен.
+
+    Returns:
+        int: Размер пака в байтах.
+    """
+    codec = codec or default_codec()
+    _compressor(codec)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    objects: dict[str, tuple[int, int]] = {}
+
+    with open(tmp_path, "wb") as pack:
+        pack.write(PACK_MAGIC)
+        for entry in snapshot.files.values():
+            if entry.digest in objects:
+                continue
+
+            offset = pack.tell()
+            compressor = _compressor(codec)
+            with open(store.object_path(entry.digest), "rb") as source:
+                while chunk := source.read(_CHUNK_SIZE):
+                    pack.write(compressor.compress(chunk))
+            pack.write(compressor.flush())
+            objects[entry.digest] = (offset, pack.tell() - offset)
+
+        index = json.dumps(
+            {
+                "version": PACK_VERSION,
+                "codec": codec,
+                "snapshot": snapshot.to_dict(),
+                "objects": objects,
+            }
+        ).encode("utf-8")
+        index_offset = pack.tell()
+        pack.write(zlib.compress(index))
+        pack.write(_TRAILER.pack(index_offset, pack.tell() - index_offset, PACK_END_MAGIC))
+        pack.flush()
+        os.fsync(pack.fileno())
+
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def read_pack_index(path: Path) -> PackIndex:
+    """
+    Функция чтения индекса пака с конца файла.
+
+    Args:
+        path (Path): Путь к файлу пака.
+
+    Raises:
+        PackFormatError: Если файл не является паком или поврежден.
+
+    Returns:
+        PackIndex: Индекс пака.
+    """
+    with open(path, "rb") as pack:
+        if pack.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            raise PackFormatError(f"Файл {path} не является паком снапшота")
+
+        pack.seek(-_TRAILER.size, os.SEEK_END)
+        index_offset, index_length, end_magic = _TRAILER.unpack(pack.read(_TRAILER.size))
+        if end_magic != PACK_END_MAGIC:
+            raise PackFormatError(f"Пак {path} оборван: нет индекса в конце файла")
+
+        pack.seek(index_offset)
+        try:
+            data = json.loads(zlib.decompress(pack.read(index_length)))
+        except (zlib.error, ValueError) as e:
+            raise PackFormatError(f"Индекс пака {path} поврежден") from e
+
+    if data.get("version") != PACK_VERSION:
+        raise PackFormatError(f"Неподдерживаемая версия пака: {data.get('version')}")
+
+    return PackIndex(
+        codec=data["codec"],
+        snapshot=Snapshot.from_dict(data["snapshot"]),
+        objects={digest: tuple(location) for digest, location in data["objects"].items()},
+    )
+
+
+def extract_file(path: Path, rel_path: str, index: PackIndex | None = None) -> bytes:
+    """
+    Функция извлечения одного файла снапшота из пака. Распаковывается только его содержимое.
+
+    Args:
+        path (Path): Путь к файлу пака.
+        rel_path (str): Путь файла внутри снапшота (с разделителем '/').
+        index (PackIndex | None, optional): Уже прочитанный индекс. Defaults to None.
+
+    Raises:
+        PackFormatError: Если файла нет в паке или пак поврежден.
+
+    Returns:
+        bytes: Содержимое файла.
+    """
+    index = index or read_pack_index(path)
+    if (entry := index.snapshot.files.get(rel_path)) is None:
+        raise PackFormatError(f"Файла {rel_path} нет в паке {path}")
+
+    with open(path, "rb") as pack:
+        return b"".join(_iter_object(pack, index, entry.digest))
+
+
+def import_pack(store: SnapshotStore, path: Path) -> Snapshot:
+    """
+    Функция импорта пака в хранилище: недостающие объекты распаковываются с проверкой
+    хэша, затем снапшот регистрируется под своим идентификатором.
+
+    Args:
+        store (SnapshotStore): Хранилище для импорта.
+        path (Path): Путь к файлу пака.
+
+    Raises:
+        PackFormatError: Если пак поврежден, в индексе есть путь вне папки сохранения
+            или недопустимый хэш, или снапшот уже есть в хранилище.
+        SnapshotCorruptedError: Если содержимое объекта не совпало с хэшем.
+
+    Returns:
+        Snapshot: Импортированный снапшот.
+    """
+    index = read_pack_index(path)
+    _validate_index(index, path)
+    snapshot = index.snapshot
+    if snapshot.snapshot_id in store.list_ids():
+        raise PackFormatError(f"Снапшот {snapshot.snapshot_id} уже есть в хранилище")
+
+    with open(path, "rb") as pack:
+        for digest in index.objects:
+            if store.has_object(digest):
+                continue
+
+            hasher = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+            tmp_path = store.object_path(digest).with_name(f"{digest[2:]}.import.tmp")
+            tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as target:
+                for chunk in _iter_object(pack, index, digest):
+                    hasher.update(chunk)
+                    target.write(chunk)
+
+            if hasher.hexdigest() != digest:
+                tmp_path.unlink()
+                raise SnapshotCorruptedError(
+                    f"Объект {digest} в паке {path} поврежден",
+                    paths=[rel for rel, e in snapshot.files.items() if e.digest == digest],
+                )
+            store.put_object(digest, tmp_path)
+
+    store.add_snapshot(snapshot)
+    logger.info("Снапшот %s импортирован из пака %s", snapshot.snapshot_id, path)
+    return snapshot
+
+
+def _validate_index(index: PackIndex, path: Path) -> None:
+    """
+    Проверяет, что индекс пака не выводит запись за пределы хранилища и папки сохранения:
+    пути файлов и папок - относительные без '..', хэши - строки нужного формата.
+
+    Raises:
+        PackFormatError: Если в индексе есть недопустимый путь, хэш или идентификатор.
+    """
+    snapshot = index.snapshot
+    if not _is_safe_rel_path(snapshot.snapshot_id) or "/" in snapshot.snapshot_id:
+        raise PackFormatError(
+            f"Недопустимый идентификатор снапшота в паке {path}: {snapshot.snapshot_id!r}"
+        )
+
+    for rel_path in [*snapshot.files, *snapshot.dirs]:
+        if not _is_safe_rel_path(rel_path):
+            raise PackFormatError(f"Недопустимый путь в паке {path}: {rel_path!r}")
+
+    digests = [entry.digest for entry in snapshot.files.values()]
+    for digest in [*index.objects, *digests]:
+        if not is_valid_digest(digest):
+            raise PackFormatError(f"Недопустимый хэш объекта в паке {path}: {digest!r}")
+
+
+def _is_safe_rel_path(rel_path: str) -> bool:
+    if not isinstance(rel_path, str) or not rel_path:
+        return False
+    if "\\" in rel_path or rel_path.startswith("/") or _DRIVE_RE.match(rel_path):
+        return False
+    return all(part not in ("", ".", "..") for part in rel_path.split("/"))
+
+
+def _iter_object(pack, index: PackIndex, digest: str):
+    if (location := index.objects.get(digest)) is None:
+        raise PackFormatError(f"Объекта {digest} нет в паке")
+
+    offset, length = location
+    pack.seek(offset)
+    decompressor = _decompressor(index.codec)
+    while length > 0:
+        chunk = pack.read(min(_CHUNK_SIZE, length))
+        if not chunk:
+            raise PackFormatError("Пак оборван посреди объекта")
+        length -= len(chunk)
+        yield decompressor.decompress(chunk)
+    if hasattr(decompressor, "flush"):
+        yield decompressor.flush()
+
+
+class PackExporter:
+    """
+    Фоновый экспорт последнего снапшота в пак:
+    - сжатие идет в отдельном потоке и не задерживает цикл бэкапа
+    - несколько запросов подряд схлопываются в один
+    - паки снапшотов, удаленных из хранилища по политике хранения, удаляются
+    """
+
+    def __init__(self, store: SnapshotStore, pack_dir: Path, codec: str | None = None):
+        self.store = store
+        self.pack_dir = pack_dir
+        self.codec = codec or default_codec()
+
+        self._state_lock = threading.Lock()
+        self._requested = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._worker: threading.Thread | None = None
+
+    def pack_path(self, snapshot_id: str) -> Path:
+        return self.pack_dir / f"{snapshot_id}{PACK_SUFFIX}"
+
+    def request_export(self) -> None:
+        """Запрашивает фоновый экспорт последнего снапшота."""
+        with self._state_lock:
+            self._idle.clear()
+            self._requested.set()
+
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._export_loop,
+                    name="pack_exporter",
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """
+        Ожидает завершения фонового экспорта.
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания (в секундах).
+                Defaults to None.
+
+        Returns:
+            bool: True если экспортов в очереди нет.
+        """
+        return self._idle.wait(timeout)
+
+    def _export_loop(self) -> None:
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            try:
+                self._export_latest()
+            except (OSError, NoitaError) as err:
+                logger.warning("Не удалось экспортировать бэкап в пак: %s", err)
+
+            with self._state_lock:
+                if not self._requested.is_set():
+                    self._idle.set()
+
+    def _export_latest(self) -> None:
+        existing = set(self.store.list_ids())
+        if self.pack_dir.is_dir():
+            for pack_path in self.pack_dir.glob(f"*{PACK_SUFFIX}"):
+                if pack_path.name.removesuffix(PACK_SUFFIX) not in existing:
+                    pack_path.unlink(missing_ok=True)
+
+        if not (snapshot := self.store.latest()):
+            return
+        pack_path = self.pack_path(snapshot.snapshot_id)
+        if pack_path.exists():
+            return
+
+        size = write_pack(self.store, snapshot, pack_path, codec=self.codec)
+        logger.debug(
+            "Снапшот %s экспортирован в пак %s: %s байт вместо %s",
+            snapshot.snapshot_id,
+            pack_path.name,
+            size,
+            snapshot.total_size,
+        )
@@ -0,0 +1,145 @@
+import logging
+import threading
+from pathlib import Path
+
+from core.utils import swap_directory
+from core.exceptions import NoitaError
+from services.manifest import Snapshot
+from services.snapshot_diff import diff_folder
+from services.snapshot_store import SnapshotStore
+
+
+logger = logging.getLogger(__name__)
+
+
+class Prestager:
+    """
+    Держит рядом с папкой сохранения готовую к подмене копию последнего снапшота,
+    чтобы восстановление стоило одно переименование:
+    - копия обновляется в фоновом потоке; несколько запросов подряд схлопываются в один
+    - обновление инкрементальное: в копию дописываются только отличающиеся файлы
+    - после подмены старое сохранение становится основой для следующей копии
+    - готовность копии подтверждается файлом-маркером с идентификатором снапшота,
+      который пишется только после завершения обновления
+    - перед подменой копия сверяется с манифестом снапшота по набору файлов,
+      размерам и mtime; расходящаяся копия не используется
+    """
+
+    def __init__(self, store: SnapshotStore, saves_dir: Path):
+        self.store = store
+        self.saves_dir = saves_dir
+        self.prestaged_dir = saves_dir.with_name(f"{saves_dir.name}.prestaged")
+        self.marker_path = saves_dir.with_name(f"{saves_dir.name}.prestaged.id")
+
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refresh_requested = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._worker: threading.Thread | None = None
+
+    def request_refresh(self) -> None:
+        """
+        Запрашивает фоновое обновление подготовленной копии до последнего снапшота.
+        """
+        with self._state_lock:
+            self._idle.clear()
+            self._refresh_requested.set()
+
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._refresh_loop,
+                    name="prestager",
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def try_swap_in(self, snapshot: Snapshot) -> bool:
+        """
+        Подменяет папку сохранения подготовленной копией, если она готова, собрана
+        из снапшота 'snapshot' и совпадает с его манифестом по файлам, размерам и mtime.
+        Не ждет фоновое обновление, если оно идет.
+
+        Args:
+            snapshot (Snapshot): Снапшот, который нужно восстановить.
+
+        Returns:
+            bool: True если сохранение подменено, иначе False.
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.debug("Подготовленная копия еще обновляется, подмена пропущена")
+            return False
+
+        try:
+            if self._ready_snapshot_id() != snapshot.snapshot_id:
+                return False
+            if diff := diff_folder(snapshot, self.prestaged_dir):
+                # Копию изменили после подготовки - ее поправит следующее обновление
+                logger.warning(
+                    "Подготовленная копия снапшота %s расходится с манифестом "
+                    "(файлов: %s), восстановление идет из хранилища",
+                    snapshot.snapshot_id,
+                    len(diff.changes),
+                )
+                self.marker_path.unlink(missing_ok=True)
+                return False
+
+            self.marker_path.unlink()
+            if old_dir := swap_directory(staging=self.prestaged_dir, target=self.saves_dir):
+                old_dir.rename(self.prestaged_dir)
+        finally:
+            self._lock.release()
+
+        logger.debug(
+            "Сохранение подменено подготовленной копией снапшота %s", snapshot.snapshot_id
+        )
+        return True
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """
+        Ожидает завершения фонового обновления.
+
+        Args:
+            timeout (float | None, optional): Максимальное время ожидания (в секундах).
+                Defaults to None.
+
+        Returns:
+            bool: True если обновлений в очереди нет.
+        """
+        return self._idle.wait(timeout)
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._refresh_requested.wait()
+            self._refresh_requested.clear()
+            try:
+                with self._lock:
+                    self._refresh()
+            except (OSError, NoitaError) as err:
+                logger.warning("Не удалось подготовить копию для восстановления: %s", err)
+
+            with self._state_lock:
+                if not self._refresh_requested.is_set():
+                    self._idle.set()
+
+    def _refresh(self) -> None:
+        if not (snapshot := self.store.latest()):
+            return
+        if self._ready_snapshot_id() == snapshot.snapshot_id:
+            return
+
+        self.marker_path.unlink(missing_ok=True)
+        written, deleted = self.store.sync_to(snapshot, self.prestaged_dir)
+        self.marker_path.write_text(snapshot.snapshot_id, encoding="utf-8")
+
+        logger.debug(
+            "Подготовлена копия снапшота %s: записано файлов - %s, удалено - %s",
+            snapshot.snapshot_id,
+            written,
+            deleted,
+        )
+
+    def _ready_snapshot_id(self) -> str | None:
+        if not self.marker_path.is_file() or not self.prestaged_dir.is_dir():
+            return None
+        return self.marker_path.read_text(encoding="utf-8").strip()
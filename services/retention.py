@@ -0,0 +1,88 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+
+from services.manifest import SnapshotInfo
+from services.snapshot_store import SnapshotStore
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    Политика хранения поколений бэкапов. Снапшот сохраняется, если его оставляет
+    хотя бы одно правило, после чего применяется ограничение на место на диске.
+    """
+
+    # Сколько последних снапшотов хранить всегда
+    keep_last: int = 5
+    # За сколько последних часов/дней хранить по одному (самому новому) снапшоту
+    keep_hourly: int = 24
+    keep_daily: int = 7
+    # Предел места под объекты хранилища в байтах. None - без ограничения
+    max_bytes: int | None = None
+
+
+def select_expired(snapshots: list[SnapshotInfo], policy: RetentionPolicy) -> list[str]:
+    """
+    Функция выбора снапшотов, которые не оставляет ни одно правило политики.
+
+    Args:
+        snapshots (list[SnapshotInfo]): Снапшоты в порядке создания.
+        policy (RetentionPolicy): Политика хранения.
+
+    Returns:
+        list[str]: Идентификаторы снапшотов на удаление.
+    """
+    newest_first = snapshots[::-1]
+    keep = {snapshot.snapshot_id for snapshot in newest_first[: max(policy.keep_last, 1)]}
+
+    for bucket_format, limit in (
+        ("%Y%m%d%H", policy.keep_hourly),
+        ("%Y%m%d", policy.keep_daily),
+    ):
+        buckets: set[str] = set()
+        for snapshot in newest_first:
+            if len(buckets) >= limit:
+                break
+            bucket = datetime.fromtimestamp(snapshot.created_at).strftime(bucket_format)
+            if bucket not in buckets:
+                buckets.add(bucket)
+                keep.add(snapshot.snapshot_id)
+
+    return [s.snapshot_id for s in snapshots if s.snapshot_id not in keep]
+
+
+def apply_retention(store: SnapshotStore, policy: RetentionPolicy) -> list[str]:
+    """
+    Функция применения политики хранения к хранилищу. Сначала удаляются снапшоты,
+    не попавшие ни под одно правило, затем, пока превышен предел места, - снапшоты,
+    из которых дольше всего не восстанавливались. Последний снапшот не удаляется никогда.
+
+    Args:
+        store (SnapshotStore): Хранилище снапшотов.
+        policy (RetentionPolicy): Политика хранения.
+
+    Returns:
+        list[str]: Идентификаторы удаленных снапшотов.
+    """
+    deleted = select_expired(store.list_snapshots(), policy)
+    for snapshot_id in deleted:
+        store.delete(snapshot_id)
+
+    if policy.max_bytes is not None and store.total_bytes > policy.max_bytes:
+        candidates = sorted(
+            store.list_snapshots()[:-1],
+            key=lambda s: s.last_restored_at or s.created_at,
+        )
+        for snapshot in candidates:
+            if store.total_bytes <= policy.max_bytes:
+                break
+            store.delete(snapshot.snapshot_id)
+            deleted.append(snapshot.snapshot_id)
+
+    if deleted:
+        logger.debug("По политике хранения удалены снапшоты: %s", ", ".join(deleted))
+    return deleted
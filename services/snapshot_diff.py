@@ -0,0 +1,236 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from core.utils import scan_tree
+from services.hashing import hash_files
+from services.manifest import Snapshot
+
+
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_MODIFIED = "modified"
+
+# Область для файлов в корне папки сохранения (player.xml, world_state.xml и т.д.)
+ROOT_AREA = "."
+
+
+@dataclass(frozen=True)
+class FileChange:
+    """Отличие одного файла: размер в старом и новом состоянии; None - файла нет."""
+
+    path: str
+    old_size: int | None
+    new_size: int | None
+
+    @property
+    def kind(self) -> str:
+        if self.old_size is None:
+            return CHANGE_ADDED
+        if self.new_size is None:
+            return CHANGE_REMOVED
+        return CHANGE_MODIFIED
+
+    @property
+    def area(self) -> str:
+        """
+        Возвращает область сохранения, к которой относится файл: первую папку пути
+        (world, stats, persistent) или ROOT_AREA для файлов в корне.
+
+        Returns:
+            str: Название области.
+        """
+        head, sep, _ = self.path.partition("/")
+        return head if sep else ROOT_AREA
+
+
+@dataclass
+class SnapshotDiff:
+    """
+    Отличия между двумя состояниями сохранения: 'old' и 'new' - идентификаторы снапшотов
+    или путь к папке. Изменения отсортированы по пути.
+    """
+
+    old: str
+    new: str
+    changes: list[FileChange] = field(default_factory=list)
+    # Содержимое сверено по хэшу; снапшоты между собой всегда сравниваются по хэшу
+    verified: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    @property
+    def added(self) -> list[FileChange]:
+        return [change for change in self.changes if change.kind == CHANGE_ADDED]
+
+    @property
+    def removed(self) -> list[FileChange]:
+        return [change for change in self.changes if change.kind == CHANGE_REMOVED]
+
+    @property
+    def modified(self) -> list[FileChange]:
+        return [change for change in self.changes if change.kind == CHANGE_MODIFIED]
+
+    @property
+    def totals(self) -> dict[str, int]:
+        """
+        Возвращает количество файлов и байт по видам изменений.
+
+        Returns:
+            (dict[str, int]): Количество добавленных, удаленных и измененных файлов,
+                их байты (для измененных - новый размер) и изменение общего размера.
+        """
+        totals = {
+            CHANGE_ADDED: 0,
+            CHANGE_REMOVED: 0,
+            CHANGE_MODIFIED: 0,
+            "added_bytes": 0,
+            "removed_bytes": 0,
+            "modified_bytes": 0,
+            "size_delta": 0,
+        }
+        for change in self.changes:
+            kind = change.kind
+            totals[kind] += 1
+            totals[f"{kind}_bytes"] += (
+                change.old_size if kind == CHANGE_REMOVED else change.new_size
+            )
+            totals["size_delta"] += (change.new_size or 0) - (change.old_size or 0)
+        return totals
+
+    def by_area(self) -> dict[str, dict[str, int]]:
+        """
+        Группирует изменения по областям сохранения (см. FileChange.area).
+
+        Returns:
+            (dict[str, dict[str, int]]): Область -> количество файлов по видам изменений.
+        """
+        areas: dict[str, dict[str, int]] = {}
+        for change in self.changes:
+            counts = areas.setdefault(
+                change.area, {CHANGE_ADDED: 0, CHANGE_REMOVED: 0, CHANGE_MODIFIED: 0}
+            )
+            counts[change.kind] += 1
+        return dict(sorted(areas.items()))
+
+    def reversed(self) -> "SnapshotDiff":
+        """
+        Возвращает обратные отличия: от 'new' к 'old'.
+
+        Returns:
+            SnapshotDiff: Отличия с переставленными состояниями.
+        """
+        return SnapshotDiff(
+            old=self.new,
+            new=self.old,
+            changes=[
+                FileChange(change.path, change.new_size, change.old_size)
+                for change in self.changes
+            ],
+            verified=self.verified,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "old": self.old,
+            "new": self.new,
+            "verified": self.verified,
+            "totals": self.totals,
+            "areas": self.by_area(),
+            CHANGE_ADDED: {change.path: change.new_size for change in self.added},
+            CHANGE_REMOVED: {change.path: change.old_size for change in self.removed},
+            CHANGE_MODIFIED: {
+                change.path: [change.old_size, change.new_size] for change in self.modified
+            },
+        }
+
+
+def diff_folder(snapshot: Snapshot, folder: Path, verify_hash: bool = False) -> SnapshotDiff:
+    """
+    Функция сравнения папки со снапшотом. Без 'verify_hash' файл считается измененным,
+    если отличается размер или mtime, и содержимое не читается. С 'verify_hash' = True
+    файлы с совпавшим размером сверяются по хэшу содержимого: так не попадают в отличия
+    файлы, которые переписаны тем же содержимым, и находятся измененные без смены mtime.
+
+    Args:
+        snapshot (Snapshot): Снапшот - старое состояние.
+        folder (Path): Папка - новое состояние.
+        verify_hash (bool, optional): Сверять содержимое по хэшу. Defaults to False.
+
+    Returns:
+        SnapshotDiff: Отличия папки от снапшота.
+    """
+    live_files, _ = scan_tree(folder) if folder.is_dir() else ({}, [])
+
+    changes: list[FileChange] = []
+    to_hash: list[str] = []
+    for rel_path, stat in live_files.items():
+        entry = snapshot.files.get(rel_path)
+        if entry is None or entry.size != stat.st_size:
+            changes.append(FileChange(rel_path, entry.size if entry else None, stat.st_size))
+        elif verify_hash:
+            to_hash.append(rel_path)
+        elif entry.mtime_ns != stat.st_mtime_ns:
+            changes.append(FileChange(rel_path, entry.size, stat.st_size))
+
+    digests = hash_files([folder / rel_path for rel_path in to_hash])
+    for rel_path, digest in zip(to_hash, digests):
+        entry = snapshot.files[rel_path]
+        if digest != entry.digest:
+            changes.append(FileChange(rel_path, entry.size, live_files[rel_path].st_size))
+
+    changes += [
+        FileChange(rel_path, entry.size, None)
+        for rel_path, entry in snapshot.files.items()
+        if rel_path not in live_files
+    ]
+    changes.sort(key=lambda change: change.path)
+    return SnapshotDiff(
+        old=snapshot.snapshot_id,
+        new=str(folder),
+        changes=changes,
+        verified=verify_hash,
+    )
+
+
+def format_diff(diff: dict, limit: int | None = None) -> str:
+    """
+    Функция форматирования отличий (SnapshotDiff.to_dict) в текстовый отчет.
+
+    Args:
+        diff (dict): Отличия в виде словаря.
+        limit (int | None, optional): Максимальное количество выводимых файлов каждого
+            вида. Defaults to None - все файлы.
+
+    Returns:
+        str: Отчет: файлы с размерами, сводка по областям и итоги в байтах.
+    """
+    lines = [f"{diff['old']} -> {diff['new']}"]
+    sections = (
+        ("+", CHANGE_ADDED, lambda size: f"{size} Б"),
+        ("-", CHANGE_REMOVED, lambda size: f"{size} Б"),
+        ("~", CHANGE_MODIFIED, lambda sizes: f"{sizes[0]} -> {sizes[1]} Б"),
+    )
+    for mark, kind, describe in sections:
+        items = list(diff[kind].items())
+        for rel_path, size in items[:limit]:
+            lines.append(f"{mark} {rel_path} ({describe(size)})")
+        if limit is not None and len(items) > limit:
+            lines.append(f"{mark} ... еще {len(items) - limit}")
+
+    for area, counts in diff["areas"].items():
+        lines.append(
+            f"{area}: +{counts[CHANGE_ADDED]} -{counts[CHANGE_REMOVED]} "
+            f"~{counts[CHANGE_MODIFIED]}"
+        )
+
+    totals = diff["totals"]
+    lines.append(
+        f"добавлено: {totals[CHANGE_ADDED]} ({totals['added_bytes']} Б), "
+        f"удалено: {totals[CHANGE_REMOVED]} ({totals['removed_bytes']} Б), "
+        f"изменено: {totals[CHANGE_MODIFIED]} ({totals['modified_bytes']} Б), "
+        f"размер: {totals['size_delta']:+} Б"
+    )
+    if not diff["verified"]:
+        lines.append("содержимое не сверялось: изменения найдены по размеру и mtime")
+    return "\n".join(lines)
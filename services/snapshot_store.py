@@ -0,0 +1,862 @@
+import os
+import re
+import json
+import stat as stat_module
+import shutil
+import logging
+import threading
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+
+from core import metrics
+from core.utils import scan_tree
+from core.exceptions import (
+    CopyError,
+    SnapshotCorruptedError,
+    SnapshotNotFoundError,
+)
+from services.catalog import SnapshotCatalog
+from services.copy_engine import (
+    CopyEngine,
+    CopyJob,
+)
+from services.manifest import (
+    FileEntry,
+    Snapshot,
+    SnapshotInfo,
+)
+from services.hashing import (
+    hash_file,
+    hash_files,
+    is_valid_digest,
+)
+from services.snapshot_diff import (
+    FileChange,
+    SnapshotDiff,
+)
+from services.journal import (
+    JOURNAL_BATCH_FILES,
+    JOURNAL_FILE_NAME,
+    KIND_BACKUP,
+    KIND_RESTORE_DELTA,
+    JournalState,
+    OperationJournal,
+)
+
+
+OBJECTS_DIR_NAME = "objects"
+SNAPSHOTS_DIR_NAME = "snapshots"
+CATALOG_FILE_NAME = "catalog.sqlite3"
+
+# Папки объектов названы первыми двумя символами хэша
+_BUCKET_RE = re.compile("[0-9a-f]{2}")
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    Контентно-адресуемое хранилище снапшотов:
+    - содержимое файлов хранится один раз в 'objects/' под именем своего хэша
+    - каждый снапшот - небольшой JSON-манифест в 'snapshots/'
+    - неизмененные файлы не перечитываются: хэш берется из прошлого манифеста по size/mtime
+    - хэши считаются параллельно (на больших объемах - в пуле процессов), объекты
+      копируются параллельно через CopyEngine
+    - целостность объектов проверяется по хэшу перед восстановлением; перепроверяются
+      только файлы объектов, чьи размер или mtime изменились с прошлой проверки
+    - список снапшотов, счетчики ссылок на объекты и учет места ведутся в SQLite-каталоге
+      SnapshotCatalog, так что выборки не требуют чтения манифестов и обхода диска
+    - JSON-манифесты остаются переносимой копией: по ним каталог пересобирается,
+      если он потерян или его схема устарела. Сверка каталога с манифестами и удаление
+      объектов без ссылок обходят все хранилище и выполняются отдельно (collect_garbage)
+    - создание снапшота и запись в папку сохранения ведутся в журнале OperationJournal,
+      так что прерванную операцию можно довести до конца, не копируя все заново
+    """
+
+    def __init__(self, root: Path, engine: CopyEngine | None = None):
+        self.root = root
+        self.engine = engine or CopyEngine()
+        self.objects_dir = root / OBJECTS_DIR_NAME
+        self.snapshots_dir = root / SNAPSHOTS_DIR_NAME
+        self.journal = OperationJournal(root / JOURNAL_FILE_NAME)
+
+        self._lock = threading.RLock()
+        self._catalog: SnapshotCatalog | None = None
+
+    @property
+    def catalog(self) -> SnapshotCatalog:
+        """
+        Возвращает каталог снапшотов, при первом обращении открывая и сверяя его с манифестами.
+
+        Returns:
+            SnapshotCatalog: Каталог снапшотов.
+        """
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = self._open_catalog()
+            return self._catalog
+
+    @property
+    def total_bytes(self) -> int:
+        """
+        Возвращает место, занимаемое объектами хранилища, без обхода диска.
+
+        Returns:
+            int: Размер в байтах.
+        """
+        return self.catalog.total_bytes()
+
+    def create_snapshot(self, src: Path, changed_paths: set[str] | None = None) -> Snapshot:
+        """
+        Создает снапшот папки 'src'. В хранилище копируются только объекты,
+        которых там еще нет.
+
+        Args:
+            src (Path): Папка, из которой создается снапшот.
+            changed_paths (set[str] | None, optional): Пути, измененные с последнего
+                снапшота (например, от ChangeTracker). Если заданы - проверяются только они,
+                остальные записи берутся из последнего снапшота без обхода папки.
+                Defaults to None - полный обход.
+
+        Raises:
+            CopyError: Если часть файлов не удалось сохранить в хранилище.
+
+        Returns:
+            Snapshot: Созданный снапшот или последний снапшот, если содержимое папки
+                с ним совпадает.
+        """
+        self._ensure_layout()
+
+        previous = self.latest()
+        known = previous.files if previous else {}
+
+        with metrics.span("scan"):
+            if changed_paths is not None and previous is not None:
+                stats, dirs, carried = self._scan_changed(src, previous, changed_paths)
+            else:
+                (stats, dirs), carried = scan_tree(src), {}
+
+        snapshot = Snapshot(
+            snapshot_id=self._new_snapshot_id(),
+            created_at=datetime.now().timestamp(),
+            files=carried,
+            dirs=sorted(dirs),
+        )
+
+        changed: list[str] = []
+        for rel_path, stat in stats.items():
+            entry = known.get(rel_path)
+            if (
+                entry is not None
+                and entry.size == stat.st_size
+                and entry.mtime_ns == stat.st_mtime_ns
+                and self.has_object(entry.digest)
+            ):
+                snapshot.files[rel_path] = entry
+            else:
+                changed.append(rel_path)
+
+        with metrics.span("hash"):
+            digests = hash_files([src / rel_path for rel_path in changed])
+        if unreadable := [rel for rel, digest in zip(changed, digests) if digest is None]:
+            raise CopyError(
+                f"Не удалось прочитать файлов: {len(unreadable)} из {len(changed)}",
+                failures=unreadable,
+            )
+
+        for rel_path, digest in zip(changed, digests):
+            stat = stats[rel_path]
+            snapshot.files[rel_path] = FileEntry(
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                digest=digest,
+            )
+
+        if (
+            previous is not None
+            and self._same_content(snapshot, previous)
+            # Заново посчитанные объекты могли пропасть из хранилища - тогда их надо записать
+            and all(self.has_object(snapshot.files[rel_path].digest) for rel_path in changed)
+        ):
+            # Повторный бэкап без изменений не плодит манифесты и не сдвигает ротацию
+            logger.debug("Содержимое не изменилось со снапшота %s", previous.snapshot_id)
+            return previous
+
+        # Без новых файлов хранилище не меняется, кроме атомарной записи манифеста
+        if changed:
+            self.journal.begin(KIND_BACKUP, snapshot, target=src, planned=changed)
+        written = self._store_objects(snapshot, src, changed)
+
+        with self._lock:
+            self._write_manifest(snapshot)
+            self.catalog.add(snapshot)
+            self.catalog.record_object_stats(written)
+        if changed:
+            self.journal.finish()
+
+        logger.debug(
+            "Снапшот %s: файлов без изменений - %s, обработано заново - %s",
+            snapshot.snapshot_id,
+            len(snapshot.files) - len(changed),
+            len(changed),
+        )
+        return snapshot
+
+    def materialize(
+        self,
+        snapshot: Snapshot,
+        dst: Path,
+        journaled: bool = False,
+    ) -> None:
+        """
+        Разворачивает снапшот в папку 'dst'. Папка должна быть пустой или не существовать.
+        Файлам возвращается mtime из манифеста, чтобы следующий снапшот их не перечитывал.
+
+        Args:
+            snapshot (Snapshot): Снапшот для разворачивания.
+            dst (Path): Целевая папка.
+            journaled (bool, optional): Отмечать скопированные файлы в журнале. Операцию
+                в журнале начинает и завершает вызывающий код. Defaults to False.
+
+        Raises:
+            CopyError: Если часть файлов не удалось скопировать.
+        """
+        dirs = [dst, *(dst / rel_dir for rel_dir in snapshot.dirs)]
+        self._copy_to(
+            snapshot,
+            dst,
+            list(snapshot.files),
+            dirs=dirs,
+            atomic=False,
+            journaled=journaled,
+        )
+
+    def sync_to(
+        self,
+        snapshot: Snapshot,
+        dst: Path,
+        verify_hash: bool = False,
+        journaled: bool = False,
+    ) -> tuple[int, int]:
+        """
+        Приводит папку 'dst' к состоянию снапшота, переписывая только отличающиеся файлы
+        и удаляя только лишние. Файл считается неизмененным, если совпадают размер и mtime,
+        а при 'verify_hash' = True - еще и хэш содержимого. Каждый файл подменяется
+        переименованием, поэтому обрезанных файлов после сбоя не остается.
+
+        Args:
+            snapshot (Snapshot): Снапшот, к которому приводится папка.
+            dst (Path): Целевая папка.
+            verify_hash (bool, optional): Дополнительно сверять хэш содержимого.
+                Defaults to False.
+            journaled (bool, optional): Вести операцию в журнале: план фиксируется до
+                первого изменения папки, и прерванную запись можно довести до конца
+                через resume_copy. Defaults to False.
+
+        Raises:
+            CopyError: Если часть файлов не удалось скопировать.
+            JournalError: Если в журнале осталась незавершенная операция.
+
+        Returns:
+            (tuple[int, int]): Количество записанных и удаленных файлов.
+        """
+        if not dst.is_dir():
+            if journaled:
+                self.journal.begin(
+                    KIND_RESTORE_DELTA, snapshot, target=dst, planned=snapshot.files
+                )
+            self.materialize(snapshot, dst, journaled=journaled)
+            if journaled:
+                self.journal.finish()
+            return len(snapshot.files), 0
+
+        live_files, live_dirs = scan_tree(dst)
+        wanted_dirs = set(snapshot.dirs)
+
+        extra_files = [path for path in live_files if path not in snapshot.files]
+        extra_dirs = [
+            rel_dir for rel_dir in sorted(live_dirs, reverse=True) if rel_dir not in wanted_dirs
+        ]
+
+        planned: list[str] = []
+        for rel_path, entry in snapshot.files.items():
+            stat = live_files.get(rel_path)
+            if (
+                stat is not None
+                and stat.st_size == entry.size
+                and stat.st_mtime_ns == entry.mtime_ns
+                and (not verify_hash or hash_file(dst / rel_path) == entry.digest)
+            ):
+                continue
+            planned.append(rel_path)
+
+        journaled = journaled and bool(planned or extra_files or extra_dirs)
+        if journaled:
+            self.journal.begin(
+                KIND_RESTORE_DELTA,
+                snapshot,
+                target=dst,
+                planned=planned,
+                deleted=[*extra_files, *extra_dirs],
+            )
+
+        # Сначала удаляется лишнее, чтобы освободить пути, где файл сменился папкой и наоборот
+        self._remove_extra(dst, [*extra_files, *extra_dirs])
+        self._copy_to(
+            snapshot,
+            dst,
+            planned,
+            dirs=(dst / rel_dir for rel_dir in snapshot.dirs),
+            atomic=True,
+            journaled=journaled,
+        )
+
+        if journaled:
+            self.journal.finish()
+        return len(planned), len(extra_files)
+
+    def resume_copy(self, state: JournalState) -> int:
+        """
+        Доводит до конца прерванную запись снапшота в папку (восстановление или
+        подготовку копии): удаляет лишнее по плану и копирует только файлы, которые
+        не отмечены в журнале выполненными, а также отмеченные, но не совпавшие
+        с манифестом по размеру и mtime. Журнал не завершается - это делает вызывающий код.
+
+        Args:
+            state (JournalState): Состояние операции из журнала.
+
+        Raises:
+            SnapshotCorruptedError: Если объектов для оставшихся файлов нет в хранилище.
+            CopyError: Если часть файлов не удалось скопировать.
+
+        Returns:
+            int: Количество скопированных файлов.
+        """
+        snapshot, dst = state.snapshot, state.target
+
+        todo = state.remaining
+        for rel_path in state.completed:
+            entry = snapshot.files.get(rel_path)
+            try:
+                stat = os.stat(dst / rel_path)
+            except OSError:
+                stat = None
+            if entry and (
+                stat is None or stat.st_size != entry.size or stat.st_mtime_ns != entry.mtime_ns
+            ):
+                todo.append(rel_path)
+
+        if missing := [rel for rel in todo if not self.has_object(snapshot.files[rel].digest)]:
+            raise SnapshotCorruptedError(
+                f"Для доведения операции не хватает объектов: {len(missing)}",
+                paths=missing,
+            )
+
+        self.journal.resume()
+        self._remove_extra(dst, state.deleted)
+        self._copy_to(
+            snapshot,
+            dst,
+            todo,
+            dirs=[dst, *(dst / rel_dir for rel_dir in snapshot.dirs)],
+            atomic=True,
+            journaled=True,
+        )
+        return len(todo)
+
+    def resume_snapshot(self, state: JournalState) -> Snapshot:
+        """
+        Доводит до конца прерванное создание снапшота: сохраняет объекты, которых еще
+        нет в хранилище, и регистрирует снапшот. Вызывающий код должен убедиться, что
+        файлы в папке-источнике не менялись с начала операции.
+
+        Args:
+            state (JournalState): Состояние операции бэкапа из журнала.
+
+        Raises:
+            CopyError: Если часть файлов не удалось сохранить в хранилище.
+
+        Returns:
+            Snapshot: Созданный снапшот.
+        """
+        snapshot = state.snapshot
+        remaining = [
+            rel_path
+            for rel_path in state.planned
+            if not self.has_object(snapshot.files[rel_path].digest)
+        ]
+
+        self._ensure_layout()
+        self.journal.resume()
+        written = self._store_objects(snapshot, state.target, remaining)
+        with self._lock:
+            self._write_manifest(snapshot)
+            self.catalog.add(snapshot)
+            self.catalog.record_object_stats(written)
+        self.journal.finish()
+        return snapshot
+
+    def discard_snapshot(self, state: JournalState) -> int:
+        """
+        Откатывает прерванное создание снапшота: удаляет сохраненные им объекты,
+        на которые не ссылается ни один снапшот, и завершает журнал.
+
+        Args:
+            state (JournalState): Состояние операции бэкапа из журнала.
+
+        Returns:
+            int: Количество удаленных объектов.
+        """
+        with self._lock:
+            referenced = self.catalog.digests()
+            digests = {state.snapshot.files[rel_path].digest for rel_path in state.planned}
+            removed = 0
+            for digest in digests - referenced:
+                object_path = self.object_path(digest)
+                if object_path.is_file():
+                    object_path.unlink()
+                    removed += 1
+        self.journal.finish()
+        return removed
+
+    def verify(self, snapshot: Snapshot) -> list[str]:
+        """
+        Проверяет, что объекты снапшота есть в хранилище и их содержимое совпадает с хэшем.
+        Хэш пересчитывается только для файлов объектов, чьи размер или mtime изменились
+        с прошлой успешной проверки (или которые еще не проверялись).
+
+        Args:
+            snapshot (Snapshot): Снапшот для проверки.
+
+        Returns:
+            list[str]: Пути файлов снапшота с отсутствующими или поврежденными объектами;
+                пустой список, если снапшот цел.
+        """
+        paths_by_digest: dict[str, list[str]] = defaultdict(list)
+        sizes: dict[str, int] = {}
+        for rel_path, entry in snapshot.files.items():
+            paths_by_digest[entry.digest].append(rel_path)
+            sizes[entry.digest] = entry.size
+
+        recorded = self.catalog.object_stats()
+        damaged: set[str] = set()
+        to_hash: list[tuple[str, os.stat_result]] = []
+        for digest, size in sizes.items():
+            try:
+                stat = self.object_path(digest).stat()
+            except OSError:
+                damaged.add(digest)
+                continue
+
+            if stat.st_size != size:
+                damaged.add(digest)
+            elif recorded.get(digest) != (stat.st_size, stat.st_mtime_ns):
+                to_hash.append((digest, stat))
+
+        verified: list[tuple[str, int, int]] = []
+        actual = hash_files([self.object_path(digest) for digest, _ in to_hash])
+        for (digest, stat), actual_digest in zip(to_hash, actual):
+            if actual_digest == digest:
+                verified.append((digest, stat.st_size, stat.st_mtime_ns))
+            else:
+                damaged.add(digest)
+        self.catalog.record_object_stats(verified)
+
+        logger.debug(
+            "Проверка снапшота %s: объектов - %s, перехэшировано - %s, повреждено - %s",
+            snapshot.snapshot_id,
+            len(sizes),
+            len(to_hash),
+            len(damaged),
+        )
+        return sorted(rel_path for digest in damaged for rel_path in paths_by_digest[digest])
+
+    def latest(self) -> Snapshot | None:
+        """
+        Возвращает последний созданный снапшот.
+
+        Returns:
+            (Snapshot | None): Снапшот, если хоть один существует, иначе None.
+        """
+        if (snapshot_id := self.catalog.latest_id()) is None:
+            return None
+        return self.load(snapshot_id)
+
+    def list_snapshots(self) -> list[SnapshotInfo]:
+        """
+        Возвращает сведения о снапшотах в порядке создания.
+
+        Returns:
+            list[SnapshotInfo]: Список сведений о снапшотах.
+        """
+        return self.catalog.list_snapshots()
+
+    def list_ids(self) -> list[str]:
+        """
+        Возвращает идентификаторы снапшотов в порядке создания.
+
+        Returns:
+            list[str]: Отсортированный список идентификаторов.
+        """
+        return [snapshot.snapshot_id for snapshot in self.list_snapshots()]
+
+    def load(self, snapshot_id: str) -> Snapshot:
+        """
+        Возвращает снапшот по идентификатору.
+
+        Args:
+            snapshot_id (str): Идентификатор снапшота.
+
+        Raises:
+            SnapshotNotFoundError: Если снапшота нет в хранилище.
+
+        Returns:
+            Snapshot: Снапшот.
+        """
+        if (snapshot := self.catalog.load(snapshot_id)) is None:
+            raise SnapshotNotFoundError(f"Снапшот {snapshot_id} не найден в хранилище.")
+        return snapshot
+
+    def diff(self, old_id: str, new_id: str) -> SnapshotDiff:
+        """
+        Сравнивает два снапшота по каталогу: манифесты не загружаются целиком,
+        а содержимое файлов не читается.
+
+        Args:
+            old_id (str): Идентификатор старого снапшота.
+            new_id (str): Идентификатор нового снапшота.
+
+        Raises:
+            SnapshotNotFoundError: Если одного из снапшотов нет в хранилище.
+
+        Returns:
+            SnapshotDiff: Отличия 'new_id' от 'old_id'.
+        """
+        known = self.catalog.snapshot_ids()
+        for snapshot_id in (old_id, new_id):
+            if snapshot_id not in known:
+                raise SnapshotNotFoundError(f"Снапшот {snapshot_id} не найден в хранилище.")
+
+        return SnapshotDiff(
+            old=old_id,
+            new=new_id,
+            changes=[FileChange(*row) for row in self.catalog.diff(old_id, new_id)],
+            verified=True,
+        )
+
+    def mark_restored(self, snapshot_id: str) -> None:
+        """
+        Запоминает время восстановления из снапшота - по нему вытесняются давно
+        не использованные снапшоты.
+
+        Args:
+            snapshot_id (str): Идентификатор снапшота.
+
+        Raises:
+            SnapshotNotFoundError: Если снапшота нет в хранилище.
+        """
+        with self._lock:
+            snapshot = self.load(snapshot_id)
+            snapshot.last_restored_at = datetime.now().timestamp()
+            self._write_manifest(snapshot)
+            self.catalog.set_last_restored(snapshot_id, snapshot.last_restored_at)
+
+    def delete(self, snapshot_id: str) -> int:
+        """
+        Удаляет снапшот и объекты, на которые больше никто не ссылается.
+
+        Args:
+            snapshot_id (str): Идентификатор снапшота.
+
+        Raises:
+            SnapshotNotFoundError: Если снапшота нет в хранилище.
+
+        Returns:
+            int: Количество освобожденных байт.
+        """
+        with self._lock:
+            if snapshot_id not in self.catalog.snapshot_ids():
+                raise SnapshotNotFoundError(f"Снапшот {snapshot_id} не найден в хранилище.")
+
+            orphans = self.catalog.remove(snapshot_id)
+            (self.snapshots_dir / f"{snapshot_id}.json").unlink(missing_ok=True)
+            for digest, _ in orphans:
+                self.object_path(digest).unlink(missing_ok=True)
+
+        freed = sum(size for _, size in orphans)
+        logger.debug("Снапшот %s удален, освобождено байт: %s", snapshot_id, freed)
+        return freed
+
+    def collect_garbage(self) -> int:
+        """
+        Сверяет каталог с папкой 'snapshots/' (при расхождении пересобирает его
+        из манифестов) и удаляет объекты, на которые не ссылается ни один снапшот.
+        Обходит все хранилище, поэтому вызывается не при каждом открытии, а после
+        доведения прерванной операции.
+
+        Returns:
+            int: Количество удаленных объектов.
+        """
+        with self._lock:
+            catalog = self.catalog
+            manifests = self._read_manifests()
+            if {snapshot.snapshot_id for snapshot in manifests} != catalog.snapshot_ids():
+                catalog.rebuild(manifests)
+                logger.info("Каталог снапшотов разошелся с манифестами и пересобран.")
+
+            # Объекты прерванного бэкапа не удаляются, пока операция не доведена или не откачена
+            referenced = catalog.digests() | self._journaled_digests()
+            removed = 0
+            for digest, object_path in self._iter_object_files():
+                if digest not in referenced:
+                    object_path.unlink(missing_ok=True)
+                    removed += 1
+
+        if removed:
+            logger.debug("Удалено объектов без ссылок: %s", removed)
+        return removed
+
+    def put_object(self, digest: str, path: Path) -> None:
+        """
+        Переносит в хранилище готовый файл объекта, содержимое которого уже сверено
+        с хэшем (например, распакованный из пака).
+
+        Args:
+            digest (str): Хэш содержимого.
+            path (Path): Файл с содержимым. Должен лежать на том же разделе, что и хранилище.
+        """
+        object_path = self.object_path(digest)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        stat = os.stat(path)
+        os.replace(path, object_path)
+        self.catalog.record_object_stats([(digest, stat.st_size, stat.st_mtime_ns)])
+
+    def add_snapshot(self, snapshot: Snapshot) -> None:
+        """
+        Регистрирует снапшот, созданный вне хранилища (например, импортированный из пака).
+        Все его объекты уже должны быть в хранилище.
+
+        Args:
+            snapshot (Snapshot): Снапшот.
+        """
+        self._ensure_layout()
+        with self._lock:
+            self._write_manifest(snapshot)
+            self.catalog.add(snapshot)
+
+    def _store_objects(
+        self,
+        snapshot: Snapshot,
+        src: Path,
+        rel_paths: list[str],
+    ) -> list[tuple[str, int, int]]:
+        """
+        Сохраняет объекты файлов 'rel_paths' пачками, отмечая каждую пачку в журнале.
+
+        Returns:
+            (list[tuple[str, int, int]]): Хэш, размер и mtime записанных файлов объектов.
+        """
+        written: list[tuple[str, int, int]] = []
+        for start in range(0, len(rel_paths), JOURNAL_BATCH_FILES):
+            batch = rel_paths[start : start + JOURNAL_BATCH_FILES]
+            with metrics.span("copy"):
+                results = self.engine.map(
+                    lambda rel_path: self._store_object(
+                        src / rel_path, snapshot.files[rel_path].digest
+                    ),
+                    batch,
+                )
+            written.extend(result for result in results if result is not None)
+            self.journal.complete(batch)
+        return written
+
+    def _copy_to(
+        self,
+        snapshot: Snapshot,
+        dst: Path,
+        rel_paths: list[str],
+        dirs: Iterable[Path],
+        atomic: bool,
+        journaled: bool,
+    ) -> None:
+        """
+        Копирует файлы снапшота 'rel_paths' в папку 'dst'. С журналом файлы копируются
+        пачками, и каждая пачка отмечается в журнале выполненной.
+        """
+        jobs = [
+            self._restore_job(snapshot.files[rel_path], dst / rel_path, atomic=atomic)
+            for rel_path in rel_paths
+        ]
+        if not journaled:
+            with metrics.span("copy"):
+                self.engine.copy_files(jobs, dirs=dirs)
+            return
+
+        with metrics.span("copy"):
+            self.engine.copy_files((), dirs=dirs)
+        for start in range(0, len(jobs), JOURNAL_BATCH_FILES):
+            with metrics.span("copy"):
+                self.engine.copy_files(jobs[start : start + JOURNAL_BATCH_FILES])
+            self.journal.complete(rel_paths[start : start + JOURNAL_BATCH_FILES])
+
+    @staticmethod
+    def _remove_extra(dst: Path, rel_paths: Iterable[str]) -> None:
+        for rel_path in rel_paths:
+            path = dst / rel_path
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def has_object(self, digest: str) -> bool:
+        return self.object_path(digest).is_file()
+
+    @staticmethod
+    def _scan_changed(
+        src: Path,
+        previous: Snapshot,
+        changed_paths: set[str],
+    ) -> tuple[dict[str, os.stat_result], set[str], dict[str, FileEntry]]:
+        """
+        Проверяет только измененные пути вместо обхода всей папки.
+
+        Returns:
+            (tuple[dict[str, os.stat_result], set[str], dict[str, FileEntry]]):
+                stat существующих измененных файлов, папки снапшота и записи
+                неизмененных файлов, перенесенные из прошлого снапшота.
+        """
+        stats: dict[str, os.stat_result] = {}
+        dirs = set(previous.dirs)
+        carried = {
+            rel_path: entry
+            for rel_path, entry in previous.files.items()
+            if rel_path not in changed_paths
+        }
+
+        for rel_path in changed_paths:
+            try:
+                stat = os.lstat(src / rel_path)
+            except (FileNotFoundError, NotADirectoryError):
+                dirs.discard(rel_path)
+                continue
+
+            if stat_module.S_ISDIR(stat.st_mode):
+                dirs.add(rel_path)
+            elif stat_module.S_ISREG(stat.st_mode):
+                dirs.discard(rel_path)
+                stats[rel_path] = stat
+
+        return stats, dirs, carried
+
+    @staticmethod
+    def _same_content(snapshot: Snapshot, other: Snapshot) -> bool:
+        """
+        Сравнивает снапшоты по набору папок и хэшам файлов, без учета mtime.
+        """
+        if snapshot.dirs != other.dirs or snapshot.files.keys() != other.files.keys():
+            return False
+        return all(
+            entry.digest == other.files[rel_path].digest
+            for rel_path, entry in snapshot.files.items()
+        )
+
+    def _store_object(self, path: Path, digest: str) -> tuple[str, int, int] | None:
+        """
+        Копирует файл в хранилище под уже посчитанным хэшем, если такого содержимого
+        там еще нет.
+
+        Args:
+            path (Path): Путь к файлу.
+            digest (str): Хэш содержимого файла.
+
+        Returns:
+            (tuple[str, int, int] | None): Хэш, размер и mtime записанного файла объекта;
+                None если объект уже был в хранилище.
+        """
+        object_path = self.object_path(digest)
+        if object_path.is_file():
+            return None
+
+        object_path.parent.mkdir(exist_ok=True)
+        # Одинаковое содержимое могут сохранять несколько потоков одновременно
+        tmp_path = object_path.with_name(
+            f"{object_path.name}.{threading.get_ident()}.tmp"
+        )
+        self.engine.copy_file(path, tmp_path)
+        stat = os.stat(tmp_path)
+        os.replace(tmp_path, object_path)
+        return digest, stat.st_size, stat.st_mtime_ns
+
+    def _restore_job(
+        self,
+        entry: FileEntry,
+        target: Path,
+        atomic: bool = False,
+    ) -> CopyJob:
+        return CopyJob(
+            src=self.object_path(entry.digest),
+            dst=target,
+            mtime_ns=entry.mtime_ns,
+            atomic=atomic,
+        )
+
+    def _write_manifest(self, snapshot: Snapshot) -> None:
+        manifest_path = self.snapshots_dir / f"{snapshot.snapshot_id}.json"
+        tmp_path = manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(snapshot.to_dict()), encoding="utf-8")
+        os.replace(tmp_path, manifest_path)
+
+    def _open_catalog(self) -> SnapshotCatalog:
+        """
+        Открывает каталог. Манифесты читаются, только если каталога не было
+        или его схема устарела: тогда он пересобирается из них.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        catalog = SnapshotCatalog(self.root / CATALOG_FILE_NAME)
+        if catalog.needs_rebuild:
+            catalog.rebuild(self._read_manifests())
+            logger.info("Каталог снапшотов пересобран из манифестов.")
+        return catalog
+
+    def _read_manifests(self) -> list[Snapshot]:
+        if not self.snapshots_dir.is_dir():
+            return []
+        return [
+            Snapshot.from_dict(json.loads(path.read_text(encoding="utf-8")))
+            for path in self.snapshots_dir.glob("*.json")
+        ]
+
+    def _journaled_digests(self) -> set[str]:
+        state = self.journal.load()
+        if state is None or state.kind != KIND_BACKUP:
+            return set()
+        return {state.snapshot.files[rel_path].digest for rel_path in state.planned}
+
+    def _iter_object_files(self) -> Iterator[tuple[str, Path]]:
+        """
+        Перебирает файлы объектов в раскладке 'objects/xx/<остаток хэша>'. Посторонние
+        файлы и папки пропускаются.
+        """
+        if not self.objects_dir.is_dir():
+            return
+
+        for bucket in self.objects_dir.iterdir():
+            if not _BUCKET_RE.fullmatch(bucket.name) or not bucket.is_dir():
+                continue
+            for object_path in bucket.iterdir():
+                digest = f"{bucket.name}{object_path.name}"
+                if is_valid_digest(digest) and object_path.is_file():
+                    yield digest, object_path
+
+    def _ensure_layout(self) -> None:
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _new_snapshot_id() -> str:
+        return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
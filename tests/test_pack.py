@@ -0,0 +1,121 @@
+import json
+import zlib
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+from core.exceptions import PackFormatError
+from services.hashing import HASH_DIGEST_SIZE
+from services.pack import (
+    CODEC_ZLIB,
+    PACK_END_MAGIC,
+    PACK_MAGIC,
+    PACK_VERSION,
+    _TRAILER,
+    import_pack,
+)
+from services.snapshot_store import SnapshotStore
+
+
+CONTENT = b"crafted"
+DIGEST = hashlib.blake2b(CONTENT, digest_size=HASH_DIGEST_SIZE).hexdigest()
+
+
+def write_crafted_pack(
+    path: Path,
+    files: dict[str, str],
+    objects: list[str] | None = None,
+    dirs: list[str] | None = None,
+) -> None:
+    """Пишет пак с произвольным индексом: 'files' - путь -> хэш, содержимое у всех одно."""
+    data = zlib.compress(CONTENT)
+    with open(path, "wb") as pack:
+        pack.write(PACK_MAGIC)
+        locations = {}
+        for digest in objects if objects is not None else sorted(set(files.values())):
+            locations[digest] = (pack.tell(), len(data))
+            pack.write(data)
+
+        index = {
+            "version": PACK_VERSION,
+            "codec": CODEC_ZLIB,
+            "snapshot": {
+                "snapshot_id": "20240101-000000-000000",
+                "created_at": 0.0,
+                "last_restored_at": None,
+                "dirs": dirs or [],
+                "files": {
+                    rel_path: [len(CONTENT), 0, digest] for rel_path, digest in files.items()
+                },
+            },
+            "objects": locations,
+        }
+        index_offset = pack.tell()
+        pack.write(zlib.compress(json.dumps(index).encode("utf-8")))
+        pack.write(_TRAILER.pack(index_offset, pack.tell() - index_offset, PACK_END_MAGIC))
+
+
+class ImportPackTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.store = SnapshotStore(self.root / "backup" / "save00")
+        self.pack_path = self.root / "crafted.nspack"
+
+    def tearDown(self):
+        self.store.catalog.close()
+        self._tmp.cleanup()
+
+    def assert_rejected(self, **pack_args) -> None:
+        write_crafted_pack(self.pack_path, **pack_args)
+        with self.assertRaises(PackFormatError):
+            import_pack(self.store, self.pack_path)
+        self.assertEqual(self.store.list_ids(), [])
+        self.assertFalse(self.store.has_object(DIGEST))
+
+    def test_imports_valid_pack(self):
+        write_crafted_pack(self.pack_path, {"world/chunk.bin": DIGEST}, dirs=["world"])
+
+        snapshot = import_pack(self.store, self.pack_path)
+
+        self.assertEqual(self.store.list_ids(), [snapshot.snapshot_id])
+        self.assertEqual(self.store.object_path(DIGEST).read_bytes(), CONTENT)
+
+    def test_rejects_unsafe_file_paths(self):
+        for rel_path in (
+            "../../x",
+            "world/../../x",
+            "/etc/x",
+            "C:/x",
+            "c:x",
+            "world\\x",
+            "world//x",
+            "./x",
+            "",
+        ):
+            with self.subTest(rel_path=rel_path):
+                self.assert_rejected(files={rel_path: DIGEST})
+
+        self.assertFalse((self.root / "x").exists())
+
+    def test_rejects_unsafe_dirs(self):
+        self.assert_rejected(files={"x": DIGEST}, dirs=["../outside"])
+
+    def test_rejects_malformed_object_digests(self):
+        for digest in (
+            DIGEST.upper(),
+            DIGEST[:-2],
+            DIGEST + "00",
+            "../" + DIGEST[3:],
+            "zz" + DIGEST[2:],
+        ):
+            with self.subTest(digest=digest):
+                self.assert_rejected(files={"x": DIGEST}, objects=[DIGEST, digest])
+
+    def test_rejects_malformed_file_digests(self):
+        self.assert_rejected(files={"x": "../../" + DIGEST[6:]}, objects=[DIGEST])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.snapshot_store import SnapshotStore
+
+
+class CollectGarbageTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.saves = self.root / "save00"
+        (self.saves / "world").mkdir(parents=True)
+        (self.saves / "player.xml").write_bytes(b"player")
+        (self.saves / "world" / "chunk.bin").write_bytes(b"chunk")
+        self.store_root = self.root / "backup"
+        self.store = SnapshotStore(self.store_root)
+        self.snapshot = self.store.create_snapshot(self.saves)
+
+    def tearDown(self):
+        self.store.catalog.close()
+        self._tmp.cleanup()
+
+    def reopen(self) -> SnapshotStore:
+        self.store.catalog.close()
+        self.store = SnapshotStore(self.store_root)
+        return self.store
+
+    def test_open_does_not_sweep_orphans(self):
+        orphan = self.store.objects_dir / "ab" / ("c" * 38)
+        orphan.parent.mkdir(exist_ok=True)
+        orphan.write_bytes(b"orphan")
+
+        self.assertEqual(self.reopen().list_ids(), [self.snapshot.snapshot_id])
+        self.assertTrue(orphan.exists())
+
+        self.assertEqual(self.store.collect_garbage(), 1)
+        self.assertFalse(orphan.exists())
+
+    def test_skips_stray_entries_in_objects(self):
+        stray_file = self.store.objects_dir / "README"
+        stray_file.write_text("not an object")
+        stray_dir = self.store.objects_dir / "tmp"
+        stray_dir.mkdir()
+        (stray_dir / "x").write_text("x")
+
+        self.assertEqual(self.store.collect_garbage(), 0)
+        self.assertTrue(stray_file.exists())
+        self.assertEqual(self.store.verify(self.snapshot), [])
+
+    def test_rebuilds_catalog_only_when_missing(self):
+        self.store.catalog.close()
+        (self.store_root / "catalog.sqlite3").unlink()
+
+        self.assertEqual(self.reopen().list_ids(), [self.snapshot.snapshot_id])
+        self.assertFalse(self.store.catalog.needs_rebuild)
+
+    def test_reconciles_catalog_with_manifests(self):
+        manifest = self.store.snapshots_dir / f"{self.snapshot.snapshot_id}.json"
+        manifest.unlink()
+
+        self.assertEqual(self.store.list_ids(), [self.snapshot.snapshot_id])
+        self.assertEqual(self.store.collect_garbage(), len(self.snapshot.files))
+        self.assertEqual(self.store.list_ids(), [])
+
+
+class CreateSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.saves = self.root / "save00"
+        self.saves.mkdir()
+        (self.saves / "player.xml").write_bytes(b"player")
+        self.store = SnapshotStore(self.root / "backup")
+        self.snapshot = self.store.create_snapshot(self.saves)
+
+    def tearDown(self):
+        self.store.catalog.close()
+        self._tmp.cleanup()
+
+    def test_unchanged_tree_returns_latest_snapshot(self):
+        again = self.store.create_snapshot(self.saves)
+
+        self.assertEqual(again.snapshot_id, self.snapshot.snapshot_id)
+        self.assertEqual(self.store.list_ids(), [self.snapshot.snapshot_id])
+        self.assertEqual(len(list(self.store.snapshots_dir.iterdir())), 1)
+
+    def test_touched_file_with_same_content_is_not_a_change(self):
+        player = self.saves / "player.xml"
+        stat = player.stat()
+        os.utime(player, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        again = self.store.create_snapshot(self.saves)
+
+        self.assertEqual(again.snapshot_id, self.snapshot.snapshot_id)
+
+    def test_changed_content_creates_snapshot(self):
+        (self.saves / "player.xml").write_bytes(b"player2")
+
+        again = self.store.create_snapshot(self.saves)
+
+        self.assertNotEqual(again.snapshot_id, self.snapshot.snapshot_id)
+        self.assertEqual(len(self.store.list_ids()), 2)
+
+    def test_new_empty_dir_creates_snapshot(self):
+        (self.saves / "world").mkdir()
+
+        again = self.store.create_snapshot(self.saves)
+
+        self.assertNotEqual(again.snapshot_id, self.snapshot.snapshot_id)
+
+
+if __name__ == "__main__":
+    unittest.main()